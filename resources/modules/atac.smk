@@ -10,30 +10,41 @@
 # Load modules
 import os
 import yaml
+from resources.scripts import rule as rule_helpers
 from resources.scripts.rule import *
+from resources.scripts.profiler import DagProfiler
+
+# Set up DAG construction profiling (opt-in: set PIPELINE_PROFILE=1 or 'profile_dag: True' in config)
+dag_profiler = DagProfiler.from_config(config)
+dag_profiler.instrument(rule_helpers, globals())
 
 # Load and parse sample/library info from YAML file
-with open(file=os.path.join(config.get("metadata_dir", "metadata"), "info.yaml"), mode="r", encoding="UTF-8") as file:
-    info = yaml.load(stream=file, Loader=yaml.SafeLoader)
+with dag_profiler.section("load info.yaml"):
+    with open(file=os.path.join(config.get("metadata_dir", "metadata"), "info.yaml"), mode="r", encoding="UTF-8") as file:
+        info = yaml.load(stream=file, Loader=yaml.SafeLoader)
 for key, value in parse_info(info).items():
     globals()[key] = value
 
 # Set module rules list
-module_rules = ['bcl2fastq', 'trimfastq', 'linkfastq', 'fastqc', 'multiqc', 'count_reads', 'chromap', 'macs2', 'mapping_qc']
+module_rules = ['bcl2fastq', 'trimfastq', 'linkfastq', 'fastqc', 'multiqc', 'count_reads', 'whitelist_cache', 'chromap', 'macs2', 'mapping_qc', 'harvest_metrics']
 
 # Import rules
+stop_timer = dag_profiler.timer("include rules")
 include: 'rules/bcl2fastq.smk'
 include: 'rules/trimfastq.smk'
 include: 'rules/linkfastq.smk'
 include: 'rules/fastqc.smk'
 include: 'rules/multiqc.smk'
 include: 'rules/count_reads.smk'
+include: 'rules/whitelist_cache.smk'
 include: 'rules/chromap.smk'
 include: 'rules/macs2.smk'
 include: 'rules/mapping_qc.smk'
+include: 'rules/harvest_metrics.smk'
+stop_timer()
 
 # Set targets list
-targets = [x for rule in [bcl2fastq, trimfastq, linkfastq, fastqc, multiqc, count_reads, chromap, macs2, mapping_qc] for x in rule]
+targets = [x for rule in [bcl2fastq, trimfastq, linkfastq, fastqc, multiqc, count_reads, whitelist_cache, chromap, macs2, mapping_qc, harvest_metrics] for x in rule]
 # --------------------------------------------------
 
 
@@ -41,4 +52,8 @@ targets = [x for rule in [bcl2fastq, trimfastq, linkfastq, fastqc, multiqc, coun
 # RULES
 rule all:
 	input: [os.path.abspath(x) for x in targets]
+
+# Write DAG construction profile (if enabled) before jobs start
+onstart:
+	dag_profiler.report()
 # --------------------------------------------------
\ No newline at end of file
@@ -5,17 +5,21 @@
 # Requires outputs from resources/rules/bcl2fastq.smk
 ##########################################################################################
 
+scripts_dir = config.get("scripts_dir", "resources/scripts")
+
 # Define rules
 rule barcounter:
 	input: lambda wildcards: get_count_inputs(wildcards, lib_types={"ADT", "HTO"}, info=info, read_trim=True if "read_trim" in config.keys() else False),
+		whitelist = os.path.abspath("stamps/whitelist_cache/gex.stamp")
 	output: os.path.abspath("stamps/barcounter/{sample}.stamp")
 	log: os.path.abspath("logs/barcounter/{sample}.log")
+	benchmark: os.path.abspath("benchmarks/barcounter/{sample}.tsv")
 	threads: 1
 	params:
-		R1_fastqs = lambda wildcards: get_count_fastqs(wildcards, lib_types={"ADT", "HTO"}, read="R1", info=info, output_dir=config["output_dir"]),
-		R2_fastqs = lambda wildcards: get_count_fastqs(wildcards, lib_types={"ADT", "HTO"}, read="R2", info=info, output_dir=config["output_dir"]),
+		R1_fastqs = lambda wildcards: get_count_fastqs(wildcards, lib_types={"ADT", "HTO"}, read="R1", info=info, output_dir=config["output_dir"], read_trim=True if "read_trim" in config.keys() else False),
+		R2_fastqs = lambda wildcards: get_count_fastqs(wildcards, lib_types={"ADT", "HTO"}, read="R2", info=info, output_dir=config["output_dir"], read_trim=True if "read_trim" in config.keys() else False),
 		tags = os.path.abspath(os.path.join(config.get("metadata_dir", "metadata"), config["tags"])),
-		whitelist = config["gex_barcode_whitelist"],
+		whitelist = os.path.join(config["output_dir"], ".pipeline", "whitelists", "gex.txt"),
 		output_path = os.path.join(config["output_dir"], "barcounter") # DO NOT CHANGE - downstream rules will search for mapping statistics in this directory
 	envmodules: "barcounter"
 	message: "Making ADT and HTO count matrix for {wildcards.sample}"
@@ -38,48 +42,25 @@ rule barcode_translate:
 	input: os.path.abspath("stamps/barcounter/{sample}.stamp")
 	output: os.path.abspath("stamps/barcode_translate/{sample}.stamp")
 	log: os.path.abspath("logs/barcode_translate/{sample}.log")
+	benchmark: os.path.abspath("benchmarks/barcode_translate/{sample}.tsv")
 	threads: 1
 	params:
 		barcounter_csv = os.path.join(config["output_dir"], "barcounter", "{sample}", "{sample}_Tag_Counts.csv"),
-		reference = config.get("barcode_translate", None)
+		reference = config.get("barcode_translate", None),
+		cache_dir = config.get("cache_dir", ".cache"),
+		script_path = scripts_dir if os.path.isabs(scripts_dir) else os.path.join(workflow.basedir, scripts_dir)
 	message: "Translating ADT and HTO barcodes for {wildcards.sample}"
-	run:
-		import csv
-		import shutil
-		from tempfile import NamedTemporaryFile
-		from loguru import logger
-		logger.remove(0)
-		logfile = logger.add(sink=log[0], level="INFO", mode="w")
-
-		with logger.catch(reraise=True):
-			shell("mkdir -p stamps/barcode_translate")
-			
-			lookup = {}
-			logger.info("Loading reference file: {}", params.reference)
-			with open(params.reference, mode="r", newline="") as infile:
-				reader = csv.reader(infile, delimiter="\t")
-				for row in reader:
-					lookup[row[0]] = row[1]
-
-			tempfile = NamedTemporaryFile(mode="w", newline="", delete=False)
-			logger.info("Loading BarCounter CSV file: {}", params.barcounter_csv)
-			with open(params.barcounter_csv, mode="r", newline="") as infile, tempfile:
-				reader = csv.reader(infile, delimiter=",")
-				writer = csv.writer(tempfile, delimiter=",")
-				header = next(reader)
-				writer.writerow(header)
-				for row in reader:
-					try:
-						row[0] = lookup[row[0]]
-						writer.writerow(row)
-					except KeyError:
-						raise KeyError("Barcode not found, please check reference file.")
-			shutil.move(tempfile.name, params.barcounter_csv)
-			logger.success("Barcode translation complete.")
-
-			shell("touch {output}")
-
-		logger.remove(logfile)
+	shell:
+		"""
+		( \
+		mkdir -p stamps/barcode_translate && \
+		{params.script_path}/barcode_translate.py \
+			--reference={params.reference} \
+			--counts={params.barcounter_csv} \
+			--cachedir={params.cache_dir} && \
+		touch {output} \
+		) > {log} 2>&1
+		"""
 
 # Set rule targets
 barcounter = [f"stamps/barcounter/{sample}.stamp" for sample in samples]
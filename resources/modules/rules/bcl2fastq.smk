@@ -4,35 +4,167 @@
 # Requires functions from resources/scripts/rule.py
 ##########################################################################################
 
-# Define rule
-rule bcl2fastq:
-	output: os.path.abspath("stamps/bcl2fastq/{lib}.stamp")
-	log: os.path.abspath("logs/bcl2fastq/{lib}.log")
-	threads: 1
-	params:
-		run_path = lambda wildcards: get_run_path(wildcards, info=info, run_dir=config["run_dir"]),
-		samplesheet_path = os.path.abspath(os.path.join(config.get("metadata_dir", "metadata"), "bcl2fastq")),
-		bases_mask_flag = lambda wildcards: get_bases_mask_flag(wildcards, bases_mask=config.get("bases_mask", None), info=info, run_dir=config["run_dir"]),
-		custom_flags = config.get("bcl2fastq_args", ""),
-		output_path = os.path.join(config["output_dir"], "fastqs") # DO NOT CHANGE - downstream rules will search for FASTQs in this directory
-	# conda: "bcl2fastq"
-	envmodules: "bcl2fastq/2.20.0.422"
-	message: "Making FASTQ files for {wildcards.lib}"
-	shell:
-		"""
-		( \
-		mkdir -p stamps/bcl2fastq && \
-		mkdir -p {params.output_path}/{wildcards.lib} && \
-		bcl2fastq \
-			--runfolder-dir={params.run_path} \
-			--sample-sheet={params.samplesheet_path}/{wildcards.lib}.csv \
-			--processing-threads={threads} \
-			{params.bases_mask_flag} {params.custom_flags} \
-			--output-dir={params.output_path}/{wildcards.lib} && \
-		find {params.output_path}/{wildcards.lib} -type f -name 'Undetermined_S0_*.fastq.gz' -exec rm -rf {{}} \; && \
-		touch {output} \
-		) > {log} 2>&1
-		"""
+scripts_dir = config.get("scripts_dir", "resources/scripts")
+
+# Define rules
+if config.get("merge_demux", False):
+	# Merged demultiplexing: one bcl2fastq job per group of compatible libraries in a run folder
+	demux_plan = read_demux_plan(config.get("metadata_dir", "metadata"))
+
+	rule bcl2fastq_demux:
+		output: os.path.abspath("stamps/bcl2fastq_demux/{group}.stamp")
+		log: os.path.abspath("logs/bcl2fastq_demux/{group}.log")
+		benchmark: os.path.abspath("benchmarks/bcl2fastq_demux/{group}.tsv")
+		threads: 1
+		params:
+			run_path = lambda wildcards: get_demux_run_path(wildcards, plan=demux_plan, run_dir=config["run_dir"]),
+			samplesheet_path = os.path.abspath(os.path.join(config.get("metadata_dir", "metadata"), "bcl2fastq", "demux")),
+			bases_mask_flag = lambda wildcards: get_demux_bases_mask_flag(wildcards, plan=demux_plan),
+			barcode_mismatches_flag = lambda wildcards: get_demux_barcode_mismatches_flag(wildcards, metadata_dir=config.get("metadata_dir", "metadata"), custom_flags=config.get("bcl2fastq_args", "")),
+			custom_flags = config.get("bcl2fastq_args", ""),
+			output_path = os.path.join(config["output_dir"], "demux")
+		# conda: "bcl2fastq"
+		envmodules: "bcl2fastq/2.20.0.422"
+		message: "Making FASTQ files for {wildcards.group}"
+		shell:
+			"""
+			( \
+			mkdir -p stamps/bcl2fastq_demux && \
+			mkdir -p {params.output_path}/{wildcards.group} && \
+			bcl2fastq \
+				--runfolder-dir={params.run_path} \
+				--sample-sheet={params.samplesheet_path}/{wildcards.group}.csv \
+				--processing-threads={threads} \
+				{params.bases_mask_flag} {params.barcode_mismatches_flag} {params.custom_flags} \
+				--output-dir={params.output_path}/{wildcards.group} && \
+			find {params.output_path}/{wildcards.group} -type f -name 'Undetermined_S0_*.fastq.gz' -exec rm -rf {{}} \; && \
+			touch {output} \
+			) > {log} 2>&1
+			"""
+
+	rule bcl2fastq_link:
+		input: lambda wildcards: os.path.abspath(f"stamps/bcl2fastq_demux/{get_demux_group(wildcards, plan=demux_plan)}.stamp")
+		output: os.path.abspath("stamps/bcl2fastq/{lib}.stamp")
+		log: os.path.abspath("logs/bcl2fastq_link/{lib}.log")
+		benchmark: os.path.abspath("benchmarks/bcl2fastq_link/{lib}.tsv")
+		threads: 1
+		params:
+			demux_path = lambda wildcards: os.path.join(config["output_dir"], "demux", get_demux_group(wildcards, plan=demux_plan)),
+			plan_path = os.path.abspath(os.path.join(config.get("metadata_dir", "metadata"), "bcl2fastq", "demux.json")),
+			script_path = scripts_dir if os.path.isabs(scripts_dir) else os.path.join(workflow.basedir, scripts_dir),
+			output_path = os.path.join(config["output_dir"], "fastqs") # DO NOT CHANGE - downstream rules will search for FASTQs in this directory
+		# conda: "seqtk"
+		envmodules: "seqtk"
+		message: "Linking FASTQ files for {wildcards.lib}"
+		shell:
+			"""
+			( \
+			mkdir -p stamps/bcl2fastq && \
+			{params.script_path}/demux.py \
+				--demuxdir={params.demux_path} \
+				--plan={params.plan_path} \
+				--lib={wildcards.lib} \
+				--outdir={params.output_path}/{wildcards.lib} \
+				--stamp={output} \
+				--threads={threads} \
+			) > {log} 2>&1
+			"""
+elif config.get("scatter_lanes", False):
+	# Lane scatter: one bcl2fastq job per lane for each library, gathered into the library FASTQ directory
+	assert "--no-lane-splitting" not in config.get("bcl2fastq_args", ""), "'bcl2fastq_args' must not contain --no-lane-splitting if 'scatter_lanes' is enabled."
+
+	rule bcl2fastq_lane:
+		output: os.path.abspath("stamps/bcl2fastq_lane/{lib}/{lane}.stamp")
+		log: os.path.abspath("logs/bcl2fastq_lane/{lib}/{lane}.log")
+		benchmark: os.path.abspath("benchmarks/bcl2fastq_lane/{lib}/{lane}.tsv")
+		wildcard_constraints:
+			lane = r"\d+"
+		threads: 1
+		params:
+			run_path = lambda wildcards: get_run_path(wildcards, info=info, run_dir=config["run_dir"]),
+			samplesheet_path = os.path.abspath(os.path.join(config.get("metadata_dir", "metadata"), "bcl2fastq")),
+			bases_mask_flag = lambda wildcards: get_bases_mask_flag(wildcards, bases_mask=config.get("bases_mask", None), info=info, run_dir=config["run_dir"], cache_dir=config.get("cache_dir", ".cache")),
+			barcode_mismatches_flag = lambda wildcards: get_barcode_mismatches_flag(wildcards, metadata_dir=config.get("metadata_dir", "metadata"), custom_flags=config.get("bcl2fastq_args", "")),
+			custom_flags = config.get("bcl2fastq_args", ""),
+			output_path = os.path.join(config["output_dir"], "lanes")
+		# conda: "bcl2fastq"
+		envmodules: "bcl2fastq/2.20.0.422"
+		message: "Making FASTQ files for {wildcards.lib} lane {wildcards.lane}"
+		shell:
+			"""
+			( \
+			mkdir -p stamps/bcl2fastq_lane/{wildcards.lib} && \
+			mkdir -p {params.output_path}/{wildcards.lib}/{wildcards.lane} && \
+			bcl2fastq \
+				--runfolder-dir={params.run_path} \
+				--sample-sheet={params.samplesheet_path}/{wildcards.lib}.csv \
+				--processing-threads={threads} \
+				--tiles=s_{wildcards.lane}_ \
+				{params.bases_mask_flag} {params.barcode_mismatches_flag} {params.custom_flags} \
+				--output-dir={params.output_path}/{wildcards.lib}/{wildcards.lane} && \
+			find {params.output_path}/{wildcards.lib}/{wildcards.lane} -type f -name 'Undetermined_S0_*.fastq.gz' -exec rm -rf {{}} \; && \
+			touch {output} \
+			) > {log} 2>&1
+			"""
+
+	rule bcl2fastq_gather:
+		input: lambda wildcards: get_lane_stamps(wildcards, info=info, metadata_dir=config.get("metadata_dir", "metadata"), run_dir=config["run_dir"], cache_dir=config.get("cache_dir", ".cache"))
+		output: os.path.abspath("stamps/bcl2fastq/{lib}.stamp")
+		log: os.path.abspath("logs/bcl2fastq_gather/{lib}.log")
+		benchmark: os.path.abspath("benchmarks/bcl2fastq_gather/{lib}.tsv")
+		threads: 1
+		params:
+			lanes = lambda wildcards: ",".join(str(x) for x in get_lanes(wildcards, info=info, metadata_dir=config.get("metadata_dir", "metadata"), run_dir=config["run_dir"], cache_dir=config.get("cache_dir", ".cache"))),
+			lane_path = os.path.join(config["output_dir"], "lanes"),
+			script_path = scripts_dir if os.path.isabs(scripts_dir) else os.path.join(workflow.basedir, scripts_dir),
+			output_path = os.path.join(config["output_dir"], "fastqs") # DO NOT CHANGE - downstream rules will search for FASTQs in this directory
+		message: "Gathering FASTQ files for {wildcards.lib}"
+		shell:
+			"""
+			( \
+			mkdir -p stamps/bcl2fastq && \
+			{params.script_path}/gather_lanes.py \
+				--lanedir={params.lane_path}/{wildcards.lib} \
+				--lanes={params.lanes} \
+				--outdir={params.output_path}/{wildcards.lib} \
+				--stamp={output} \
+			) > {log} 2>&1
+			"""
+else:
+	rule bcl2fastq:
+		output: os.path.abspath("stamps/bcl2fastq/{lib}.stamp")
+		log: os.path.abspath("logs/bcl2fastq/{lib}.log")
+		benchmark: os.path.abspath("benchmarks/bcl2fastq/{lib}.tsv")
+		threads: 1
+		params:
+			run_path = lambda wildcards: get_run_path(wildcards, info=info, run_dir=config["run_dir"]),
+			samplesheet_path = os.path.abspath(os.path.join(config.get("metadata_dir", "metadata"), "bcl2fastq")),
+			bases_mask_flag = lambda wildcards: get_bases_mask_flag(wildcards, bases_mask=config.get("bases_mask", None), info=info, run_dir=config["run_dir"], cache_dir=config.get("cache_dir", ".cache")),
+			barcode_mismatches_flag = lambda wildcards: get_barcode_mismatches_flag(wildcards, metadata_dir=config.get("metadata_dir", "metadata"), custom_flags=config.get("bcl2fastq_args", "")),
+			custom_flags = config.get("bcl2fastq_args", ""),
+			script_path = scripts_dir if os.path.isabs(scripts_dir) else os.path.join(workflow.basedir, scripts_dir),
+			output_path = os.path.join(config["output_dir"], "fastqs") # DO NOT CHANGE - downstream rules will search for FASTQs in this directory
+		# conda: "bcl2fastq"
+		envmodules: "bcl2fastq/2.20.0.422"
+		message: "Making FASTQ files for {wildcards.lib}"
+		shell:
+			"""
+			( \
+			mkdir -p stamps/bcl2fastq && \
+			mkdir -p {params.output_path}/{wildcards.lib} && \
+			bcl2fastq \
+				--runfolder-dir={params.run_path} \
+				--sample-sheet={params.samplesheet_path}/{wildcards.lib}.csv \
+				--processing-threads={threads} \
+				{params.bases_mask_flag} {params.barcode_mismatches_flag} {params.custom_flags} \
+				--output-dir={params.output_path}/{wildcards.lib} && \
+			find {params.output_path}/{wildcards.lib} -type f -name 'Undetermined_S0_*.fastq.gz' -exec rm -rf {{}} \; && \
+			touch {output} && \
+			{params.script_path}/fastq_manifest.py \
+				--fastqdir={params.output_path}/{wildcards.lib} \
+				--stamp={output} \
+			) > {log} 2>&1
+			"""
 
 	
 # Set rule targets
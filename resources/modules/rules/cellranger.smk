@@ -10,7 +10,12 @@ rule cellranger:
 	input: lambda wildcards: get_count_inputs(wildcards, lib_types={"GEX", "ADT", "HTO", "CRISPR"}, info=info, read_trim=True if "read_trim" in config.keys() else False),
 	output: os.path.abspath("stamps/cellranger/{sample}.stamp")
 	log: os.path.abspath("logs/cellranger/{sample}.log")
+	benchmark: os.path.abspath("benchmarks/cellranger/{sample}.tsv")
 	threads: 1
+	resources:
+		mem_mb = lambda wildcards, attempt: get_job_resource(wildcards, attempt, resource="mem_mb", rule="cellranger", lib_types={"GEX", "ADT", "HTO", "CRISPR"}, info=info, output_dir=config["output_dir"], references=[config["cellranger_reference"]], read_trim=True if "read_trim" in config.keys() else False),
+		runtime = lambda wildcards, attempt: get_job_resource(wildcards, attempt, resource="runtime", rule="cellranger", lib_types={"GEX", "ADT", "HTO", "CRISPR"}, info=info, output_dir=config["output_dir"], references=[config["cellranger_reference"]], read_trim=True if "read_trim" in config.keys() else False),
+		disk_mb = lambda wildcards, attempt: get_job_resource(wildcards, attempt, resource="disk_mb", rule="cellranger", lib_types={"GEX", "ADT", "HTO", "CRISPR"}, info=info, output_dir=config["output_dir"], references=[config["cellranger_reference"]], read_trim=True if "read_trim" in config.keys() else False)
 	params: 
 		librarysheet_path = os.path.abspath(os.path.join(config.get("metadata_dir", "metadata"), "cellranger")),
 		feature_ref_flag = f"--feature-ref={os.path.abspath(os.path.join(config.get('metadata_dir', 'metadata'), config['features']))}" if "features" in config else "",
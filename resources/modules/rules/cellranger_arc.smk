@@ -10,7 +10,12 @@ rule cellranger_arc:
 	input: lambda wildcards: get_count_inputs(wildcards, lib_types={"GEX", "ATAC"}, info=info, read_trim=True if "read_trim" in config.keys() else False),
 	output: os.path.abspath("stamps/cellranger_arc/{sample}.stamp")
 	log: os.path.abspath("logs/cellranger_arc/{sample}.log")
+	benchmark: os.path.abspath("benchmarks/cellranger_arc/{sample}.tsv")
 	threads: 1
+	resources:
+		mem_mb = lambda wildcards, attempt: get_job_resource(wildcards, attempt, resource="mem_mb", rule="cellranger_arc", lib_types={"GEX", "ATAC"}, info=info, output_dir=config["output_dir"], references=[config["cellranger_reference"]], read_trim=True if "read_trim" in config.keys() else False),
+		runtime = lambda wildcards, attempt: get_job_resource(wildcards, attempt, resource="runtime", rule="cellranger_arc", lib_types={"GEX", "ATAC"}, info=info, output_dir=config["output_dir"], references=[config["cellranger_reference"]], read_trim=True if "read_trim" in config.keys() else False),
+		disk_mb = lambda wildcards, attempt: get_job_resource(wildcards, attempt, resource="disk_mb", rule="cellranger_arc", lib_types={"GEX", "ATAC"}, info=info, output_dir=config["output_dir"], references=[config["cellranger_reference"]], read_trim=True if "read_trim" in config.keys() else False)
 	params: 
 		librarysheet_path = os.path.abspath(os.path.join(config.get("metadata_dir", "metadata"), "cellranger_arc")),
 		reference = config["cellranger_reference"],
@@ -10,7 +10,12 @@ rule cellranger_multi:
 	input: lambda wildcards: get_count_inputs(wildcards, lib_types={"GEX", "ADT", "HTO", "CRISPR", "BCR", "TCR"}, info=info, read_trim=True if "read_trim" in config.keys() else False),
 	output: os.path.abspath("stamps/cellranger_multi/{sample}.stamp")
 	log: os.path.abspath("logs/cellranger_multi/{sample}.log")
+	benchmark: os.path.abspath("benchmarks/cellranger_multi/{sample}.tsv")
 	threads: 1
+	resources:
+		mem_mb = lambda wildcards, attempt: get_job_resource(wildcards, attempt, resource="mem_mb", rule="cellranger_multi", lib_types={"GEX", "ADT", "HTO", "CRISPR", "BCR", "TCR"}, info=info, output_dir=config["output_dir"], references=[config[x] for x in ("cellranger_reference", "cellranger_vdj_reference") if config.get(x, None)], read_trim=True if "read_trim" in config.keys() else False),
+		runtime = lambda wildcards, attempt: get_job_resource(wildcards, attempt, resource="runtime", rule="cellranger_multi", lib_types={"GEX", "ADT", "HTO", "CRISPR", "BCR", "TCR"}, info=info, output_dir=config["output_dir"], references=[config[x] for x in ("cellranger_reference", "cellranger_vdj_reference") if config.get(x, None)], read_trim=True if "read_trim" in config.keys() else False),
+		disk_mb = lambda wildcards, attempt: get_job_resource(wildcards, attempt, resource="disk_mb", rule="cellranger_multi", lib_types={"GEX", "ADT", "HTO", "CRISPR", "BCR", "TCR"}, info=info, output_dir=config["output_dir"], references=[config[x] for x in ("cellranger_reference", "cellranger_vdj_reference") if config.get(x, None)], read_trim=True if "read_trim" in config.keys() else False)
 	params: 
 		librarysheet_path = os.path.abspath(os.path.join(config.get("metadata_dir", "metadata"), "cellranger")),
 		custom_flags = config.get("cellranger_args", ""),
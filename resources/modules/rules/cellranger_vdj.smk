@@ -10,7 +10,12 @@ rule cellranger_vdj:
 	input: lambda wildcards: get_count_inputs(wildcards, lib_types={"BCR", "TCR"}, info=info, read_trim=True if "read_trim" in config.keys() else False),
 	output: os.path.abspath("stamps/cellranger_vdj/{sample}.stamp")
 	log: os.path.abspath("logs/cellranger_vdj/{sample}.log")
+	benchmark: os.path.abspath("benchmarks/cellranger_vdj/{sample}.tsv")
 	threads: 1
+	resources:
+		mem_mb = lambda wildcards, attempt: get_job_resource(wildcards, attempt, resource="mem_mb", rule="cellranger_vdj", lib_types={"BCR", "TCR"}, info=info, output_dir=config["output_dir"], references=[config["cellranger_vdj_reference"]], read_trim=True if "read_trim" in config.keys() else False),
+		runtime = lambda wildcards, attempt: get_job_resource(wildcards, attempt, resource="runtime", rule="cellranger_vdj", lib_types={"BCR", "TCR"}, info=info, output_dir=config["output_dir"], references=[config["cellranger_vdj_reference"]], read_trim=True if "read_trim" in config.keys() else False),
+		disk_mb = lambda wildcards, attempt: get_job_resource(wildcards, attempt, resource="disk_mb", rule="cellranger_vdj", lib_types={"BCR", "TCR"}, info=info, output_dir=config["output_dir"], references=[config["cellranger_vdj_reference"]], read_trim=True if "read_trim" in config.keys() else False)
 	params: 
 		fastqdirs = lambda wildcards: get_count_fastqdirs(wildcards, lib_types={"BCR", "TCR"}, info=info, output_dir=config["output_dir"])
 		reference = config["cellranger_vdj_reference"],
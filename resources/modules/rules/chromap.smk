@@ -5,20 +5,29 @@
 # Requires outputs from resources/rules/bcl2fastq.smk
 ##########################################################################################
 
+scripts_dir = config.get("scripts_dir", "resources/scripts")
+
 # Define rule
 rule chromap:
 	input: lambda wildcards: get_count_inputs(wildcards, lib_types={"ATAC"}, info=info, read_trim=True if "read_trim" in config.keys() else False),
+		whitelist = os.path.abspath("stamps/whitelist_cache/atac.stamp")
 	output: os.path.abspath("stamps/chromap/{sample}.stamp")
 	log: os.path.abspath("logs/chromap/{sample}.log")
+	benchmark: os.path.abspath("benchmarks/chromap/{sample}.tsv")
 	threads: 1
+	resources:
+		mem_mb = lambda wildcards, attempt: get_job_resource(wildcards, attempt, resource="mem_mb", rule="chromap", lib_types={"ATAC"}, info=info, output_dir=config["output_dir"], references=[config["chromap_index"]], read_trim=True if "read_trim" in config.keys() else False),
+		runtime = lambda wildcards, attempt: get_job_resource(wildcards, attempt, resource="runtime", rule="chromap", lib_types={"ATAC"}, info=info, output_dir=config["output_dir"], references=[config["chromap_index"]], read_trim=True if "read_trim" in config.keys() else False),
+		disk_mb = lambda wildcards, attempt: get_job_resource(wildcards, attempt, resource="disk_mb", rule="chromap", lib_types={"ATAC"}, info=info, output_dir=config["output_dir"], references=[config["chromap_index"]], read_trim=True if "read_trim" in config.keys() else False)
 	params: 
-		R1_fastqs = lambda wildcards: get_count_fastqs(wildcards, lib_types={"ATAC"}, read="R1", info=info, output_dir=config["output_dir"]),
-		R2_fastqs = lambda wildcards: get_count_fastqs(wildcards, lib_types={"ATAC"}, read="R2", info=info, output_dir=config["output_dir"]),
-		R3_fastqs = lambda wildcards: get_count_fastqs(wildcards, lib_types={"ATAC"}, read="R3", info=info, output_dir=config["output_dir"]),
+		R1_fastqs = lambda wildcards: get_count_fastqs(wildcards, lib_types={"ATAC"}, read="R1", info=info, output_dir=config["output_dir"], read_trim=True if "read_trim" in config.keys() else False),
+		R2_fastqs = lambda wildcards: get_count_fastqs(wildcards, lib_types={"ATAC"}, read="R2", info=info, output_dir=config["output_dir"], read_trim=True if "read_trim" in config.keys() else False),
+		R3_fastqs = lambda wildcards: get_count_fastqs(wildcards, lib_types={"ATAC"}, read="R3", info=info, output_dir=config["output_dir"], read_trim=True if "read_trim" in config.keys() else False),
 		index = config["chromap_index"],
 		reference = config["chromap_reference"],
-		whitelist = config["atac_barcode_whitelist"],
+		whitelist = os.path.join(config["output_dir"], ".pipeline", "whitelists", "atac.txt"),
 		custom_flags = config.get("chromap_args", ""),
+		script_path = scripts_dir if os.path.isabs(scripts_dir) else os.path.join(workflow.basedir, scripts_dir),
 		output_path = os.path.join(config["output_dir"], "chromap_macs2") # DO NOT CHANGE - downstream rules will search for fragment files and mapping statistics in this directory
 	conda: "chromap"
 	# envmodules:
@@ -30,19 +39,22 @@ rule chromap:
 		( \
 		mkdir -p stamps/chromap && \
 		mkdir -p {params.output_path}/{wildcards.sample} && \
-		chromap \
-			-1 {params.R1_fastqs} \
-			-2 {params.R3_fastqs} \
-			-b {params.R2_fastqs} \
-			-x {params.index} \
-			-r {params.reference} \
-			--barcode-whitelist <(zcat {params.whitelist}) \
-			-o {params.output_path}/{wildcards.sample}/fragments.tsv \
-			--summary {params.output_path}/{wildcards.sample}/chromap_summary.csv \
-			{params.custom_flags} \
-			-t {threads} && \
-		bgzip -f -@ {threads} {params.output_path}/{wildcards.sample}/fragments.tsv && \
-		tabix -p bed {params.output_path}/{wildcards.sample}/fragments.tsv.gz && \
+		{params.script_path}/stream_bgzip.py \
+			--output={params.output_path}/{wildcards.sample}/fragments.tsv.gz \
+			--preset=bed \
+			--threads={threads} \
+			-- \
+			chromap \
+				-1 {params.R1_fastqs} \
+				-2 {params.R3_fastqs} \
+				-b {params.R2_fastqs} \
+				-x {params.index} \
+				-r {params.reference} \
+				--barcode-whitelist {params.whitelist} \
+				-o '{{fifo}}' \
+				--summary {params.output_path}/{wildcards.sample}/chromap_summary.csv \
+				{params.custom_flags} \
+				-t {threads} && \
 		touch {output} \
 		) > {log} 2>&1
 		cp {log} {params.output_path}/{wildcards.sample}/chromap.out
@@ -5,32 +5,131 @@
 # Requires outputs from resources/rules/bcl2fastq.smk or resources/rules/trimfastq.smk
 ##########################################################################################
 
-# Define rule
-rule fastqc:
-	input: lambda wildcards: get_fastqc_inputs(wildcards, info=info, read_trim=True if "read_trim" in config.keys() else False)
-	output: os.path.abspath("stamps/fastqc/{lib}.stamp")
-	log: os.path.abspath("logs/fastqc/{lib}.log")
-	threads: 1
-	params:
-		fastqs = lambda wildcards: get_fastqc_fastqs(wildcards, info=info, output_dir=config["output_dir"]),
-		custom_flags = config.get("fastqc_args", ""),
-		output_path = os.path.join(config["output_dir"], "qc/fastqc")
-	# conda: "fastqc"
-	envmodules: "fastqc/0.11.9"
-	message: "Performing QC for FASTQ files for {wildcards.lib}"
-	shell:
-		"""
-		( \
-		mkdir -p stamps/fastqc && \
-		mkdir -p {params.output_path}/{wildcards.lib} && \
-		fastqc \
-			--threads={threads} \
-			{params.custom_flags} \
-			--outdir={params.output_path}/{wildcards.lib} \
-			{params.fastqs} && \
-		touch {output} \
-		) > {log} 2>&1
-		"""
+scripts_dir = config.get("scripts_dir", "resources/scripts")
+
+# Define rules
+if config.get("fastqc_mode", "full") == "sampled":
+	# Sampled QC: per-position quality and base composition from a bounded number of reads per FASTQ file
+	rule fastqc:
+		input: lambda wildcards: get_fastqc_inputs(wildcards, info=info, read_trim=True if "read_trim" in config.keys() else False)
+		output: os.path.abspath("stamps/fastqc/{lib}.stamp")
+		log: os.path.abspath("logs/fastqc/{lib}.log")
+		benchmark: os.path.abspath("benchmarks/fastqc/{lib}.tsv")
+		threads: 1
+		params:
+			fastqs = lambda wildcards: get_fastqc_fastqs(wildcards, info=info, output_dir=config["output_dir"], read_trim=True if "read_trim" in config.keys() else False),
+			reads = config.get("fastqc_sample_reads", 200000),
+			method = config.get("fastqc_sample_method", "head"),
+			script_path = scripts_dir if os.path.isabs(scripts_dir) else os.path.join(workflow.basedir, scripts_dir),
+			output_path = os.path.join(config["output_dir"], "qc/fastqc")
+		message: "Performing sampled QC for FASTQ files for {wildcards.lib}"
+		shell:
+			"""
+			( \
+			mkdir -p stamps/fastqc && \
+			mkdir -p {params.output_path}/{wildcards.lib} && \
+			{params.script_path}/sampled_qc.py \
+				--outdir={params.output_path}/{wildcards.lib} \
+				--reads={params.reads} \
+				--method={params.method} \
+				--threads={threads} \
+				{params.fastqs} && \
+			touch {output} \
+			) > {log} 2>&1
+			"""
+elif config.get("fastqc_mode", "full") == "scatter":
+	# FastQC scatter: one FastQC job per FASTQ file (or per chunk of FASTQ files up to a byte budget), gathered per library
+	checkpoint fastqc_plan:
+		input: lambda wildcards: get_fastqc_inputs(wildcards, info=info, read_trim=True if "read_trim" in config.keys() else False)
+		output: os.path.abspath("stamps/fastqc_plan/{lib}.json")
+		log: os.path.abspath("logs/fastqc_plan/{lib}.log")
+		threads: 1
+		params:
+			fastq_path = os.path.join(config["output_dir"], "fastqs"),
+			budget = config.get("fastqc_scatter_bytes", 0),
+			script_path = scripts_dir if os.path.isabs(scripts_dir) else os.path.join(workflow.basedir, scripts_dir)
+		message: "Planning QC jobs for FASTQ files for {wildcards.lib}"
+		shell:
+			"""
+			( \
+			mkdir -p stamps/fastqc_plan && \
+			{params.script_path}/fastqc_plan.py \
+				--fastqdir={params.fastq_path}/{wildcards.lib} \
+				--stamp={input} \
+				--output={output} \
+				--budget={params.budget} \
+			) > {log} 2>&1
+			"""
+
+	rule fastqc_chunk:
+		# Plan is rewritten when any FASTQ file changes; chunks of unchanged FASTQ files keep their IDs and stamps
+		input: ancient(os.path.abspath("stamps/fastqc_plan/{lib}.json"))
+		output: os.path.abspath("stamps/fastqc_chunk/{lib}/{chunk}.stamp")
+		log: os.path.abspath("logs/fastqc_chunk/{lib}/{chunk}.log")
+		benchmark: os.path.abspath("benchmarks/fastqc_chunk/{lib}/{chunk}.tsv")
+		threads: 1
+		params:
+			fastqs = lambda wildcards: get_fastqc_chunk_fastqs(wildcards),
+			custom_flags = config.get("fastqc_args", ""),
+			output_path = os.path.join(config["output_dir"], "qc/fastqc")
+		# conda: "fastqc"
+		envmodules: "fastqc/0.11.9"
+		message: "Performing QC for FASTQ files for {wildcards.lib} (chunk {wildcards.chunk})"
+		shell:
+			"""
+			( \
+			mkdir -p stamps/fastqc_chunk/{wildcards.lib} && \
+			mkdir -p {params.output_path}/{wildcards.lib} && \
+			fastqc \
+				--threads={threads} \
+				{params.custom_flags} \
+				--outdir={params.output_path}/{wildcards.lib} \
+				{params.fastqs} && \
+			touch {output} \
+			) > {log} 2>&1
+			"""
+
+	rule fastqc_gather:
+		input: lambda wildcards: get_fastqc_chunk_stamps(wildcards, checkpoint=checkpoints.fastqc_plan)
+		output: os.path.abspath("stamps/fastqc/{lib}.stamp")
+		log: os.path.abspath("logs/fastqc_gather/{lib}.log")
+		benchmark: os.path.abspath("benchmarks/fastqc_gather/{lib}.tsv")
+		threads: 1
+		message: "Gathering QC for FASTQ files for {wildcards.lib}"
+		shell:
+			"""
+			( \
+			mkdir -p stamps/fastqc && \
+			touch {output} \
+			) > {log} 2>&1
+			"""
+else:
+	rule fastqc:
+		input: lambda wildcards: get_fastqc_inputs(wildcards, info=info, read_trim=True if "read_trim" in config.keys() else False)
+		output: os.path.abspath("stamps/fastqc/{lib}.stamp")
+		log: os.path.abspath("logs/fastqc/{lib}.log")
+		benchmark: os.path.abspath("benchmarks/fastqc/{lib}.tsv")
+		threads: 1
+		params:
+			fastqs = lambda wildcards: get_fastqc_fastqs(wildcards, info=info, output_dir=config["output_dir"], read_trim=True if "read_trim" in config.keys() else False),
+			custom_flags = config.get("fastqc_args", ""),
+			output_path = os.path.join(config["output_dir"], "qc/fastqc")
+		# conda: "fastqc"
+		envmodules: "fastqc/0.11.9"
+		message: "Performing QC for FASTQ files for {wildcards.lib}"
+		shell:
+			"""
+			( \
+			mkdir -p stamps/fastqc && \
+			mkdir -p {params.output_path}/{wildcards.lib} && \
+			fastqc \
+				--threads={threads} \
+				{params.custom_flags} \
+				--outdir={params.output_path}/{wildcards.lib} \
+				{params.fastqs} && \
+			touch {output} \
+			) > {log} 2>&1
+			"""
 
 # Set rule targets
 fastqc = [f"stamps/fastqc/{lib}.stamp" for lib in libs]
\ No newline at end of file
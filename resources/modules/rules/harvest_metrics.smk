@@ -0,0 +1,42 @@
+##########################################################################################
+# Snakemake rule for harvesting tool metrics
+# Author: Redwan Farooq
+# Requires outputs from resources/rules/starsolo.smk
+# Requires outputs from resources/rules/chromap.smk
+# Requires outputs from resources/rules/macs2.smk
+# Requires outputs from resources/rules/barcounter.smk
+# Requires outputs from resources/rules/cellranger*.smk
+##########################################################################################
+
+scripts_dir = config.get("scripts_dir", "resources/scripts")
+
+# Define rule
+rule harvest_metrics:
+	input: [os.path.abspath(path) for path in expand("stamps/{rule}/{sample}.stamp", rule=[rule for rule in module_rules if rule in {"starsolo", "chromap", "barcounter", "cellranger", "cellranger_atac", "cellranger_arc", "cellranger_vdj", "cellranger_multi"}] + (["fragment_stats"] if "macs2" in module_rules else []), sample=samples)]
+	output: os.path.abspath("stamps/harvest_metrics/harvest_metrics.stamp")
+	log: os.path.abspath("logs/harvest_metrics/harvest_metrics.log")
+	benchmark: os.path.abspath("benchmarks/harvest_metrics/harvest_metrics.tsv")
+	threads: 1
+	params:
+		script_path = scripts_dir if os.path.isabs(scripts_dir) else os.path.join(workflow.basedir, scripts_dir),
+		input_dir = config["output_dir"],
+		samples = ",".join(samples),
+		output_path = os.path.join(config["output_dir"], "qc/metrics")
+	conda: "metrics"
+	message: "Harvesting tool metrics"
+	shell:
+		"""
+		( \
+		mkdir -p stamps/harvest_metrics && \
+		{params.script_path}/harvest_metrics.py \
+			--inputdir={params.input_dir} \
+			--samples={params.samples} \
+			--outdir={params.output_path} \
+			--threads={threads} && \
+		touch {output} \
+		) > {log} 2>&1
+		"""
+
+
+# Set rule targets
+harvest_metrics = ["stamps/harvest_metrics/harvest_metrics.stamp"]
\ No newline at end of file
@@ -5,23 +5,28 @@
 ##########################################################################################
 
 
+scripts_dir = config.get("scripts_dir", "resources/scripts")
+
 # Define rule
 rule linkfastq:
 	output: os.path.abspath("stamps/linkfastq/{lib}.stamp")
 	log: os.path.abspath("logs/linkfastq/{lib}.log")
+	benchmark: os.path.abspath("benchmarks/linkfastq/{lib}.tsv")
 	threads: 1
 	params:
 		run_path = lambda wildcards: get_run_path(wildcards, info=info, run_dir=config["run_dir"]),
 		lib_type = lambda wildcards: get_lib_type(wildcards, info=info),
+		script_path = scripts_dir if os.path.isabs(scripts_dir) else os.path.join(workflow.basedir, scripts_dir),
 		output_path = os.path.join(config["output_dir"], "fastqs") # DO NOT CHANGE - downstream rules will search for FASTQs in this directory
 	message: "Creating symbolic links to FASTQ files for {wildcards.lib}"
 	shell:
 		"""
 		( \
 		mkdir -p stamps/linkfastq && \
-		mkdir -p {params.output_path}/{wildcards.lib} && \
-		find {params.run_path}/{params.lib_type} -type f -name '*_R*_001.fastq.gz' -exec sh -c 'for file do echo $(date -u +"%F %T") Processing file: $file; ln -s $file {params.output_path}/{wildcards.lib}/$(basename $file); done' sh {{}} \; && \
-		touch {output} \
+		{params.script_path}/link_fastq.py \
+			--indir={params.run_path}/{params.lib_type} \
+			--outdir={params.output_path}/{wildcards.lib} \
+			--stamp={output} \
 		) > {log} 2>&1
 		"""
 
@@ -6,11 +6,12 @@
 
 scripts_dir = config.get("scripts_dir", "resources/scripts")
 
-# Define rule
+# Define rules
 rule macs2:
 	input: os.path.abspath("stamps/chromap/{sample}.stamp")
 	output: os.path.abspath("stamps/macs2/{sample}.stamp")
 	log: os.path.abspath("logs/macs2/{sample}.log")
+	benchmark: os.path.abspath("benchmarks/macs2/{sample}.tsv")
 	threads: 1
 	params:
 		custom_flags = config.get("macs2_args", ""),
@@ -35,13 +36,40 @@ rule macs2:
 			--fragments {params.output_path}/{wildcards.sample}/fragments.tsv.gz \
 			--peaks {params.output_path}/{wildcards.sample}/macs2_peaks.narrowPeak \
 			--threads {threads} && \
-		find {params.output_path}/{wildcards.sample}/raw_feature_bc_matrix -type f -name 'barcodes.tsv' -exec gzip -f {{}} \; && \
-		find {params.output_path}/{wildcards.sample}/raw_feature_bc_matrix -type f -name 'features.tsv' -exec gzip -f {{}} \; && \
-		find {params.output_path}/{wildcards.sample}/raw_feature_bc_matrix -type f -name 'matrix.mtx' -exec gzip -f {{}} \; && \
+		{params.script_path}/postprocess.py \
+			--dir={params.output_path}/{wildcards.sample} \
+			--matrix-dir=raw_feature_bc_matrix \
+			--no-index \
+			--threads={threads} && \
+		touch {output} \
+		) > {log} 2>&1
+		"""
+
+
+rule fragment_stats:
+	input: os.path.abspath("stamps/macs2/{sample}.stamp")
+	output: os.path.abspath("stamps/fragment_stats/{sample}.stamp")
+	log: os.path.abspath("logs/fragment_stats/{sample}.log")
+	benchmark: os.path.abspath("benchmarks/fragment_stats/{sample}.tsv")
+	threads: 1
+	params:
+		script_path = scripts_dir if os.path.isabs(scripts_dir) else os.path.join(workflow.basedir, scripts_dir),
+		output_path = os.path.join(config["output_dir"], "chromap_macs2") # DO NOT CHANGE - downstream rules will search for fragment statistics in this directory
+	message: "Calculating fragment statistics for {wildcards.sample}"
+	shell:
+		"""
+		( \
+		mkdir -p stamps/fragment_stats && \
+		{params.script_path}/fragment_stats.py \
+			--fragments={params.output_path}/{wildcards.sample}/fragments.tsv.gz \
+			--peaks={params.output_path}/{wildcards.sample}/macs2_peaks.narrowPeak \
+			--sample={wildcards.sample} \
+			--outdir={params.output_path}/{wildcards.sample} && \
 		touch {output} \
 		) > {log} 2>&1
 		"""
 
 
 # Set rule targets
-macs2 = [f"stamps/macs2/{sample}.stamp" for sample in samples]
\ No newline at end of file
+macs2 = [f"stamps/macs2/{sample}.stamp" for sample in samples]
+macs2.extend([f"stamps/fragment_stats/{sample}.stamp" for sample in samples])
\ No newline at end of file
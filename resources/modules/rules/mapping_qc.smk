@@ -11,9 +11,10 @@ scripts_dir = config.get("scripts_dir", "resources/scripts")
 
 # Define rule
 rule mapping_qc:
-	input: [os.path.abspath(path) for path in expand("stamps/{rule}/{sample}.stamp", rule=[rule for rule in module_rules if rule in {"starsolo", "barcounter", "chromap", "macs2"}], sample=samples)]
+	input: [os.path.abspath(path) for path in expand("stamps/{rule}/{sample}.stamp", rule=[rule for rule in module_rules if rule in {"starsolo", "barcounter", "chromap", "macs2"}] + (["fragment_stats"] if "macs2" in module_rules else []), sample=samples)]
 	output: os.path.abspath("stamps/mapping_qc/mapping_qc.stamp")
 	log: os.path.abspath("logs/mapping_qc/mapping_qc.log")
+	benchmark: os.path.abspath("benchmarks/mapping_qc/mapping_qc.tsv")
 	threads: 1
 	params:
 		script_path = scripts_dir if os.path.isabs(scripts_dir) else os.path.join(workflow.basedir, scripts_dir),
@@ -9,6 +9,7 @@ rule multiqc:
 	input: [os.path.abspath(path) for path in expand("stamps/fastqc/{lib}.stamp", lib=libs.keys())]
 	output: os.path.abspath("stamps/multiqc/multiqc.stamp")
 	log: os.path.abspath("logs/multiqc/multiqc.log")
+	benchmark: os.path.abspath("benchmarks/multiqc/multiqc.tsv")
 	threads: 1
 	params:
 		input_path = os.path.join(config["output_dir"], "qc"),
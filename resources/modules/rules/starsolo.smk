@@ -5,43 +5,120 @@
 # Requires outputs from resources/rules/bcl2fastq.smk
 ##########################################################################################
 
-# Define rule
-rule starsolo:
-	input: lambda wildcards: get_count_inputs(wildcards, lib_types={"GEX"}, info=info, read_trim=True if "read_trim" in config.keys() else False),
-	output: os.path.abspath("stamps/starsolo/{sample}.stamp")
-	log: os.path.abspath("logs/starsolo/{sample}.log")
-	threads: 1
-	params: 
-		R1_fastqs = lambda wildcards: get_count_fastqs(wildcards, lib_types={"GEX"}, read="R1", info=info, output_dir=config["output_dir"]),
-		R2_fastqs = lambda wildcards: get_count_fastqs(wildcards, lib_types={"GEX"}, read="R2", info=info, output_dir=config["output_dir"]),
-		reference = config["starsolo_reference"],
-		whitelist = config["gex_barcode_whitelist"],
-		custom_flags = config.get("starsolo_args", ""),
-		output_path = os.path.join(config["output_dir"], "starsolo") # DO NOT CHANGE - downstream rules will search for mapping statistics in this directory
-	# conda: "starsolo"
-	envmodules:
-		"STAR/2.7.11a",
-		"samtools/1.17"
-	message: "Making GEX count matrix for {wildcards.sample}"
-	shell:
-		"""
-		( \
-		mkdir -p stamps/starsolo && \
-		mkdir -p {params.output_path}/{wildcards.sample} && \
-		STAR \
-			--readFilesIn {params.R2_fastqs} {params.R1_fastqs} \
-			--genomeDir {params.reference} \
-			--soloCBwhitelist <(zcat {params.whitelist}) \
-			--outFileNamePrefix {params.output_path}/{wildcards.sample}/ \
-			{params.custom_flags} \
-			--runThreadN {threads} && \
-		find {params.output_path}/{wildcards.sample} -type f -name '*.bam' -exec samtools index -@ {threads} {{}} \; && \
-		find {params.output_path}/{wildcards.sample}/Solo.out -type f -name 'barcodes.tsv' -exec gzip -f {{}} \; && \
-		find {params.output_path}/{wildcards.sample}/Solo.out -type f -name 'features.tsv' -exec gzip -f {{}} \; && \
-		find {params.output_path}/{wildcards.sample}/Solo.out -type f -name 'matrix.mtx' -exec gzip -f {{}} \; && \
-		touch {output} \
-		) > {log} 2>&1
-		"""
+scripts_dir = config.get("scripts_dir", "resources/scripts")
+
+# Define rules
+if config.get("starsolo_batch_size", None):
+	# Batch mode: STAR genome is loaded once into shared memory for each batch of samples run on one node
+	starsolo_batches = read_starsolo_batches(config.get("metadata_dir", "metadata"))
+
+	rule starsolo_batch:
+		input: lambda wildcards: get_batch_inputs(wildcards, plan=starsolo_batches, lib_types={"GEX"}, info=info, read_trim=True if "read_trim" in config.keys() else False),
+			whitelist = os.path.abspath("stamps/whitelist_cache/gex.stamp")
+		output: os.path.abspath("stamps/starsolo_batch/{batch}.stamp")
+		log: os.path.abspath("logs/starsolo_batch/{batch}.log")
+		benchmark: os.path.abspath("benchmarks/starsolo_batch/{batch}.tsv")
+		threads: 1
+		resources:
+			mem_mb = lambda wildcards, attempt: get_batch_resource(wildcards, attempt, resource="mem_mb", rule="starsolo_batch", plan=starsolo_batches, lib_types={"GEX"}, info=info, output_dir=config["output_dir"], references=[config["starsolo_reference"]], read_trim=True if "read_trim" in config.keys() else False),
+			runtime = lambda wildcards, attempt: get_batch_resource(wildcards, attempt, resource="runtime", rule="starsolo_batch", plan=starsolo_batches, lib_types={"GEX"}, info=info, output_dir=config["output_dir"], references=[config["starsolo_reference"]], read_trim=True if "read_trim" in config.keys() else False),
+			disk_mb = lambda wildcards, attempt: get_batch_resource(wildcards, attempt, resource="disk_mb", rule="starsolo_batch", plan=starsolo_batches, lib_types={"GEX"}, info=info, output_dir=config["output_dir"], references=[config["starsolo_reference"]], read_trim=True if "read_trim" in config.keys() else False)
+		params:
+			plan = os.path.abspath(os.path.join(config.get("metadata_dir", "metadata"), "starsolo", "batches.json")),
+			info = os.path.abspath(os.path.join(config.get("metadata_dir", "metadata"), "info.yaml")),
+			fastq_path = os.path.join(config["output_dir"], "fastqs"),
+			reference = config["starsolo_reference"],
+			whitelist = os.path.join(config["output_dir"], ".pipeline", "whitelists", "gex.txt"),
+			custom_flags = config.get("starsolo_args", ""),
+			bam_sort_ram = config.get("starsolo_bam_sort_ram", 10000000000),
+			script_path = scripts_dir if os.path.isabs(scripts_dir) else os.path.join(workflow.basedir, scripts_dir),
+			output_path = os.path.join(config["output_dir"], "starsolo") # DO NOT CHANGE - downstream rules will search for mapping statistics in this directory
+		# conda: "starsolo"
+		envmodules:
+			"STAR/2.7.11a",
+			"samtools/1.17"
+		message: "Making GEX count matrices for {wildcards.batch}"
+		shell:
+			"""
+			( \
+			mkdir -p stamps/starsolo_batch && \
+			mkdir -p {params.output_path} && \
+			{params.script_path}/starsolo_batch.py \
+				--plan={params.plan} \
+				--batch={wildcards.batch} \
+				--info={params.info} \
+				--fastqdir={params.fastq_path} \
+				--reference={params.reference} \
+				--whitelist={params.whitelist} \
+				--outdir={params.output_path} \
+				--stamp={output} \
+				--flags="{params.custom_flags}" \
+				--bam-sort-ram={params.bam_sort_ram} \
+				--threads={threads} \
+			) > {log} 2>&1
+			"""
+
+	rule starsolo_check:
+		input: lambda wildcards: os.path.abspath(f"stamps/starsolo_batch/{get_starsolo_batch(wildcards, plan=starsolo_batches)}.stamp")
+		output: os.path.abspath("stamps/starsolo/{sample}.stamp")
+		log: os.path.abspath("logs/starsolo_check/{sample}.log")
+		benchmark: os.path.abspath("benchmarks/starsolo_check/{sample}.tsv")
+		threads: 1
+		params:
+			output_path = os.path.join(config["output_dir"], "starsolo")
+		message: "Checking GEX count matrix for {wildcards.sample}"
+		shell:
+			"""
+			( \
+			mkdir -p stamps/starsolo && \
+			test -d {params.output_path}/{wildcards.sample}/Solo.out && \
+			touch {output} \
+			) > {log} 2>&1
+			"""
+else:
+	rule starsolo:
+		input: lambda wildcards: get_count_inputs(wildcards, lib_types={"GEX"}, info=info, read_trim=True if "read_trim" in config.keys() else False),
+			whitelist = os.path.abspath("stamps/whitelist_cache/gex.stamp")
+		output: os.path.abspath("stamps/starsolo/{sample}.stamp")
+		log: os.path.abspath("logs/starsolo/{sample}.log")
+		benchmark: os.path.abspath("benchmarks/starsolo/{sample}.tsv")
+		threads: 1
+		resources:
+			mem_mb = lambda wildcards, attempt: get_job_resource(wildcards, attempt, resource="mem_mb", rule="starsolo", lib_types={"GEX"}, info=info, output_dir=config["output_dir"], references=[config["starsolo_reference"]], read_trim=True if "read_trim" in config.keys() else False),
+			runtime = lambda wildcards, attempt: get_job_resource(wildcards, attempt, resource="runtime", rule="starsolo", lib_types={"GEX"}, info=info, output_dir=config["output_dir"], references=[config["starsolo_reference"]], read_trim=True if "read_trim" in config.keys() else False),
+			disk_mb = lambda wildcards, attempt: get_job_resource(wildcards, attempt, resource="disk_mb", rule="starsolo", lib_types={"GEX"}, info=info, output_dir=config["output_dir"], references=[config["starsolo_reference"]], read_trim=True if "read_trim" in config.keys() else False)
+		params: 
+			R1_fastqs = lambda wildcards: get_count_fastqs(wildcards, lib_types={"GEX"}, read="R1", info=info, output_dir=config["output_dir"], read_trim=True if "read_trim" in config.keys() else False),
+			R2_fastqs = lambda wildcards: get_count_fastqs(wildcards, lib_types={"GEX"}, read="R2", info=info, output_dir=config["output_dir"], read_trim=True if "read_trim" in config.keys() else False),
+			reference = config["starsolo_reference"],
+			whitelist = os.path.join(config["output_dir"], ".pipeline", "whitelists", "gex.txt"),
+			custom_flags = config.get("starsolo_args", ""),
+			script_path = scripts_dir if os.path.isabs(scripts_dir) else os.path.join(workflow.basedir, scripts_dir),
+			output_path = os.path.join(config["output_dir"], "starsolo") # DO NOT CHANGE - downstream rules will search for mapping statistics in this directory
+		# conda: "starsolo"
+		envmodules:
+			"STAR/2.7.11a",
+			"samtools/1.17"
+		message: "Making GEX count matrix for {wildcards.sample}"
+		shell:
+			"""
+			( \
+			mkdir -p stamps/starsolo && \
+			mkdir -p {params.output_path}/{wildcards.sample} && \
+			STAR \
+				--readFilesIn {params.R2_fastqs} {params.R1_fastqs} \
+				--genomeDir {params.reference} \
+				--soloCBwhitelist {params.whitelist} \
+				--outFileNamePrefix {params.output_path}/{wildcards.sample}/ \
+				{params.custom_flags} \
+				--runThreadN {threads} && \
+			{params.script_path}/postprocess.py \
+				--dir={params.output_path}/{wildcards.sample} \
+				--matrix-dir=Solo.out \
+				--threads={threads} && \
+			touch {output} \
+			) > {log} 2>&1
+			"""
 
 
 # Set rule targets
@@ -5,10 +5,13 @@
 ##########################################################################################
 
 
+scripts_dir = config.get("scripts_dir", "resources/scripts")
+
 # Define rule
 rule trimfastq:
 	output: os.path.abspath("stamps/trimfastq/{lib}.stamp")
 	log: os.path.abspath("logs/trimfastq/{lib}.log")
+	benchmark: os.path.abspath("benchmarks/trimfastq/{lib}.tsv")
 	threads: 1
 	params:
 		run_path = lambda wildcards: get_run_path(wildcards, info=info, run_dir=config["run_dir"]),
@@ -16,6 +19,7 @@ rule trimfastq:
 		read_trim_flags_R1 = lambda wildcards: get_read_trim_flags(wildcards, read_trim=config.get("read_trim", None), read="R1", info=info),
 		read_trim_flags_R2 = lambda wildcards: get_read_trim_flags(wildcards, read_trim=config.get("read_trim", None), read="R2", info=info),
 		read_trim_flags_R3 = lambda wildcards: get_read_trim_flags(wildcards, read_trim=config.get("read_trim", None), read="R3", info=info),
+		script_path = scripts_dir if os.path.isabs(scripts_dir) else os.path.join(workflow.basedir, scripts_dir),
 		output_path = os.path.join(config["output_dir"], "fastqs") # DO NOT CHANGE - downstream rules will search for FASTQs in this directory
 	# conda: "seqtk"
 	envmodules: "seqtk"
@@ -25,10 +29,14 @@ rule trimfastq:
 		( \
 		mkdir -p stamps/trimfastq && \
 		mkdir -p {params.output_path}/{wildcards.lib} && \
-		find {params.run_path}/{params.lib_type} -type f -name '*_R1_001.fastq.gz' -exec sh -c 'for file do echo $(date -u +"%F %T") Processing file: $file; seqtk trimfq {params.read_trim_flags_R1} $file | pigz -p {threads} > {params.output_path}/{wildcards.lib}/$(basename $file); done' sh {{}} \; && \
-		find {params.run_path}/{params.lib_type} -type f -name '*_R2_001.fastq.gz' -exec sh -c 'for file do echo $(date -u +"%F %T") Processing file: $file; seqtk trimfq {params.read_trim_flags_R2} $file | pigz -p {threads} > {params.output_path}/{wildcards.lib}/$(basename $file); done' sh {{}} \; && \
-		find {params.run_path}/{params.lib_type} -type f -name '*_R3_001.fastq.gz' -exec sh -c 'for file do echo $(date -u +"%F %T") Processing file: $file; seqtk trimfq {params.read_trim_flags_R3} $file | pigz -p {threads} > {params.output_path}/{wildcards.lib}/$(basename $file); done' sh {{}} \; && \
-		touch {output} \
+		{params.script_path}/trim_fastq.py \
+			--indir={params.run_path}/{params.lib_type} \
+			--outdir={params.output_path}/{wildcards.lib} \
+			--stamp={output} \
+			--r1="{params.read_trim_flags_R1}" \
+			--r2="{params.read_trim_flags_R2}" \
+			--r3="{params.read_trim_flags_R3}" \
+			--threads={threads} \
 		) > {log} 2>&1
 		"""
 
@@ -0,0 +1,38 @@
+##########################################################################################
+# Snakemake rule for cell barcode whitelist cache
+# Author: Redwan Farooq
+##########################################################################################
+
+scripts_dir = config.get("scripts_dir", "resources/scripts")
+
+# Define rules
+rule whitelist_cache:
+	output: os.path.abspath("stamps/whitelist_cache/{whitelist}.stamp")
+	log: os.path.abspath("logs/whitelist_cache/{whitelist}.log")
+	benchmark: os.path.abspath("benchmarks/whitelist_cache/{whitelist}.tsv")
+	wildcard_constraints:
+		whitelist = "gex|atac"
+	threads: 1
+	params:
+		whitelist = lambda wildcards: config[f"{wildcards.whitelist}_barcode_whitelist"],
+		cache_dir = config.get("cache_dir", ".cache"),
+		budget = config.get("whitelist_cache_size", 1073741824),
+		script_path = scripts_dir if os.path.isabs(scripts_dir) else os.path.join(workflow.basedir, scripts_dir),
+		output_path = os.path.join(config["output_dir"], ".pipeline", "whitelists") # DO NOT CHANGE - downstream rules will search for whitelists in this directory
+	message: "Caching {wildcards.whitelist} cell barcode whitelist"
+	shell:
+		"""
+		( \
+		mkdir -p stamps/whitelist_cache && \
+		{params.script_path}/whitelist_cache.py \
+			--whitelist={params.whitelist} \
+			--cachedir={params.cache_dir} \
+			--output={params.output_path}/{wildcards.whitelist}.txt \
+			--stamp={output} \
+			--budget={params.budget} \
+		) > {log} 2>&1
+		"""
+
+
+# Set rule targets (whitelists are cached on demand by rules that use them)
+whitelist_cache = []
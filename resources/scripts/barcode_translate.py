@@ -0,0 +1,283 @@
+#!/bin/env python
+
+
+"""
+Translates cell barcodes in BarCounter count matrix CSV files using a barcode translation table
+(e.g. 10x 3' TotalSeq-B feature barcode to gene expression barcode).
+Barcodes are encoded as 2-bit packed integers and translated using a sorted array lookup;
+compiled translation tables are cached on disk and reused across samples.
+Requires:
+- Barcode translation table in TSV format (without headers) with the following fields:
+    *: source barcode
+    *: translated barcode
+- BarCounter count matrix CSV file (with headers) with barcodes in first field
+"""
+
+
+# ==============================
+# MODULES
+# ==============================
+import os
+import hashlib
+import docopt
+from loguru import logger
+import numpy as np
+import pandas as pd
+
+
+# ==============================
+# COMMAND LINE OPTIONS
+# ==============================
+# Define options
+DOC = """
+Translate cell barcodes in BarCounter count matrix CSV files
+
+Usage:
+  barcode_translate.py --reference=<reference> --counts=<counts> [--cachedir=<cachedir> --chunksize=<chunksize>] [options]
+
+Arguments:
+  -r --reference=<reference>    Barcode translation table TSV file (required)
+  -c --counts=<counts>          BarCounter count matrix CSV file (required; translated in place)
+  --cachedir=<cachedir>         Cache directory for compiled translation tables [default: .cache]
+  --chunksize=<chunksize>       Number of rows processed per chunk [default: 1000000]
+
+Options:
+  -h --help                     Show this screen
+"""
+
+
+# ==============================
+# GLOBAL VARIABLES
+# ==============================
+BASES = np.frombuffer(b"ACGT", dtype=np.uint8)
+ENCODE = np.full(256, 255, dtype=np.uint8)
+ENCODE[BASES] = np.arange(4, dtype=np.uint8)
+# Compiled translation table format version (included in cache keys)
+TABLE_VERSION = 2
+
+
+# ==============================
+# FUNCTIONS
+# ==============================
+@logger.catch(reraise=True)
+def _main(opt: dict) -> None:
+    logger.info("Loading reference file: {}", opt["--reference"])
+    table = load_table(reference=opt["--reference"], cache_dir=opt["--cachedir"])
+    logger.info("Translating BarCounter CSV file: {}", opt["--counts"])
+    n = translate_counts(
+        counts=opt["--counts"], table=table, chunksize=int(opt["--chunksize"])
+    )
+    logger.success("Barcode translation complete ({} barcodes).", n)
+
+
+def _dtype(length: int) -> np.dtype:
+    if length > 32:
+        raise ValueError(f"Barcode length {length} exceeds maximum of 32 bases.")
+    return np.dtype(np.uint32) if length <= 16 else np.dtype(np.uint64)
+
+
+def encode_barcodes(barcodes: np.ndarray, length: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Encode barcode sequences as 2-bit packed integers.
+
+    Arguments:
+        ``barcodes``: Array of barcode sequences (strings or bytes).\n
+        ``length``: Barcode length (maximum 32 bases).
+
+    Returns:
+        Tuple of array of encoded barcodes (uint32 if ``length`` <= 16 otherwise uint64) and
+        boolean array indicating valid barcodes (only A/C/G/T and expected length).
+    """
+    dtype = _dtype(length)
+    barcodes = np.asarray(barcodes)
+    if barcodes.dtype.kind not in "SU":
+        barcodes = barcodes.astype(str)
+    # Length is checked before casting to fixed width (which truncates longer barcodes)
+    lengths = np.char.str_len(barcodes)
+    seqs = barcodes.astype(f"S{length}")
+    codes = ENCODE[seqs.view(np.uint8).reshape(-1, length)]
+    valid = (codes != 255).all(axis=1) & (lengths == length)
+    codes = np.where(codes == 255, 0, codes).astype(dtype)
+    shifts = (2 * np.arange(length - 1, -1, -1)).astype(dtype)
+    return np.bitwise_or.reduce(codes << shifts, axis=1), valid
+
+
+def decode_barcodes(codes: np.ndarray, length: int) -> np.ndarray:
+    """
+    Decode 2-bit packed integers to barcode sequences.
+
+    Arguments:
+        ``codes``: Array of encoded barcodes.\n
+        ``length``: Barcode length.
+
+    Returns:
+        Array of barcode sequences (bytes).
+    """
+    dtype = _dtype(length)
+    shifts = (2 * np.arange(length - 1, -1, -1)).astype(dtype)
+    bases = BASES[(codes.astype(dtype)[:, None] >> shifts) & dtype.type(3)]
+    return np.ascontiguousarray(bases).view(f"S{length}").ravel()
+
+
+def _table_path(reference: str, cache_dir: str) -> str:
+    stat = os.stat(reference)
+    key = hashlib.sha1(
+        f"{os.path.abspath(reference)}:{stat.st_size}:{stat.st_mtime_ns}:{TABLE_VERSION}".encode()
+    ).hexdigest()
+    return os.path.join(cache_dir, "barcode_translate", f"{key}.npz")
+
+
+def _read_fixed_width(reference: str, chunksize: int) -> list[tuple] | None:
+    # Fast path for tables with fixed-width rows ("<barcode>\t<barcode>\n")
+    chunks = []
+    with open(file=reference, mode="rb") as file:
+        length = len(file.readline().split(b"\t")[0])
+        width = 2 * length + 2
+        if length == 0 or os.fstat(file.fileno()).st_size % width != 0:
+            return None
+        file.seek(0)
+        while data := file.read(width * chunksize):
+            rows = np.frombuffer(data, dtype=np.uint8).reshape(-1, width)
+            if not (
+                (rows[:, length] == ord("\t")).all() and (rows[:, -1] == ord("\n")).all()
+            ):
+                return None
+            chunks.append(
+                (
+                    np.ascontiguousarray(rows[:, :length]).view(f"S{length}").ravel(),
+                    np.ascontiguousarray(rows[:, length + 1 : -1])
+                    .view(f"S{length}")
+                    .ravel(),
+                )
+            )
+    return chunks
+
+
+def _read_delimited(reference: str, chunksize: int):
+    for chunk in pd.read_csv(
+        reference,
+        sep="\t",
+        header=None,
+        usecols=[0, 1],
+        dtype=str,
+        chunksize=chunksize,
+    ):
+        yield chunk[0].to_numpy(), chunk[1].to_numpy()
+
+
+def compile_table(reference: str, chunksize: int = 1000000) -> dict:
+    """
+    Compile barcode translation table.
+
+    Arguments:
+        ``reference``: Barcode translation table TSV file.\n
+        ``chunksize``: Number of rows read per chunk.
+
+    Returns:
+        Dictionary with sorted encoded source barcodes (``keys``), encoded translated barcodes
+        (``values``) and barcode length (``length``); if a source barcode occurs more than once,
+        its last translation is used.
+    """
+    chunks = _read_fixed_width(reference, chunksize) or _read_delimited(
+        reference, chunksize
+    )
+    keys, values, length = [], [], None
+    for source, target in chunks:
+        if length is None:
+            length = len(source[0])
+        key, key_valid = encode_barcodes(source, length)
+        value, value_valid = encode_barcodes(target, length)
+        assert (key_valid & value_valid).all(), "Invalid barcodes detected in reference file."
+        keys.append(key)
+        values.append(value)
+    keys, values = np.concatenate(keys), np.concatenate(values)
+    order = np.argsort(keys, kind="stable")
+    keys, values = keys[order], values[order]
+    # Duplicate source barcodes resolve to the last translation in the file
+    last = np.append(keys[1:] != keys[:-1], True)
+    return {"keys": keys[last], "values": values[last], "length": length}
+
+
+def load_table(reference: str, cache_dir: str | None = None) -> dict:
+    """
+    Load compiled barcode translation table from cache (compiling and caching it if required).
+
+    Arguments:
+        ``reference``: Barcode translation table TSV file.\n
+        ``cache_dir``: Cache directory or ``None`` (no caching).
+
+    Returns:
+        Dictionary as returned by ``compile_table``.
+    """
+    if cache_dir is None:
+        return compile_table(reference)
+    path = _table_path(reference, cache_dir)
+    if os.path.isfile(path):
+        logger.info("Using compiled translation table: {}", path)
+        with np.load(path) as data:
+            return {
+                "keys": data["keys"],
+                "values": data["values"],
+                "length": int(data["length"]),
+            }
+    table = compile_table(reference)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tempfile = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tempfile, **table)
+    os.replace(tempfile, path)
+    logger.info("Saved compiled translation table: {}", path)
+    return table
+
+
+def translate(barcodes: np.ndarray, table: dict) -> np.ndarray:
+    """
+    Translate barcode sequences.
+
+    Arguments:
+        ``barcodes``: Array of barcode sequences.\n
+        ``table``: Dictionary as returned by ``compile_table``.
+
+    Returns:
+        Array of translated barcode sequences (strings).
+    """
+    codes, valid = encode_barcodes(barcodes, table["length"])
+    index = np.searchsorted(table["keys"], codes)
+    index[index == len(table["keys"])] = 0
+    found = valid & (table["keys"][index] == codes)
+    if not found.all():
+        raise KeyError("Barcode not found, please check reference file.")
+    return decode_barcodes(table["values"][index], table["length"]).astype(str)
+
+
+def translate_counts(counts: str, table: dict, chunksize: int = 1000000) -> int:
+    """
+    Translate barcodes in first field of a count matrix CSV file in place.
+
+    Arguments:
+        ``counts``: Count matrix CSV file.\n
+        ``table``: Dictionary as returned by ``compile_table``.\n
+        ``chunksize``: Number of rows processed per chunk.
+
+    Returns:
+        Number of translated barcodes.
+    """
+    n = 0
+    tempfile = f"{counts}.tmp"
+    with open(file=tempfile, mode="w", encoding="UTF-8", newline="") as file:
+        for i, chunk in enumerate(
+            pd.read_csv(
+                counts, header=0, dtype=str, keep_default_na=False, chunksize=chunksize
+            )
+        ):
+            chunk.iloc[:, 0] = translate(chunk.iloc[:, 0].to_numpy(), table)
+            chunk.to_csv(path_or_buf=file, header=i == 0, index=False)
+            n += len(chunk)
+    os.replace(tempfile, counts)
+    return n
+
+
+# ==============================
+# SCRIPT
+# ==============================
+if __name__ == "__main__":
+    _main(opt=docopt.docopt(DOC))
@@ -53,3 +53,105 @@ class IndexKit:
         """
         names_match = (x in self.lookup.keys() for x in names)
         return all(names_match) if strict else any(names_match)
+
+
+class IndexKitRegistry:
+    """
+    Object class containing inverted index of sample index names to index kits.
+    """
+
+    def __init__(self, kits: list[IndexKit]) -> None:
+        self.kits = list(kits)
+        self._names = {}
+        for kit in self.kits:
+            for name, seqs in kit.lookup.items():
+                if name != "index_name":
+                    self._names.setdefault(name, []).append((kit, seqs))
+        self.conflicts = {
+            name
+            for name, entries in self._names.items()
+            if len({(kit.index_type, seqs) for kit, seqs in entries}) > 1
+        }
+
+    def __repr__(self) -> str:
+        return f"IndexKitRegistry\nIndex kits: {len(self.kits)}\nIndex names: {len(self._names)}\nConflicting index names: {len(self.conflicts)}"
+
+    def resolve(self, names: set[str]) -> IndexKit | None:
+        """
+        Find index kit containing all index names.
+
+        Arguments:
+            ``names``: Set of index names.
+
+        Returns:
+            First matching IndexKit object (in registry order) or ``None`` if no index kit contains
+            all index names. Raises ``AssertionError`` if index names match more than one index kit
+            with different index types or sequences.
+        """
+        candidates = None
+        for name in names:
+            entries = self._names.get(name, None)
+            if entries is None:
+                return None
+            kits = {id(kit) for kit, _ in entries}
+            candidates = (
+                [kit for kit, _ in entries]
+                if candidates is None
+                else [kit for kit in candidates if id(kit) in kits]
+            )
+            if not candidates:
+                return None
+        if candidates is None:
+            return None
+        if len(candidates) > 1:
+            kits = {id(kit) for kit in candidates}
+            ambiguous = {
+                name
+                for name in set(names) & self.conflicts
+                if len(
+                    {
+                        (kit.index_type, seqs)
+                        for kit, seqs in self._names[name]
+                        if id(kit) in kits
+                    }
+                )
+                > 1
+            }
+            assert not ambiguous, f"Index names {', '.join(sorted(ambiguous))} match multiple index kits with different sequences: {', '.join(kit.file for kit in candidates)}"
+        return candidates[0]
+
+    def to_dict(self) -> dict:
+        """
+        Convert to dictionary (for serialisation).
+
+        Returns:
+            Dictionary containing list of index kits.
+        """
+        return {
+            "kits": [
+                {"file": kit.file, "index_type": kit.index_type, "lookup": kit.lookup}
+                for kit in self.kits
+            ]
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "IndexKitRegistry":
+        """
+        Create IndexKitRegistry from dictionary.
+
+        Arguments:
+            ``data``: Dictionary as returned by ``to_dict``.
+
+        Returns:
+            IndexKitRegistry object.
+        """
+        return cls(
+            [
+                IndexKit(
+                    file=kit["file"],
+                    lookup={k: tuple(v) for k, v in kit["lookup"].items()},
+                    index_type=kit["index_type"],
+                )
+                for kit in data["kits"]
+            ]
+        )
@@ -0,0 +1,280 @@
+#!/bin/env python
+
+
+"""
+Compiles run metadata and generates all metadata files required by the selected pipeline module
+(wrapper script, bcl2fastq sample sheets, Cell Ranger library/configuration sheets, STARsolo batch
+plan, info YAML and sample/library fingerprints).
+Metadata table is read and library IDs are generated once; all files are generated in a single process.
+Requires:
+- Pipeline configuration YAML file
+- Module rule specifications file
+    YAML format with module names as keys and lists of module rules as values
+- Metadata table file (see generate_info_yaml.py, generate_bcl2fastq_csv.py,
+  generate_cellranger_csv.py, generate_cellranger_arc_csv.py and generate_cellranger_multi_csv.py)
+- Wrapper script template file
+"""
+
+
+# ==============================
+# MODULES
+# ==============================
+import os
+import json
+import yaml
+import docopt
+from loguru import logger
+import pandas as pd
+import runinfo
+from metadata import Metadata, read_metadata
+from fingerprint import fingerprint_metadata
+from output import write_changed
+from generate_wrapper import generate_wrapper
+from generate_info_yaml import DUMPER, generate_info_yaml
+import generate_bcl2fastq_csv as bcl2fastq
+import generate_cellranger_csv as cellranger
+import generate_cellranger_arc_csv as cellranger_arc
+import generate_cellranger_multi_csv as cellranger_multi
+import starsolo_batch
+
+
+# ==============================
+# COMMAND LINE OPTIONS
+# ==============================
+# Define options
+DOC = """
+Compile run metadata and generate metadata files for Snakemake pipeline
+
+Usage:
+  compile_metadata.py --config=<config> --modules=<modules> --template=<template> [--file=<file>] [options]
+
+Arguments:
+  -c --config=<config>      Pipeline configuration file (required)
+  -m --modules=<modules>    Module rule specifications file (required)
+  -t --template=<template>  Wrapper script template file (required)
+  -f --file=<file>          Wrapper script output file name [default: Snakefile]
+
+Options:
+  -h --help                 Show this screen
+"""
+
+
+# ==============================
+# FUNCTIONS
+# ==============================
+@logger.catch(reraise=True)
+def _main(opt: dict) -> None:
+    # Read input YAMLs
+    with open(file=opt["--config"], mode="r", encoding="UTF-8") as file:
+        config = yaml.load(stream=file, Loader=yaml.SafeLoader)
+    with open(file=opt["--modules"], mode="r", encoding="UTF-8") as file:
+        modules = yaml.load(stream=file, Loader=yaml.SafeLoader)
+    assert config.get("module") in modules, f"Module {config.get('module')} not specified in {opt['--modules']}"
+
+    compile_metadata(
+        config=config,
+        rules=modules[config["module"]],
+        template=opt["--template"],
+        filename=opt["--file"],
+    )
+
+
+def get_bases_masks(
+    df: pd.DataFrame,
+    bases_mask: dict | None,
+    run_dir: str | None,
+    cache_dir: str | None = ".cache",
+) -> dict[str, str | None]:
+    """
+    Get effective bcl2fastq bases masks for libraries (adjusted for number of reads in run where
+    RunInfo.xml is available).
+
+    Arguments:
+        ``df``: DataFrame containing run metadata with unique library IDs.\n
+        ``bases_mask``: Dictionary of bases mask strings with library types as keys or ``None``.\n
+        ``run_dir``: Raw sequencing runs directory or ``None``.\n
+        ``cache_dir``: Run metadata cache directory or ``None``.
+
+    Returns:
+        Dictionary of bases mask strings (or ``None`` if not specified) with library IDs as keys.
+    """
+    masks = {}
+    for lib, lib_type, run in (
+        df[["lib_id", "lib_type", "run"]].drop_duplicates("lib_id").itertuples(index=False)
+    ):
+        mask = bases_mask.get(lib_type, None) if bases_mask is not None else None
+        if mask is not None and run_dir is not None and os.path.isfile(
+            os.path.join(run_dir, run, "RunInfo.xml")
+        ):
+            mask = runinfo.bases_mask(
+                runinfo.get_run_info(os.path.join(run_dir, run), cache_dir=cache_dir), mask
+            )
+        masks[lib] = mask
+    return masks
+
+
+def _add_changes(changes: dict[str, list[str]], new: dict[str, list[str]]) -> None:
+    for key, filenames in new.items():
+        changes[key].extend(filenames)
+
+
+def compile_metadata(
+    config: dict, rules: list[str], template: str, filename: str = "Snakefile"
+) -> Metadata:
+    """
+    Compile run metadata and generate metadata files required by pipeline module rules.
+
+    Arguments:
+        ``config``: Dictionary of pipeline configuration.\n
+        ``rules``: List of rules used in pipeline module.\n
+        ``template``: Wrapper script template file.\n
+        ``filename``: Wrapper script output file path.
+
+    Returns:
+        Writes metadata files to metadata directory and returns Metadata object.
+    """
+    metadata_dir = config.get("metadata_dir", "metadata")
+    fastqdir = os.path.join(config["output_dir"], "fastqs")
+    features = (
+        os.path.abspath(os.path.join(metadata_dir, config["features"]))
+        if config.get("features", None)
+        else None
+    )
+    hashes = (
+        os.path.abspath(os.path.join(metadata_dir, config["hashes"]))
+        if config.get("hashes", None) and "cellranger_multi" in rules
+        else None
+    )
+
+    # Generate wrapper script
+    logger.info("Generating pipeline wrapper script")
+    logger.info("Template: {}", os.path.abspath(template))
+    changes = write_changed({filename: generate_wrapper(module=config["module"], template=template)})
+
+    # Read input CSVs and check fields are valid
+    md = read_metadata(
+        md=os.path.join(metadata_dir, config["runs"]),
+        hashes=hashes,
+    )
+    md.require({"run", "format", "lib_type", "sample_id"})
+
+    # Generate metadata files
+    if "bcl2fastq" in rules and "BCL" in md.formats:
+        md.require({"sample_index", "lane"})
+        reverse_complement = config.get("reverse_complement", False)
+        sheets, sheet_changes = bcl2fastq.generate_sample_sheets(
+            df=md.runs,
+            index_kits=bcl2fastq.read_index_kits(
+                dual=config.get("dual_index_kits", None),
+                single=config.get("single_index_kits", None),
+                reverse_complement=reverse_complement,
+                cache_dir=config.get("cache_dir", ".cache"),
+            ),
+            outdir=os.path.join(metadata_dir, "bcl2fastq"),
+            reverse_complement=reverse_complement,
+            max_mismatches=config.get("barcode_mismatches", 1),
+        )
+        _add_changes(changes, sheet_changes)
+        if config.get("merge_demux", False):
+            _, sheet_changes = bcl2fastq.generate_demux_sheets(
+                df=md.runs,
+                sheets=sheets,
+                masks=get_bases_masks(
+                    df=md.runs,
+                    bases_mask=config.get("bases_mask", None),
+                    run_dir=config.get("run_dir", None),
+                    cache_dir=config.get("cache_dir", ".cache"),
+                ),
+                outdir=os.path.join(metadata_dir, "bcl2fastq"),
+                max_mismatches=config.get("barcode_mismatches", 1),
+            )
+            _add_changes(changes, sheet_changes)
+    if "cellranger" in rules:
+        sheet_changes = cellranger.generate_library_sheets(
+            df=md.runs,
+            fastqdir=fastqdir,
+            outdir=os.path.join(metadata_dir, "cellranger"),
+        )
+        _add_changes(changes, sheet_changes)
+    if "cellranger_arc" in rules:
+        sheet_changes = cellranger_arc.generate_library_sheets(
+            df=md.runs,
+            fastqdir=fastqdir,
+            outdir=os.path.join(metadata_dir, "cellranger_arc"),
+        )
+        _add_changes(changes, sheet_changes)
+    if "cellranger_multi" in rules:
+        sheet_changes = cellranger_multi.generate_config_sheets(
+            df=md.runs,
+            fastqdir=fastqdir,
+            outdir=os.path.join(metadata_dir, "cellranger"),
+            options=cellranger_multi.get_options(
+                config.get("cellranger_multi_options", None) or {}
+            ),
+            hashes=md.hashes,
+            features=features,
+            transcriptome=config.get("cellranger_reference", None),
+            vdj=config.get("cellranger_vdj_reference", None),
+        )
+        _add_changes(changes, sheet_changes)
+    if "starsolo" in rules and config.get("starsolo_batch_size", None):
+        logger.info("Generating STARsolo batch plan")
+        plan = os.path.join(metadata_dir, "starsolo", "batches.json")
+        write_changed(
+            {
+                plan: json.dumps(
+                    starsolo_batch.plan_batches(
+                        samples=md.runs.loc[
+                            md.runs["lib_type"].isin(starsolo_batch.LIB_TYPES), "sample_id"
+                        ].astype(str).unique().tolist(),
+                        size=int(config["starsolo_batch_size"]),
+                        previous=(
+                            starsolo_batch.read_plan(plan) if os.path.isfile(plan) else None
+                        ),
+                    ),
+                    indent=2,
+                )
+            },
+            changes=changes,
+        )
+    logger.info("Generating info YAML")
+    write_changed(
+        {
+            os.path.join(metadata_dir, "info.yaml"): yaml.dump(
+                data=generate_info_yaml(
+                    df=md.runs[["sample_id", "lib_id", "format", "lib_type", "run"]].drop_duplicates()
+                ),
+                Dumper=DUMPER,
+            )
+        },
+        changes=changes,
+    )
+    logger.info("Generating sample/library fingerprints")
+    write_changed(
+        {
+            os.path.join(metadata_dir, "fingerprints.json"): json.dumps(
+                fingerprint_metadata(df=md.runs, config=config), indent=2
+            )
+        },
+        changes=changes,
+    )
+
+    # Summarise changed metadata files
+    if changes["written"]:
+        logger.info(
+            "Metadata files changed ({} of {}): {}",
+            len(changes["written"]),
+            len(changes["written"]) + len(changes["unchanged"]),
+            ", ".join(os.path.relpath(x) for x in changes["written"]),
+        )
+    else:
+        logger.info("Metadata files unchanged ({} files)", len(changes["unchanged"]))
+
+    return md
+
+
+# ==============================
+# SCRIPT
+# ==============================
+if __name__ == "__main__":
+    _main(opt=docopt.docopt(DOC))
@@ -0,0 +1,203 @@
+#!/bin/env python
+
+
+"""
+Calculates total read counts per library type/sample.
+Read counts are taken from bcl2fastq demultiplexing statistics (Stats/Stats.json) where available;
+otherwise R1 FASTQ files are decompressed and counted in parallel.
+Requires:
+- Info YAML file generated by generate_info_yaml.py
+- FASTQ directory with one subfolder for each library
+"""
+
+
+# ==============================
+# MODULES
+# ==============================
+import os
+import gzip
+import json
+from concurrent.futures import ProcessPoolExecutor
+import yaml
+import docopt
+from loguru import logger
+import pandas as pd
+from fastq_manifest import scan_fastqs
+
+
+# ==============================
+# COMMAND LINE OPTIONS
+# ==============================
+# Define options
+DOC = """
+Calculate total read counts per library type/sample
+
+Usage:
+  count_reads.py --info=<info> --fastqdir=<fastqdir> --outdir=<outdir> [--threads=<threads>] [options]
+
+Arguments:
+  -i --info=<info>          Info YAML file (required)
+  -f --fastqdir=<fastqdir>  FASTQ directory (required)
+  -o --outdir=<outdir>      Output directory (required)
+  -t --threads=<threads>    Number of parallel processes for counting FASTQ reads [default: 1]
+
+Options:
+  -h --help                 Show this screen
+"""
+
+
+# ==============================
+# GLOBAL VARIABLES
+# ==============================
+BLOCK_SIZE = 1 << 20
+_STATS = {}
+
+
+# ==============================
+# FUNCTIONS
+# ==============================
+@logger.catch(reraise=True)
+def _main(opt: dict) -> None:
+    with open(file=opt["--info"], mode="r", encoding="UTF-8") as file:
+        info = yaml.load(stream=file, Loader=yaml.SafeLoader)
+
+    logger.info("Calculating total read counts per library type/sample")
+    df = count_reads(
+        info=info, fastqdir=opt["--fastqdir"], threads=int(opt["--threads"])
+    )
+    os.makedirs(opt["--outdir"], exist_ok=True)
+    df.to_csv(
+        os.path.join(opt["--outdir"], "read_counts.tsv"),
+        sep="\t",
+        header=True,
+        index=True,
+    )
+    logger.success(
+        "Output file: {}", os.path.abspath(os.path.join(opt["--outdir"], "read_counts.tsv"))
+    )
+
+
+def read_stats_json(path: str) -> dict[str, int]:
+    """
+    Read number of reads (clusters) per sample from bcl2fastq demultiplexing statistics.
+
+    Arguments:
+        ``path``: Path to bcl2fastq Stats.json file.
+
+    Returns:
+        Dictionary with sample IDs as keys and read counts (summed over lanes) as values.
+    """
+    with open(file=path, mode="r", encoding="UTF-8") as file:
+        stats = json.load(file)
+    counts = {}
+    for lane in stats.get("ConversionResults", []):
+        for result in lane.get("DemuxResults", []):
+            sample = result.get("SampleName") or result["SampleId"]
+            counts[sample] = counts.get(sample, 0) + int(result["NumberReads"])
+    return counts
+
+
+def _read_stats_json_cached(path: str) -> dict[str, int]:
+    if path not in _STATS:
+        logger.info("Found source data: {}", path)
+        _STATS[path] = read_stats_json(path)
+    return _STATS[path]
+
+
+def count_fastq(path: str) -> int:
+    """
+    Count reads in a gzip-compressed FASTQ file.
+
+    Arguments:
+        ``path``: Path to FASTQ file.
+
+    Returns:
+        Number of reads.
+    """
+    lines = 0
+    with gzip.open(path, mode="rb") as file:
+        while block := file.read(BLOCK_SIZE):
+            lines += block.count(b"\n")
+    return lines // 4
+
+
+def count_fastqs(paths: list[str], threads: int = 1) -> list[int]:
+    """
+    Count reads in gzip-compressed FASTQ files in parallel.
+
+    Arguments:
+        ``paths``: List of paths to FASTQ files.\n
+        ``threads``: Number of parallel processes.
+
+    Returns:
+        List of read counts (in the same order as ``paths``).
+    """
+    if threads <= 1 or len(paths) <= 1:
+        return [count_fastq(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=min(threads, len(paths))) as executor:
+        return list(executor.map(count_fastq, paths))
+
+
+def count_reads(info: dict, fastqdir: str, threads: int = 1) -> pd.DataFrame:
+    """
+    Calculate total read counts per library type/sample.
+
+    Arguments:
+        ``info``: Dictionary of sample/library info.\n
+        ``fastqdir``: FASTQ directory.\n
+        ``threads``: Number of parallel processes for counting FASTQ reads.
+
+    Returns:
+        DataFrame with samples as rows, library types as columns and read counts as values.
+    """
+    records, pending = [], []
+    for sample, libs in info.items():
+        for lib, record in libs.items():
+            stats = os.path.join(fastqdir, lib, "Stats", "Stats.json")
+            if os.path.isfile(stats):
+                counts = _read_stats_json_cached(stats)
+                if sample in counts:
+                    records.append((record["lib_type"], sample, counts[sample]))
+                    continue
+            pending.append((record["lib_type"], sample, lib))
+
+    if pending:
+        fastqs = {}
+        for lib in {lib for _, _, lib in pending}:
+            fastqs[lib] = [
+                x for x in scan_fastqs(os.path.join(fastqdir, lib)) if x["read"] == "R1"
+            ]
+        paths = sorted(
+            {
+                x["path"]
+                for lib_type, sample, lib in pending
+                for x in fastqs[lib]
+                if x["sample"] == sample
+            }
+        )
+        logger.info("Counting reads in {} FASTQ files", len(paths))
+        n_reads = dict(zip(paths, count_fastqs(paths, threads=threads)))
+        for lib_type, sample, lib in pending:
+            records.append(
+                (
+                    lib_type,
+                    sample,
+                    sum(n_reads[x["path"]] for x in fastqs[lib] if x["sample"] == sample),
+                )
+            )
+
+    df = (
+        pd.DataFrame(records, columns=["lib_type", "sample", "read_count"])
+        .groupby(["lib_type", "sample"])
+        .agg({"read_count": "sum"})
+        .reset_index()
+        .pivot(index="sample", columns="lib_type", values="read_count")
+    )
+    return df
+
+
+# ==============================
+# SCRIPT
+# ==============================
+if __name__ == "__main__":
+    _main(opt=docopt.docopt(DOC))
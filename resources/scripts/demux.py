@@ -0,0 +1,356 @@
+#!/bin/env python
+
+
+"""
+Plans and fans out merged (run-level) bcl2fastq demultiplexing.
+Libraries from the same run folder whose effective bases masks have the same read structure
+(sequenced reads and index reads in the same positions, e.g. GEX, ADT and HTO libraries) are
+demultiplexed together using one merged sample sheet (Sample_Project = library ID) and a unified
+bases mask: sequenced reads are read to the longest length in the group and index reads to the
+shortest common index length (sample sheet indexes are truncated to this length and checked for
+collisions). FASTQ files and demultiplexing statistics are then fanned out into the per-library
+FASTQ directory layout using hard links; reads longer than the library bases mask are trimmed
+to the library read length using seqtk trimfq.
+Requires:
+- Merged bcl2fastq output directory generated using a sample sheet from generate_bcl2fastq_csv.py
+- Demultiplexing plan JSON file generated by generate_bcl2fastq_csv.py
+- seqtk and pigz available in PATH (if any reads are trimmed)
+"""
+
+
+# ==============================
+# MODULES
+# ==============================
+import os
+import re
+import json
+import docopt
+from loguru import logger
+from fastq_manifest import describe_fastq, manifest_path, write_manifest
+from trim_fastq import MARKER_DIR, trim_fastq
+
+
+# ==============================
+# COMMAND LINE OPTIONS
+# ==============================
+# Define options
+DOC = """
+Fan out merged bcl2fastq output into library FASTQ directory
+
+Usage:
+  demux.py --demuxdir=<demuxdir> --plan=<plan> --lib=<lib> --outdir=<outdir> --stamp=<stamp> [--threads=<threads>] [options]
+
+Arguments:
+  -d --demuxdir=<demuxdir>  Merged bcl2fastq output directory (required)
+  -p --plan=<plan>          Demultiplexing plan JSON file (required)
+  -l --lib=<lib>            Library ID (required)
+  -o --outdir=<outdir>      Library FASTQ directory (required)
+  -s --stamp=<stamp>        Stamp file to create on completion (required)
+  -t --threads=<threads>    Number of threads [default: 1]
+
+Options:
+  -h --help                 Show this screen
+"""
+
+
+# ==============================
+# GLOBAL VARIABLES
+# ==============================
+# Separator between library ID and sample ID in merged sample sheet Sample_ID field
+SEP = "__"
+# Bases mask read segment (e.g. Y28n*, I10n*, Y*, n*)
+SEGMENT = re.compile(r"^(?:([YI])(\d+|\*)?)?(?:n\d*\*?)?$")
+
+
+# ==============================
+# FUNCTIONS
+# ==============================
+@logger.catch(reraise=True)
+def _main(opt: dict) -> None:
+    logger.info("Fanning out FASTQ files for {} from {}", opt["--lib"], opt["--demuxdir"])
+    plan = read_plan(opt["--plan"])
+    trim = {
+        read: length
+        for entry in plan.values()
+        if opt["--lib"] in entry["libs"]
+        for read, length in entry.get("trim", {}).get(opt["--lib"], {}).items()
+    }
+    if trim:
+        logger.info(
+            "Trimming reads to library read lengths: {}",
+            ", ".join(f"{read} ({length} bases)" for read, length in sorted(trim.items())),
+        )
+    fastqs = fan_out(
+        demuxdir=opt["--demuxdir"],
+        lib=opt["--lib"],
+        outdir=opt["--outdir"],
+        trim=trim,
+        threads=int(opt["--threads"]),
+    )
+
+    # Create stamp file and FASTQ manifest
+    with open(file=opt["--stamp"], mode="a", encoding="UTF-8"):
+        os.utime(opt["--stamp"])
+    write_manifest(
+        fastqs=fastqs, stamp=opt["--stamp"], filename=manifest_path(opt["--stamp"])
+    )
+    logger.success("Output directory: {}", os.path.abspath(opt["--outdir"]))
+
+
+def sample_id(lib: str, sample: str) -> str:
+    """
+    Get merged sample sheet Sample_ID for a sample in a library.
+
+    Arguments:
+        ``lib``: Library ID.\n
+        ``sample``: Sample ID.
+
+    Returns:
+        Sample_ID unique across libraries.
+    """
+    return f"{lib}{SEP}{sample}"
+
+
+def parse_mask(mask: str) -> list[tuple[str, int | None]] | None:
+    """
+    Parse bases mask into read segments.
+
+    Arguments:
+        ``mask``: Comma-separated bases mask string (e.g. ``Y28n*,I10n*,I10n*,Y90n*``).
+
+    Returns:
+        List of tuples of read type (``Y`` for sequenced reads or ``I`` for index reads) and read
+        length (``0`` for index reads masked with ``n*``; ``None`` for all cycles) or ``None`` if
+        bases mask cannot be parsed.
+    """
+    segments = []
+    for segment in mask.split(","):
+        match = SEGMENT.match(segment.strip())
+        if match is None or (match.group(1) is None and not segment.strip().startswith("n")):
+            return None
+        read, length = match.groups()
+        if read is None:
+            segments.append(("I", 0))
+        else:
+            segments.append((read, None if length in (None, "*") else int(length)))
+    return segments
+
+
+def unify_masks(
+    masks: dict[str, str], index_lengths: dict[str, tuple[int]]
+) -> tuple[str, tuple[int], dict[str, dict[str, int]]] | None:
+    """
+    Unify bases masks of libraries for merged demultiplexing. Sequenced reads are read to the
+    longest length and index reads to the shortest common length (including sample sheet index
+    lengths; index reads with common length 0 are masked).
+
+    Arguments:
+        ``masks``: Dictionary of effective bases masks with library IDs as keys.\n
+        ``index_lengths``: Dictionary of sample sheet index lengths (i7, i5; 0 if not used) with
+        library IDs as keys.
+
+    Returns:
+        Tuple of unified bases mask, sample sheet index lengths (i7, i5) and dictionary of read
+        lengths to trim to (with reads e.g. ``R2`` as keys) with library IDs as keys, or ``None``
+        if bases masks have different read structures.
+    """
+    segments = {lib: parse_mask(mask) for lib, mask in masks.items()}
+    if any(x is None for x in segments.values()):
+        return None
+    if len({tuple(read for read, _ in x) for x in segments.values()}) != 1:
+        return None
+    unified, lengths, trim = [], [], {lib: {} for lib in masks}
+    n_reads = n_indexes = 0
+    for i, (read, _) in enumerate(next(iter(segments.values()))):
+        if read == "Y":
+            n_reads += 1
+            read_lengths = [x[i][1] for x in segments.values()]
+            length = None if None in read_lengths else max(read_lengths)
+            unified.append("Y*" if length is None else f"Y{length}n*")
+            for lib in masks:
+                if segments[lib][i][1] is not None and segments[lib][i][1] != length:
+                    trim[lib][f"R{n_reads}"] = segments[lib][i][1]
+        else:
+            # Sample sheet index lengths limit index read lengths (I* reads all cycles)
+            length = min(
+                [x[i][1] for x in segments.values() if x[i][1] is not None]
+                + [
+                    x[n_indexes] if n_indexes < len(x) else 0
+                    for x in (index_lengths.get(lib, ()) for lib in masks)
+                ]
+            )
+            n_indexes += 1
+            unified.append(f"I{length}n*" if length > 0 else "n*")
+            lengths.append(length)
+    return ",".join(unified), tuple(lengths), {lib: x for lib, x in trim.items() if x}
+
+
+def plan_demux(
+    libs: dict, masks: dict[str, str | None], index_lengths: dict[str, tuple[int]]
+) -> dict[str, dict]:
+    """
+    Group libraries in BCL format for merged demultiplexing. Libraries from the same run folder are
+    grouped if their bases masks can be unified (see ``unify_masks``); libraries without bases
+    masks are grouped if their sample sheet index lengths are identical.
+
+    Arguments:
+        ``libs``: Dictionary of library info with library IDs as keys.\n
+        ``masks``: Dictionary of effective bases masks (or ``None``) with library IDs as keys.\n
+        ``index_lengths``: Dictionary of sample sheet index lengths (i7, i5; 0 if not used) with
+        library IDs as keys.
+
+    Returns:
+        Dictionary of demultiplexing groups (``<run>-<n>``) with run folder name (``run``), list of
+        library IDs (``libs``), bases mask (``mask``; ``None`` if not specified), sample sheet
+        index lengths (``index_lengths``) and dictionary of read lengths to trim to with library
+        IDs as keys (``trim``).
+    """
+    groups = {}
+    for lib in sorted(libs):
+        if libs[lib]["format"].upper() != "BCL":
+            continue
+        mask = masks.get(lib, None)
+        segments = parse_mask(mask) if mask is not None else None
+        key = (
+            (libs[lib]["run"], tuple(read for read, _ in segments))
+            if segments is not None
+            else (libs[lib]["run"], mask, tuple(index_lengths.get(lib, ())))
+        )
+        groups.setdefault(key, []).append(lib)
+    entries = []
+    for (run, *_), members in groups.items():
+        unified = (
+            unify_masks(
+                masks={lib: masks[lib] for lib in members},
+                index_lengths=index_lengths,
+            )
+            if masks.get(members[0], None) is not None
+            else None
+        )
+        if unified is not None and len(members) > 1 and not any(unified[1]):
+            # Libraries cannot be distinguished without index reads
+            entries += [
+                (run, [lib], *unify_masks({lib: masks[lib]}, index_lengths))
+                for lib in members
+            ]
+        elif unified is not None:
+            entries.append((run, members, *unified))
+        else:
+            entries.append(
+                (run, members, masks.get(members[0], None), tuple(index_lengths.get(members[0], ())), {})
+            )
+    plan = {}
+    for run, members, mask, lengths, trim in entries:
+        group = f"{run}-{sum(x['run'] == run for x in plan.values()) + 1}"
+        plan[group] = {
+            "run": run,
+            "libs": members,
+            "mask": mask,
+            "index_lengths": list(lengths),
+            "trim": trim,
+        }
+    return plan
+
+
+def read_plan(filename: str) -> dict[str, dict]:
+    """
+    Read demultiplexing plan file.
+
+    Arguments:
+        ``filename``: Demultiplexing plan JSON file.
+
+    Returns:
+        Dictionary as returned by ``plan_demux``.
+    """
+    with open(file=filename, mode="r", encoding="UTF-8") as file:
+        return json.load(file)
+
+
+def _link(src: str, dst: str) -> None:
+    if os.path.lexists(dst):
+        if os.path.samefile(src, dst):
+            return
+        os.remove(dst)
+    os.link(src, dst)
+
+
+def _fan_out_stats(demuxdir: str, lib: str, outdir: str) -> None:
+    path = os.path.join(demuxdir, "Stats", "Stats.json")
+    if not os.path.isfile(path):
+        return
+    with open(file=path, mode="r", encoding="UTF-8") as file:
+        stats = json.load(file)
+    prefix = f"{lib}{SEP}"
+    for lane in stats.get("ConversionResults", []):
+        lane["DemuxResults"] = [
+            {**result, "SampleId": result["SampleId"].removeprefix(prefix)}
+            for result in lane.get("DemuxResults", [])
+            if result["SampleId"].startswith(prefix)
+        ]
+        lane.pop("Undetermined", None)
+    os.makedirs(os.path.join(outdir, "Stats"), exist_ok=True)
+    tempfile = os.path.join(outdir, "Stats", f".Stats.json.{os.getpid()}.tmp")
+    with open(file=tempfile, mode="w", encoding="UTF-8") as file:
+        json.dump(stats, fp=file, indent=2)
+    os.replace(tempfile, os.path.join(outdir, "Stats", "Stats.json"))
+
+
+def fan_out(
+    demuxdir: str,
+    lib: str,
+    outdir: str,
+    trim: dict[str, int] | None = None,
+    threads: int = 1,
+) -> list[dict]:
+    """
+    Hard link FASTQ files for a library from merged bcl2fastq output directory into library FASTQ
+    directory (trimming reads to library read lengths where required) and write demultiplexing
+    statistics restricted to the library.
+
+    Arguments:
+        ``demuxdir``: Merged bcl2fastq output directory.\n
+        ``lib``: Library ID (Sample_Project in merged sample sheet).\n
+        ``outdir``: Library FASTQ directory.\n
+        ``trim``: Dictionary of read lengths to trim to with reads (e.g. ``R2``) as keys or ``None``.\n
+        ``threads``: Number of pigz compression threads for trimmed reads. Default: ``1``.
+
+    Returns:
+        List of FASTQ manifest records for library FASTQ files.
+    """
+    trim = trim or {}
+    os.makedirs(os.path.join(outdir, MARKER_DIR), exist_ok=True)
+    fastqs = []
+    stack = [os.path.join(demuxdir, lib)]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                fastq = describe_fastq(entry.path, size=0)
+                if fastq is None:
+                    continue
+                if fastq["read"] in trim:
+                    target = trim_fastq(
+                        entry.path,
+                        outdir=outdir,
+                        flags=f"-L {trim[fastq['read']]}",
+                        threads=threads,
+                    )
+                else:
+                    target = os.path.join(outdir, entry.name)
+                    _link(entry.path, target)
+                    # Remove completion marker of previously trimmed file
+                    if os.path.isfile(os.path.join(outdir, MARKER_DIR, f"{entry.name}.done")):
+                        os.remove(os.path.join(outdir, MARKER_DIR, f"{entry.name}.done"))
+                fastqs.append(describe_fastq(target, size=os.stat(target).st_size))
+    _fan_out_stats(demuxdir=demuxdir, lib=lib, outdir=outdir)
+    logger.info("Linked {} FASTQ files", len(fastqs))
+    return fastqs
+
+
+# ==============================
+# SCRIPT
+# ==============================
+if __name__ == "__main__":
+    _main(opt=docopt.docopt(DOC))
@@ -0,0 +1,262 @@
+#!/bin/env python
+
+
+"""
+Generates FASTQ manifest for a library FASTQ directory in the pipeline output directory.
+Manifest is saved next to the library FASTQ stamp file and is invalidated when the modification
+time of the stamp file changes.
+Requires:
+- FASTQ directory with FASTQ files named according to default Illumina convention
+  e.g. SampleID_Sx_Lxxx_Rx_001.fastq.gz
+"""
+
+
+# ==============================
+# MODULES
+# ==============================
+import os
+import re
+import json
+import docopt
+from loguru import logger
+
+
+# ==============================
+# COMMAND LINE OPTIONS
+# ==============================
+# Define options
+DOC = """
+Generate FASTQ manifest for library FASTQ directory
+
+Usage:
+  fastq_manifest.py --fastqdir=<fastqdir> --stamp=<stamp> [--file=<file>] [options]
+
+Arguments:
+  -d --fastqdir=<fastqdir>  Library FASTQ directory (required)
+  -s --stamp=<stamp>        Library FASTQ stamp file (required)
+  -f --file=<file>          Output file name (defaults to stamp file name with extension .manifest.json)
+
+Options:
+  -h --help                 Show this screen
+"""
+
+
+# ==============================
+# GLOBAL VARIABLES
+# ==============================
+FASTQ_PATTERN = re.compile(
+    r"^(?P<sample>.+)_S(?P<number>\d+)(?:_L(?P<lane>\d{3}))?_(?P<read>[RI]\d)_(?P<chunk>\d{3})\.fastq\.gz$"
+)
+
+
+# ==============================
+# CLASSES
+# ==============================
+class FastqManifest:
+    """
+    Object class containing indexed table of FASTQ files in a library FASTQ directory.
+    """
+
+    def __init__(self, fastqs: list[dict]) -> None:
+        self.fastqs = sorted(fastqs, key=lambda x: x["path"])
+        self._by_sample = {}
+        self._by_read = {}
+        self._sizes = {}
+        for fastq in self.fastqs:
+            self._by_sample.setdefault(fastq["sample"], []).append(fastq["path"])
+            self._by_read.setdefault((fastq["sample"], fastq["read"]), []).append(
+                fastq["path"]
+            )
+            self._sizes[fastq["sample"]] = self._sizes.get(fastq["sample"], 0) + fastq["size"]
+
+    def __repr__(self) -> str:
+        return f"FastqManifest\nFASTQ files: {len(self.fastqs)}\nSamples: {len(self._by_sample)}"
+
+    def get(self, sample: str, read: str | None = None) -> list[str]:
+        """
+        Get FASTQ file paths for a sample.
+
+        Arguments:
+            ``sample``: Sample ID.\n
+            ``read``: Read number (e.g. 'R1', 'I1') or ``None`` (for all reads).
+
+        Returns:
+            Sorted list of FASTQ file paths.
+        """
+        if read is None:
+            return list(self._by_sample.get(sample, []))
+        return list(self._by_read.get((sample, read), []))
+
+    def size(self, sample: str | None = None) -> int:
+        """
+        Get total size of FASTQ files in bytes.
+
+        Arguments:
+            ``sample``: Sample ID or ``None`` (for all samples).
+
+        Returns:
+            Total size of FASTQ files in bytes.
+        """
+        if sample is None:
+            return sum(self._sizes.values())
+        return self._sizes.get(sample, 0)
+
+
+# ==============================
+# FUNCTIONS
+# ==============================
+@logger.catch(reraise=True)
+def _main(opt: dict) -> None:
+    filename = opt["--file"] or manifest_path(opt["--stamp"])
+    logger.info("Generating FASTQ manifest for {}", os.path.abspath(opt["--fastqdir"]))
+    fastqs = scan_fastqs(fastqdir=opt["--fastqdir"])
+    write_manifest(fastqs=fastqs, stamp=opt["--stamp"], filename=filename)
+    logger.success("Output file: {}", os.path.abspath(filename))
+
+
+def manifest_path(stamp: str) -> str:
+    """
+    Get path to FASTQ manifest file for a library FASTQ stamp file.
+
+    Arguments:
+        ``stamp``: Library FASTQ stamp file.
+
+    Returns:
+        Path to FASTQ manifest file.
+    """
+    return f"{os.path.splitext(stamp)[0]}.manifest.json"
+
+
+def parse_fastq_name(name: str) -> dict | None:
+    """
+    Parse Illumina FASTQ file name.
+
+    Arguments:
+        ``name``: FASTQ file name.
+
+    Returns:
+        Dictionary with sample ID, sample number, lane, read and chunk number or
+        ``None`` if file name does not match default Illumina convention.
+    """
+    match = FASTQ_PATTERN.match(name)
+    return match.groupdict() if match is not None else None
+
+
+def describe_fastq(path: str, size: int | None = None) -> dict | None:
+    """
+    Get FASTQ manifest record for a FASTQ file.
+
+    Arguments:
+        ``path``: Path to FASTQ file.\n
+        ``size``: File size in bytes or ``None`` (to read from file system).
+
+    Returns:
+        Dictionary with path, size and parsed file name fields or ``None`` if file name does
+        not match default Illumina convention or file contains undetermined reads.
+    """
+    fields = parse_fastq_name(os.path.basename(path))
+    if fields is None or fields["sample"] == "Undetermined":
+        return None
+    return {
+        "path": os.path.abspath(path),
+        "size": size if size is not None else os.stat(path).st_size,
+        **fields,
+    }
+
+
+def scan_fastqs(fastqdir: str) -> list[dict]:
+    """
+    Scan FASTQ directory (recursively) in a single pass.
+
+    Arguments:
+        ``fastqdir``: FASTQ directory.
+
+    Returns:
+        List of dictionaries with path, size and parsed file name fields for each FASTQ file
+        (undetermined reads are excluded).
+    """
+    fastqs = []
+    stack = [fastqdir]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                if parse_fastq_name(entry.name) is None:
+                    continue
+                fastq = describe_fastq(entry.path, size=entry.stat().st_size)
+                if fastq is not None:
+                    fastqs.append(fastq)
+    return fastqs
+
+
+def write_manifest(fastqs: list[dict], stamp: str, filename: str) -> None:
+    """
+    Write FASTQ manifest file.
+
+    Arguments:
+        ``fastqs``: List of dictionaries as returned by ``scan_fastqs``.\n
+        ``stamp``: Library FASTQ stamp file (must exist).\n
+        ``filename``: Output file path.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    tempfile = f"{filename}.tmp"
+    with open(file=tempfile, mode="w", encoding="UTF-8") as file:
+        json.dump(
+            {"stamp_mtime": os.stat(stamp).st_mtime_ns, "fastqs": fastqs}, fp=file
+        )
+    os.replace(tempfile, filename)
+
+
+def read_manifest(stamp: str, filename: str) -> FastqManifest | None:
+    """
+    Read FASTQ manifest file.
+
+    Arguments:
+        ``stamp``: Library FASTQ stamp file.\n
+        ``filename``: FASTQ manifest file path.
+
+    Returns:
+        FastqManifest object or ``None`` if manifest file is missing or out of date.
+    """
+    try:
+        with open(file=filename, mode="r", encoding="UTF-8") as file:
+            data = json.load(file)
+        if data["stamp_mtime"] != os.stat(stamp).st_mtime_ns:
+            return None
+    except (FileNotFoundError, KeyError, ValueError):
+        return None
+    return FastqManifest(data["fastqs"])
+
+
+def get_manifest(fastqdir: str, stamp: str | None) -> FastqManifest:
+    """
+    Get FASTQ manifest for a library FASTQ directory, scanning and saving it if required.
+
+    Arguments:
+        ``fastqdir``: Library FASTQ directory.\n
+        ``stamp``: Library FASTQ stamp file or ``None`` (if FASTQ files have not been generated yet).
+
+    Returns:
+        FastqManifest object.
+    """
+    if stamp is None or not os.path.isfile(stamp):
+        return FastqManifest(scan_fastqs(fastqdir))
+    manifest = read_manifest(stamp=stamp, filename=manifest_path(stamp))
+    if manifest is None:
+        fastqs = scan_fastqs(fastqdir)
+        write_manifest(fastqs=fastqs, stamp=stamp, filename=manifest_path(stamp))
+        manifest = FastqManifest(fastqs)
+    return manifest
+
+
+# ==============================
+# SCRIPT
+# ==============================
+if __name__ == "__main__":
+    _main(opt=docopt.docopt(DOC))
@@ -0,0 +1,98 @@
+#!/bin/env python
+
+
+"""
+Generates FastQC scatter plan for a library FASTQ directory in the pipeline output directory.
+FASTQ files are taken from the library FASTQ manifest and packed (in file name order) into chunks
+up to a byte budget; chunk IDs are derived from the names, sizes and modification times of the
+FASTQ files in each chunk so that chunks of unchanged files keep their IDs (and completed FastQC
+jobs) across reruns.
+Requires:
+- Library FASTQ stamp file (FASTQ manifest is generated if missing or out of date)
+"""
+
+
+# ==============================
+# MODULES
+# ==============================
+import os
+import json
+import hashlib
+import docopt
+from loguru import logger
+from fastq_manifest import get_manifest
+from output import write_if_changed
+
+
+# ==============================
+# COMMAND LINE OPTIONS
+# ==============================
+# Define options
+DOC = """
+Generate FastQC scatter plan for library FASTQ directory
+
+Usage:
+  fastqc_plan.py --fastqdir=<fastqdir> --stamp=<stamp> --output=<output> [--budget=<bytes>] [options]
+
+Arguments:
+  -d --fastqdir=<fastqdir>  Library FASTQ directory (required)
+  -s --stamp=<stamp>        Library FASTQ stamp file (required)
+  -o --output=<output>      Output plan file (required)
+  -b --budget=<bytes>       Maximum total size of FASTQ files per chunk (0 for one FASTQ file per chunk) [default: 0]
+
+Options:
+  -h --help                 Show this screen
+"""
+
+
+# ==============================
+# FUNCTIONS
+# ==============================
+@logger.catch(reraise=True)
+def _main(opt: dict) -> None:
+    manifest = get_manifest(fastqdir=opt["--fastqdir"], stamp=opt["--stamp"])
+    assert manifest.fastqs, f"No FASTQ files found in {opt['--fastqdir']}"
+    plan = plan_chunks(manifest.fastqs, budget=int(opt["--budget"]))
+    logger.info("{} FASTQ files in {} chunks", len(manifest.fastqs), len(plan))
+    if not write_if_changed(opt["--output"], json.dumps(plan, indent=2)):
+        # Update modification time so that plan is not older than FASTQ stamp file
+        os.utime(opt["--output"])
+
+
+def plan_chunks(fastqs: list[dict], budget: int = 0) -> dict[str, list[str]]:
+    """
+    Pack FASTQ files into chunks up to a byte budget.
+
+    Arguments:
+        ``fastqs``: List of dictionaries with path and size for each FASTQ file (e.g. as returned
+        by ``fastq_manifest.scan_fastqs``).\n
+        ``budget``: Maximum total size of FASTQ files per chunk (files larger than the budget
+        are placed in their own chunk; ``0`` for one FASTQ file per chunk). Default: ``0``.
+
+    Returns:
+        Dictionary of sorted lists of paths to FASTQ files with chunk IDs as keys.
+    """
+    chunks, current, total = [], [], 0
+    for fastq in sorted(fastqs, key=lambda x: x["path"]):
+        if current and total + fastq["size"] > budget:
+            chunks.append(current)
+            current, total = [], 0
+        current.append(fastq)
+        total += fastq["size"]
+    if current:
+        chunks.append(current)
+    return {_chunk_id(chunk): [x["path"] for x in chunk] for chunk in chunks}
+
+
+def _chunk_id(fastqs: list[dict]) -> str:
+    key = [
+        [os.path.basename(x["path"]), x["size"], os.stat(x["path"]).st_mtime_ns] for x in fastqs
+    ]
+    return hashlib.sha1(json.dumps(key).encode("UTF-8")).hexdigest()[:12]
+
+
+# ==============================
+# SCRIPT
+# ==============================
+if __name__ == "__main__":
+    _main(opt=docopt.docopt(DOC))
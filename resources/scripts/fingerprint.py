@@ -0,0 +1,162 @@
+"""
+Functions for fingerprinting samples and libraries for incremental reruns of preprocessing pipeline.
+Library fingerprints are calculated from the run metadata rows and library type-specific
+configuration entries for each library; sample fingerprints are calculated from the fingerprints
+of the libraries for each sample. All other configuration entries (except execution-only entries),
+the pipeline version and the tags/features/hashes files are covered by one global fingerprint.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import pandas as pd
+
+
+# Configuration entries with one value per library type (only affect libraries of that type)
+LIB_TYPE_KEYS = ("bases_mask", "read_trim")
+# Configuration entries that only affect how the pipeline is executed (not results)
+EXECUTION_KEYS = (
+    "scripts_dir",
+    "cache_dir",
+    "profile_dag",
+    "merge_demux",
+    "scatter_lanes",
+    "starsolo_batch_size",
+    "starsolo_bam_sort_ram",
+    "whitelist_cache_size",
+    "fastqc_scatter_bytes",
+)
+
+
+def _digest(obj) -> str:
+    return hashlib.sha1(
+        json.dumps(obj, sort_keys=True, default=str).encode("UTF-8")
+    ).hexdigest()
+
+
+def global_config(config: dict) -> dict:
+    """
+    Get configuration entries covered by the global fingerprint.
+
+    Arguments:
+        ``config``: Dictionary of pipeline configuration.
+
+    Returns:
+        Dictionary of pipeline configuration without library type-specific and execution-only entries.
+    """
+    return {
+        k: v for k, v in config.items() if k not in LIB_TYPE_KEYS and k not in EXECUTION_KEYS
+    }
+
+
+def global_fingerprint(config: dict, files: list[str]) -> str:
+    """
+    Calculate global fingerprint.
+
+    Arguments:
+        ``config``: Dictionary of pipeline configuration.\n
+        ``files``: List of paths to files covered by the global fingerprint (e.g. VERSION and
+        tags/features/hashes files); missing files are treated as empty.
+
+    Returns:
+        Hexadecimal digest.
+    """
+    contents = []
+    for path in files:
+        if os.path.isfile(path):
+            with open(file=path, mode="r", encoding="UTF-8") as file:
+                contents.append(file.read().strip())
+        else:
+            contents.append("")
+    return _digest({"config": global_config(config), "files": contents})
+
+
+def fingerprint_metadata(df: pd.DataFrame, config: dict) -> dict[str, dict[str, str]]:
+    """
+    Calculate fingerprints for each library and sample.
+
+    Arguments:
+        ``df``: DataFrame containing run metadata with unique library IDs.\n
+        ``config``: Dictionary of pipeline configuration.
+
+    Returns:
+        Dictionary with dictionaries of library fingerprints (``libs``) and sample fingerprints
+        (``samples``) with library/sample IDs as keys.
+    """
+    df = df.astype(str)
+    columns = sorted(df.columns)
+    libs = {}
+    for lib, rows in df.groupby("lib_id", sort=True):
+        lib_type = rows["lib_type"].iloc[0]
+        libs[lib] = _digest(
+            {
+                "rows": sorted(rows[columns].values.tolist()),
+                "config": {
+                    key: (config.get(key, None) or {}).get(lib_type, None)
+                    for key in LIB_TYPE_KEYS
+                },
+            }
+        )
+    samples = {
+        sample: _digest(sorted((lib, libs[lib]) for lib in set(rows["lib_id"])))
+        for sample, rows in df.groupby("sample_id", sort=True)
+    }
+    return {"libs": libs, "samples": samples}
+
+
+def compare_fingerprints(previous: dict, current: dict) -> dict[str, dict[str, list[str]]]:
+    """
+    Compare library and sample fingerprints with those of a previous pipeline run.
+
+    Arguments:
+        ``previous``: Dictionary as returned by ``fingerprint_metadata`` for previous run.\n
+        ``current``: Dictionary as returned by ``fingerprint_metadata`` for current run.
+
+    Returns:
+        Dictionary for libraries (``libs``) and samples (``samples``), each with sorted lists of
+        IDs that are ``new``, ``changed``, ``removed`` or ``unchanged``.
+    """
+    out = {}
+    for level in ("libs", "samples"):
+        before, after = previous.get(level, {}), current.get(level, {})
+        out[level] = {
+            "new": sorted(set(after) - set(before)),
+            "changed": sorted(x for x in set(after) & set(before) if after[x] != before[x]),
+            "removed": sorted(set(before) - set(after)),
+            "unchanged": sorted(x for x in set(after) & set(before) if after[x] == before[x]),
+        }
+    return out
+
+
+def invalidate_stamps(names: set[str], stamp_dir: str = "stamps") -> list[str]:
+    """
+    Remove stamp files (and FASTQ manifests/per-lane stamp folders) for samples, libraries or
+    demultiplexing groups in all rules so that their jobs are re-run; outputs are left untouched.
+
+    Arguments:
+        ``names``: Set of sample, library or demultiplexing group IDs.\n
+        ``stamp_dir``: Stamp file directory. Default: ``"stamps"``.
+
+    Returns:
+        List of removed paths.
+    """
+    removed = []
+    if not names or not os.path.isdir(stamp_dir):
+        return removed
+    with os.scandir(stamp_dir) as rules:
+        for rule in rules:
+            if not rule.is_dir():
+                continue
+            with os.scandir(rule.path) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        if entry.name in names:
+                            shutil.rmtree(entry.path)
+                            removed.append(entry.path)
+                        continue
+                    for suffix in (".stamp", ".manifest.json"):
+                        if entry.name.endswith(suffix) and entry.name[: -len(suffix)] in names:
+                            os.remove(entry.path)
+                            removed.append(entry.path)
+    return removed
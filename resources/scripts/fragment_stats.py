@@ -0,0 +1,270 @@
+#!/bin/env python
+
+
+"""
+Calculates fragment-level mapping QC statistics for an ATAC sample in a single pass over the
+fragments file.
+Fragments are read in chunks; per-barcode fragment counts, the fragment length histogram and
+overlaps with called peaks are aggregated with NumPy so that memory use is bounded by chunk size
+and number of barcodes. Compact summary tables are written for use by the mapping QC report:
+    fragment_summary.tsv: per-sample summary statistics
+    fragment_lengths.tsv: fragment length histogram
+    barcode_fragments.tsv.gz: fragments and fragments in peaks per barcode
+Requires:
+- Fragments file generated by chromap (bgzip-compressed BED-like format without headers):
+    *: chromosome
+    *: start
+    *: end
+    *: barcode
+    *: duplicate count
+- Peaks file generated by MACS2 (narrowPeak format)
+"""
+
+
+# ==============================
+# MODULES
+# ==============================
+import os
+import docopt
+from loguru import logger
+import numpy as np
+import pandas as pd
+
+
+# ==============================
+# COMMAND LINE OPTIONS
+# ==============================
+# Define options
+DOC = """
+Calculate fragment-level mapping QC statistics
+
+Usage:
+  fragment_stats.py --fragments=<fragments> --peaks=<peaks> --sample=<sample> --outdir=<outdir> [--chunksize=<chunksize> --max-length=<length>] [options]
+
+Arguments:
+  -f --fragments=<fragments>    Fragments file (required)
+  -p --peaks=<peaks>            MACS2 narrowPeak file (required)
+  -s --sample=<sample>          Sample ID (required)
+  -o --outdir=<outdir>          Output directory (required)
+  --chunksize=<chunksize>       Number of fragments processed per chunk [default: 5000000]
+  --max-length=<length>         Maximum fragment length in histogram (longer fragments are counted in last bin) [default: 1000]
+
+Options:
+  -h --help                     Show this screen
+"""
+
+
+# ==============================
+# GLOBAL VARIABLES
+# ==============================
+# Fragment length ranges (bp) for nucleosome-free and mononucleosome fragments
+NUCLEOSOME_FREE = (0, 147)
+MONONUCLEOSOME = (147, 294)
+
+
+# ==============================
+# CLASSES
+# ==============================
+class Peaks:
+    """
+    Object class containing merged peak intervals for each chromosome.
+    """
+
+    def __init__(self, df: pd.DataFrame) -> None:
+        self.total = len(df[[0, 1, 2]].drop_duplicates())
+        self.intervals = {}
+        for chrom, rows in df.groupby(0, sort=False):
+            starts, ends = merge_intervals(rows[1].to_numpy(), rows[2].to_numpy())
+            self.intervals[chrom] = (starts, ends)
+
+    def __repr__(self) -> str:
+        return f"Peaks\nTotal peaks: {self.total}\nChromosomes: {len(self.intervals)}"
+
+    def overlaps(self, chrom: np.ndarray, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+        """
+        Test fragments for overlap with peaks.
+
+        Arguments:
+            ``chrom``: Array of chromosome names.\n
+            ``start``: Array of fragment start positions (0-based).\n
+            ``end``: Array of fragment end positions (exclusive).
+
+        Returns:
+            Boolean array indicating fragments overlapping at least one peak.
+        """
+        out = np.zeros(len(chrom), dtype=bool)
+        for name in pd.unique(chrom):
+            if name not in self.intervals:
+                continue
+            starts, ends = self.intervals[name]
+            mask = chrom == name
+            # First merged peak ending after fragment start; overlap if it starts before fragment end
+            index = np.searchsorted(ends, start[mask], side="right")
+            valid = index < len(starts)
+            hit = np.zeros(mask.sum(), dtype=bool)
+            hit[valid] = starts[index[valid]] < end[mask][valid]
+            out[mask] = hit
+        return out
+
+
+# ==============================
+# FUNCTIONS
+# ==============================
+@logger.catch(reraise=True)
+def _main(opt: dict) -> None:
+    logger.info("Reading peaks file: {}", opt["--peaks"])
+    peaks = read_peaks(opt["--peaks"])
+    logger.info("Reading fragments file: {}", opt["--fragments"])
+    stats = fragment_stats(
+        fragments=opt["--fragments"],
+        peaks=peaks,
+        chunksize=int(opt["--chunksize"]),
+        max_length=int(opt["--max-length"]),
+    )
+    write_outputs(stats, sample=opt["--sample"], peaks=peaks, outdir=opt["--outdir"])
+    logger.success("Output directory: {}", os.path.abspath(opt["--outdir"]))
+
+
+def merge_intervals(starts: np.ndarray, ends: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Merge overlapping intervals.
+
+    Arguments:
+        ``starts``: Array of interval start positions.\n
+        ``ends``: Array of interval end positions.
+
+    Returns:
+        Tuple of arrays of sorted, non-overlapping interval start and end positions.
+    """
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], ends[order]
+    # New merged interval starts where interval does not overlap any previous interval
+    breaks = np.concatenate([[True], starts[1:] > np.maximum.accumulate(ends)[:-1]])
+    return starts[breaks], np.maximum.reduceat(ends, np.flatnonzero(breaks))
+
+
+def read_peaks(filename: str) -> Peaks:
+    """
+    Read MACS2 narrowPeak file.
+
+    Arguments:
+        ``filename``: narrowPeak file path.
+
+    Returns:
+        Peaks object.
+    """
+    if os.path.getsize(filename) == 0:
+        return Peaks(pd.DataFrame({0: pd.Series(dtype=str), 1: [], 2: []}))
+    df = pd.read_csv(
+        filename, sep="\t", header=None, usecols=[0, 1, 2], dtype={0: str, 1: np.int64, 2: np.int64}
+    )
+    return Peaks(df)
+
+
+def fragment_stats(
+    fragments: str, peaks: Peaks, chunksize: int = 5000000, max_length: int = 1000
+) -> dict:
+    """
+    Aggregate fragment statistics in a single pass over fragments file.
+
+    Arguments:
+        ``fragments``: Fragments file path.\n
+        ``peaks``: Peaks object.\n
+        ``chunksize``: Number of fragments processed per chunk. Default: ``5000000``.\n
+        ``max_length``: Maximum fragment length in histogram. Default: ``1000``.
+
+    Returns:
+        Dictionary with fragment length histogram (``lengths``), DataFrame of fragments and
+        fragments in peaks per barcode (``barcodes``) and total fragments (``total``) and
+        fragments in peaks (``in_peaks``).
+    """
+    lengths = np.zeros(max_length + 1, dtype=np.int64)
+    barcodes = []
+    total, in_peaks = 0, 0
+    reader = pd.read_csv(
+        fragments,
+        sep="\t",
+        header=None,
+        usecols=[0, 1, 2, 3],
+        names=["chrom", "start", "end", "barcode"],
+        dtype={"chrom": str, "start": np.int64, "end": np.int64, "barcode": str},
+        comment="#",
+        chunksize=chunksize,
+    )
+    for i, chunk in enumerate(reader, start=1):
+        start, end = chunk["start"].to_numpy(), chunk["end"].to_numpy()
+        lengths += np.bincount(np.clip(end - start, 0, max_length), minlength=max_length + 1)
+        hit = peaks.overlaps(chunk["chrom"].to_numpy(), start, end)
+        barcodes.append(
+            pd.DataFrame({"barcode": chunk["barcode"].to_numpy(), "in_peaks": hit})
+            .groupby("barcode", sort=False)["in_peaks"]
+            .agg(fragments="size", fragments_in_peaks="sum")
+        )
+        # Collapse per-chunk tables periodically to bound memory use
+        if len(barcodes) >= 8:
+            barcodes = [_combine(barcodes)]
+        total += len(chunk)
+        in_peaks += int(hit.sum())
+        logger.info("Processed {} fragments (chunk {})", total, i)
+    return {
+        "lengths": lengths,
+        "barcodes": _combine(barcodes) if barcodes else pd.DataFrame(
+            {"fragments": [], "fragments_in_peaks": []}, index=pd.Index([], name="barcode")
+        ),
+        "total": total,
+        "in_peaks": in_peaks,
+    }
+
+
+def _combine(tables: list[pd.DataFrame]) -> pd.DataFrame:
+    return pd.concat(tables).groupby(level=0, sort=False).sum()
+
+
+def write_outputs(stats: dict, sample: str, peaks: Peaks, outdir: str) -> None:
+    """
+    Write fragment statistics summary tables.
+
+    Arguments:
+        ``stats``: Dictionary as returned by ``fragment_stats``.\n
+        ``sample``: Sample ID.\n
+        ``peaks``: Peaks object.\n
+        ``outdir``: Output directory.
+    """
+    os.makedirs(outdir, exist_ok=True)
+    lengths = stats["lengths"]
+    positions = np.arange(len(lengths))
+    total = max(stats["total"], 1)
+    cumulative = np.cumsum(lengths)
+    summary = pd.DataFrame(
+        {
+            "sample": [sample],
+            "total_fragments": [stats["total"]],
+            "total_barcodes": [len(stats["barcodes"])],
+            "fragments_in_peaks": [stats["in_peaks"]],
+            "frip": [stats["in_peaks"] / total],
+            "median_fragment_length": [
+                int(np.searchsorted(cumulative, cumulative[-1] / 2)) if stats["total"] else 0
+            ],
+            "nucleosome_free": [
+                lengths[(positions >= NUCLEOSOME_FREE[0]) & (positions < NUCLEOSOME_FREE[1])].sum() / total
+            ],
+            "mononucleosome": [
+                lengths[(positions >= MONONUCLEOSOME[0]) & (positions < MONONUCLEOSOME[1])].sum() / total
+            ],
+            "total_peaks": [peaks.total],
+        }
+    )
+    summary.to_csv(os.path.join(outdir, "fragment_summary.tsv"), sep="\t", index=False)
+    pd.DataFrame({"length": positions, "fragments": lengths}).to_csv(
+        os.path.join(outdir, "fragment_lengths.tsv"), sep="\t", index=False
+    )
+    stats["barcodes"].sort_values("fragments", ascending=False).to_csv(
+        os.path.join(outdir, "barcode_fragments.tsv.gz"), sep="\t", index=True
+    )
+
+
+# ==============================
+# SCRIPT
+# ==============================
+if __name__ == "__main__":
+    _main(opt=docopt.docopt(DOC))
@@ -0,0 +1,154 @@
+#!/bin/env python
+
+
+"""
+Gathers per-lane bcl2fastq output for a library into the library FASTQ directory.
+FASTQ files from each lane are hard linked into the library FASTQ directory and per-lane
+demultiplexing statistics are combined into a single Stats/Stats.json file.
+FASTQ file names must be unique across lanes (i.e. bcl2fastq must not be run with
+--no-lane-splitting) so that no lane overwrites another.
+Requires:
+- Per-lane bcl2fastq output directory with one subfolder for each lane
+"""
+
+
+# ==============================
+# MODULES
+# ==============================
+import os
+import json
+import docopt
+from loguru import logger
+from fastq_manifest import describe_fastq, manifest_path, write_manifest
+
+
+# ==============================
+# COMMAND LINE OPTIONS
+# ==============================
+# Define options
+DOC = """
+Gather per-lane bcl2fastq output into library FASTQ directory
+
+Usage:
+  gather_lanes.py --lanedir=<lanedir> --lanes=<lanes> --outdir=<outdir> --stamp=<stamp> [options]
+
+Arguments:
+  -l --lanedir=<lanedir>    Per-lane bcl2fastq output directory (required)
+  -n --lanes=<lanes>        Comma-separated list of lanes to gather (required)
+  -o --outdir=<outdir>      Library FASTQ directory (required)
+  -s --stamp=<stamp>        Stamp file to create on completion (required)
+
+Options:
+  -h --help                 Show this screen
+"""
+
+
+# ==============================
+# GLOBAL VARIABLES
+# ==============================
+# Stats.json fields containing one entry per lane
+LANE_FIELDS = ("ConversionResults", "ReadInfosForLanes", "UnknownBarcodes")
+
+
+# ==============================
+# FUNCTIONS
+# ==============================
+@logger.catch(reraise=True)
+def _main(opt: dict) -> None:
+    lanes = [os.path.join(opt["--lanedir"], x) for x in opt["--lanes"].split(",")]
+    missing = [x for x in lanes if not os.path.isdir(x)]
+    assert not missing, f"Lane output directories not found: {', '.join(missing)}"
+    logger.info("Gathering {} lanes from {}", len(lanes), os.path.abspath(opt["--lanedir"]))
+    fastqs = gather_fastqs(lanedirs=lanes, outdir=opt["--outdir"])
+    stats = merge_stats(
+        [
+            os.path.join(x, "Stats", "Stats.json")
+            for x in lanes
+            if os.path.isfile(os.path.join(x, "Stats", "Stats.json"))
+        ]
+    )
+    if stats is not None:
+        os.makedirs(os.path.join(opt["--outdir"], "Stats"), exist_ok=True)
+        tempfile = os.path.join(opt["--outdir"], "Stats", f".Stats.json.{os.getpid()}.tmp")
+        with open(file=tempfile, mode="w", encoding="UTF-8") as file:
+            json.dump(stats, fp=file, indent=2)
+        os.replace(tempfile, os.path.join(opt["--outdir"], "Stats", "Stats.json"))
+
+    # Create stamp file and FASTQ manifest
+    with open(file=opt["--stamp"], mode="a", encoding="UTF-8"):
+        os.utime(opt["--stamp"])
+    write_manifest(
+        fastqs=fastqs, stamp=opt["--stamp"], filename=manifest_path(opt["--stamp"])
+    )
+    logger.success("Output directory: {}", os.path.abspath(opt["--outdir"]))
+
+
+def gather_fastqs(lanedirs: list[str], outdir: str) -> list[dict]:
+    """
+    Hard link FASTQ files from per-lane bcl2fastq output directories into library FASTQ directory.
+
+    Arguments:
+        ``lanedirs``: List of per-lane bcl2fastq output directories.\n
+        ``outdir``: Library FASTQ directory.
+
+    Returns:
+        List of FASTQ manifest records for library FASTQ files (undetermined reads are excluded).
+    """
+    sources = {}
+    stack = list(lanedirs)
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                if describe_fastq(entry.path, size=0) is None:
+                    continue
+                assert entry.name not in sources, (
+                    f"Duplicate FASTQ file name across lanes: {entry.name} ({sources.get(entry.name)}, {entry.path}); "
+                    "bcl2fastq must not be run with --no-lane-splitting when scattering lanes."
+                )
+                sources[entry.name] = entry.path
+    os.makedirs(outdir, exist_ok=True)
+    fastqs = []
+    for name, path in sources.items():
+        target = os.path.join(outdir, name)
+        if os.path.lexists(target) and not os.path.samefile(path, target):
+            os.remove(target)
+        if not os.path.lexists(target):
+            os.link(path, target)
+        fastqs.append(describe_fastq(target, size=os.path.getsize(path)))
+    logger.info("Linked {} FASTQ files", len(fastqs))
+    return fastqs
+
+
+def merge_stats(paths: list[str]) -> dict | None:
+    """
+    Combine bcl2fastq demultiplexing statistics from per-lane Stats.json files.
+
+    Arguments:
+        ``paths``: List of paths to Stats.json files.
+
+    Returns:
+        Dictionary containing combined demultiplexing statistics (sorted by lane) or ``None``
+        if ``paths`` is empty.
+    """
+    merged = None
+    for path in paths:
+        with open(file=path, mode="r", encoding="UTF-8") as file:
+            stats = json.load(file)
+        if merged is None:
+            merged = {**stats, **{field: [] for field in LANE_FIELDS}}
+        for field in LANE_FIELDS:
+            merged[field].extend(stats.get(field, []))
+    if merged is not None:
+        for field in LANE_FIELDS:
+            merged[field].sort(key=lambda x: x.get("LaneNumber", x.get("Lane", 0)))
+    return merged
+
+
+# ==============================
+# SCRIPT
+# ==============================
+if __name__ == "__main__":
+    _main(opt=docopt.docopt(DOC))
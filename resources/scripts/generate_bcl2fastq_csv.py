@@ -26,11 +26,16 @@ Optional:
 # ==============================
 import os
 import csv
+import json
+import hashlib
 import docopt
 from loguru import logger
+import numpy as np
 import pandas as pd
-from classes import IndexKit
-from id import lib_id
+from classes import IndexKit, IndexKitRegistry
+from demux import plan_demux, sample_id
+from metadata import read_metadata
+from output import file_hash, write_changed, write_if_changed
 
 
 # ==============================
@@ -41,13 +46,15 @@ DOC = """
 Generate CSV sample sheets for use with bcl2fastq
 
 Usage:
-  generate_bcl2fastq_csv.py --md=<md> --outdir=<outdir> [--dual=<dual>] [--single=<single>] [options]
+  generate_bcl2fastq_csv.py --md=<md> --outdir=<outdir> [--dual=<dual>] [--single=<single>] [--mismatches=<n>] [options]
 
 Arguments:
   -m --md=<md>              Metadata table file (required)
   -o --outdir=<outdir>      Output directory (required)
   -d --dual=<dual>          Comma-separated list of dual index kit CSV files
   -s --single=<single>      Comma-separated list of single index kit CSV files
+  --cachedir=<cachedir>     Cache directory for compiled index kit registry [default: .cache]
+  --mismatches=<n>          Maximum number of barcode mismatches allowed by bcl2fastq [default: 1]
 
 Options:
   -r --reversecomplement    Use reverse complement of i5 index
@@ -61,83 +68,252 @@ Options:
 @logger.catch(reraise=True)
 def _main(opt: dict) -> None:
     # Read input CSV and check fields are valid
-    md = pd.read_csv(opt["--md"], header=0, sep=None, engine="python")
-    assert set(md.columns).issuperset(
-        {"run", "format", "lib_type", "sample_id", "sample_index", "lane"}
-    ), "Invalid metadata table file."
-    dual = (
-        (
+    md = read_metadata(md=opt["--md"])
+    md.require({"run", "format", "lib_type", "sample_id", "sample_index", "lane"})
+
+    # Generate sample sheets
+    generate_sample_sheets(
+        df=md.runs,
+        index_kits=read_index_kits(
+            dual=opt["--dual"].split(",") if opt["--dual"] is not None else None,
+            single=opt["--single"].split(",") if opt["--single"] is not None else None,
+            reverse_complement=opt["--reversecomplement"],
+            cache_dir=opt["--cachedir"],
+        ),
+        outdir=opt["--outdir"],
+        reverse_complement=opt["--reversecomplement"],
+        max_mismatches=int(opt["--mismatches"]),
+    )
+
+
+def read_index_kits(
+    dual: list[str] | None,
+    single: list[str] | None,
+    reverse_complement: bool = False,
+    cache_dir: str | None = None,
+) -> IndexKitRegistry | None:
+    """
+    Read index kit CSV files into an index kit registry (using compiled registry from cache if
+    index kit files and i5 index orientation are unchanged).
+
+    Arguments:
+        ``dual``: List of dual index kit CSV files or ``None``.\n
+        ``single``: List of single index kit CSV files or ``None``.\n
+        ``reverse_complement``: Use reverse complement of i5 index.\n
+        ``cache_dir``: Cache directory or ``None`` (no caching).
+
+    Returns:
+        IndexKitRegistry object or ``None`` (if no index kit CSV files provided).
+    """
+    if dual is None and single is None:
+        return None
+    files = [("dual", file) for file in dual or []] + [
+        ("single", file) for file in single or []
+    ]
+
+    path = None
+    if cache_dir is not None:
+        key = hashlib.sha1(
+            json.dumps(
+                [reverse_complement]
+                + [[index_type, file_hash(file)] for index_type, file in files]
+            ).encode()
+        ).hexdigest()
+        path = os.path.join(cache_dir, "index_kits", f"{key}.json")
+        if os.path.isfile(path):
+            logger.info("Using compiled index kit registry: {}", path)
+            with open(file=path, mode="r", encoding="UTF-8") as file:
+                return IndexKitRegistry.from_dict(json.load(file))
+
+    registry = IndexKitRegistry(
+        [
             IndexKit(
                 file=os.path.basename(file),
                 lookup=_read_index_csv(
                     filename=file,
                     # Choose appropriate i5 index sequence for sequencer workflow
                     index_cols=(
-                        slice(1, 4, 2) if opt["--reversecomplement"] else slice(1, 3, 1)
+                        (slice(1, 4, 2) if reverse_complement else slice(1, 3, 1))
+                        if index_type == "dual"
+                        else slice(1, None, 1)
                     ),
                 ),
-                index_type="dual",
+                index_type=index_type,
             )
-            for file in opt["--dual"].split(",")
-        )
-        if opt["--dual"] is not None
-        else None
+            for index_type, file in files
+        ]
     )
-    single = (
-        (
-            IndexKit(
-                file=os.path.basename(file),
-                lookup=_read_index_csv(
-                    filename=file,
-                    index_cols=slice(1, None, 1),
-                ),
-                index_type="single",
-            )
-            for file in opt["--single"].split(",")
+    if registry.conflicts:
+        logger.warning(
+            "Index names found in more than one index kit with different sequences: {}",
+            ", ".join(sorted(registry.conflicts)),
         )
-        if opt["--single"] is not None
-        else None
-    )
-    kits = (
-        {y for x in (dual, single) if x is not None for y in x}
-        if any(x is not None for x in (dual, single))
-        else None
-    )
+    if path is not None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tempfile = f"{path}.{os.getpid()}.tmp"
+        with open(file=tempfile, mode="w", encoding="UTF-8") as file:
+            json.dump(registry.to_dict(), fp=file)
+        os.replace(tempfile, path)
+        logger.info("Saved compiled index kit registry: {}", path)
+    return registry
 
+
+def generate_sample_sheets(
+    df: pd.DataFrame,
+    index_kits: IndexKitRegistry | None,
+    outdir: str,
+    reverse_complement: bool = False,
+    max_mismatches: int = 1,
+) -> tuple[dict[str, pd.DataFrame], dict[str, list[str]]]:
+    """
+    Generate CSV sample sheets for all libraries in BCL format, with barcode mismatch files
+    (``<lib_id>.mismatches``) containing the largest safe number of barcode mismatches for each library.
+
+    Arguments:
+        ``df``: DataFrame containing run metadata with unique library IDs.\n
+        ``index_kits``: IndexKitRegistry object to search for matching index kit or ``None``.\n
+        ``outdir``: Output directory.\n
+        ``reverse_complement``: Use reverse complement of literal i5 index sequences.\n
+        ``max_mismatches``: Maximum number of barcode mismatches allowed.
+
+    Returns:
+        Writes sample sheets and barcode mismatch files to ``outdir`` (if contents have changed)
+        and returns tuple of dictionary of DataFrames containing sample sheet data with library
+        IDs as keys and dictionary with lists of output file paths that were written
+        (``written``) and left unchanged (``unchanged``).
+    """
     # Select runs in BCL format only
-    md = md[md.format.str.upper() == "BCL"]
-
-    if not md.empty:
-        # Reverse complement literal i5 index sequence if required
-        if "sample_index2" in md.columns:
-            md["sample_index2"] = md.sample_index2.fillna("")
-            if opt["--reversecomplement"]:
-                md["sample_index2"] = md.sample_index2.apply(_reverse_complement)
-
-        # Add lane and unique library ID; create a row for each lane if not * and more than one specified
-        md = (
-            md.assign(
-                lane=lambda x: [
-                    "" if lane == "*" else str(lane).split() for lane in x.lane
-                ],
-                lib_id=lambda x: lib_id(x.lib_type.tolist(), x.run.tolist()),
-            )
-            .explode("lane")
-            .reset_index(drop=True)
+    md = df[df.format.str.upper() == "BCL"].copy()
+    if md.empty:
+        return {}, {"written": [], "unchanged": []}
+
+    # Reverse complement literal i5 index sequence if required
+    if "sample_index2" in md.columns:
+        md["sample_index2"] = md.sample_index2.fillna("")
+        if reverse_complement:
+            md["sample_index2"] = md.sample_index2.apply(_reverse_complement)
+
+    # Add lane; create a row for each lane if not * and more than one specified
+    md = (
+        md.assign(
+            lane=lambda x: ["" if lane == "*" else str(lane).split() for lane in x.lane]
         )
+        .explode("lane")
+        .reset_index(drop=True)
+    )
 
-        # Generate sample sheets
-        logger.info("Generating sample sheets for bcl2fastq")
-        for x in md.lib_id.unique():
-            generate_sample_sheet(
-                df=md[md.lib_id == x],
-                index_kits=kits,
-                filename=os.path.join(opt["--outdir"], f"{x}.csv"),
-            )
-            logger.success(
-                "Output file: {}",
-                os.path.abspath(os.path.join(opt["--outdir"], f"{x}.csv")),
+    # Generate sample sheets
+    logger.info("Generating sample sheets for bcl2fastq")
+    sheets, outputs = {}, {}
+    for x, libs in md.groupby("lib_id", sort=False):
+        sheets[x] = generate_sample_sheet(df=libs, index_kits=index_kits)
+        outputs[os.path.join(outdir, f"{x}.csv")] = format_sample_sheet(sheets[x])
+        outputs[os.path.join(outdir, f"{x}.mismatches")] = (
+            f"{barcode_mismatches(sheets[x], max_mismatches=max_mismatches)}\n"
+        )
+    return sheets, write_changed(outputs)
+
+
+def _merge_sheets(
+    sheets: dict[str, pd.DataFrame], index_lengths: list[int]
+) -> pd.DataFrame:
+    # Merge sample sheets with library IDs as Sample_Project and unique Sample_IDs; index
+    # sequences are truncated to index read lengths of unified bases mask (unused indexes dropped)
+    merged = pd.concat(
+        [
+            sheet.assign(
+                Sample_ID=[sample_id(lib, x) for x in sheet.Sample_ID],
+                Sample_Name=sheet.Sample_ID,
+                Sample_Project=lib,
             )
+            for lib, sheet in sheets.items()
+        ],
+        ignore_index=True,
+    )
+    indexes = []
+    for x, length in zip(("index", "index2"), index_lengths):
+        if x in merged.columns and length > 0:
+            merged[x] = merged[x].fillna("").astype(str).str[:length]
+            indexes.append(x)
+    return merged[["Lane", "Sample_ID", "Sample_Name", "Sample_Project"] + indexes]
+
+
+def generate_demux_sheets(
+    df: pd.DataFrame,
+    sheets: dict[str, pd.DataFrame],
+    masks: dict[str, str | None],
+    outdir: str,
+    max_mismatches: int = 1,
+) -> tuple[dict[str, dict], dict[str, list[str]]]:
+    """
+    Generate merged CSV sample sheets for run-level demultiplexing of compatible libraries
+    (``demux/<group>.csv``), with barcode mismatch files and demultiplexing plan (``demux.json``).
+    Index sequences are truncated to the index read lengths of the unified bases mask of each
+    group; libraries whose index sequences collide when merged are demultiplexed separately.
+
+    Arguments:
+        ``df``: DataFrame containing run metadata with unique library IDs.\n
+        ``sheets``: Dictionary of DataFrames containing sample sheet data with library IDs as keys
+        (as returned by ``generate_sample_sheets``).\n
+        ``masks``: Dictionary of effective bases masks (or ``None``) with library IDs as keys.\n
+        ``outdir``: Output directory.\n
+        ``max_mismatches``: Maximum number of barcode mismatches allowed.
+
+    Returns:
+        Writes merged sample sheets, barcode mismatch files and demultiplexing plan to ``outdir``
+        (if contents have changed) and returns tuple of demultiplexing plan (as returned by
+        ``demux.plan_demux``) and dictionary with lists of output file paths that were written
+        (``written``) and left unchanged (``unchanged``).
+    """
+    logger.info("Planning merged demultiplexing for bcl2fastq")
+    libs = (
+        df[["lib_id", "format", "run"]]
+        .drop_duplicates("lib_id")
+        .set_index("lib_id")
+        .to_dict("index")
+    )
+    index_lengths = {
+        lib: tuple(
+            int(sheet[x].fillna("").astype(str).str.len().min()) if x in sheet.columns else 0
+            for x in ("index", "index2")
+        )
+        for lib, sheet in sheets.items()
+    }
+    pending = list(
+        plan_demux(
+            libs={lib: libs[lib] for lib in sheets},
+            masks=masks,
+            index_lengths=index_lengths,
+        ).items()
+    )
+    plan, outputs = {}, {}
+    while pending:
+        group, entry = pending.pop(0)
+        merged = _merge_sheets(
+            {lib: sheets[lib] for lib in entry["libs"]}, index_lengths=entry["index_lengths"]
+        )
+        try:
+            mismatches = barcode_mismatches(merged, max_mismatches=max_mismatches)
+        except AssertionError as err:
+            if len(entry["libs"]) == 1:
+                raise
+            # Index collisions between libraries; demultiplex libraries separately
+            logger.warning("{} Demultiplexing libraries separately: {}", err, ", ".join(entry["libs"]))
+            pending += [
+                (
+                    f"{group}-{lib}",
+                    *plan_demux(
+                        libs={lib: libs[lib]}, masks=masks, index_lengths=index_lengths
+                    ).values(),
+                )
+                for lib in entry["libs"]
+            ]
+            continue
+        plan[group] = entry
+        outputs[os.path.join(outdir, "demux", f"{group}.csv")] = format_sample_sheet(merged)
+        outputs[os.path.join(outdir, "demux", f"{group}.mismatches")] = f"{mismatches}\n"
+    outputs[os.path.join(outdir, "demux.json")] = json.dumps(plan, indent=2, sort_keys=True) + "\n"
+    return plan, write_changed(outputs)
 
 
 def _read_index_csv(filename: str, index_cols: slice) -> dict:
@@ -146,13 +322,6 @@ def _read_index_csv(filename: str, index_cols: slice) -> dict:
         return {rows[0]: tuple(rows[index_cols]) for rows in data}
 
 
-def _get_index_kit(index_names: set[str], index_kits: set[IndexKit]) -> IndexKit | None:
-    for index_kit in index_kits:
-        if index_kit.match(names=index_names, strict=True):
-            return index_kit
-    return None
-
-
 def _reverse_complement(seq: str) -> str:
     if seq != "":
         assert set(seq).issubset("ATCG"), "Invalid bases detected in sequence."
@@ -160,9 +329,65 @@ def _reverse_complement(seq: str) -> str:
     return seq
 
 
+def _encode_indexes(seqs: list[str]) -> np.ndarray:
+    # Encode index sequences as 2D array of bytes (truncated to shortest sequence)
+    length = min(len(x) for x in seqs)
+    return np.frombuffer(
+        "".join(x[:length] for x in seqs).encode(), dtype=np.uint8
+    ).reshape(-1, length)
+
+
+def barcode_mismatches(df: pd.DataFrame, max_mismatches: int = 1) -> int:
+    """
+    Calculate largest safe number of barcode mismatches for a sample sheet from pairwise Hamming
+    distances between index sequences of different samples in each lane (samples without a lane
+    are compared against every lane).
+
+    Arguments:
+        ``df``: DataFrame containing sample sheet data as returned by ``generate_sample_sheet``.\n
+        ``max_mismatches``: Maximum number of barcode mismatches allowed.
+
+    Returns:
+        Largest number of barcode mismatches (up to ``max_mismatches``) for which no two samples can
+        be assigned the same reads. Raises ``AssertionError`` if index sequences of different samples collide.
+    """
+    reads = [
+        x
+        for x in ("index", "index2")
+        if x in df.columns and (df[x].fillna("").astype(str).str.len() > 0).all()
+    ]
+    if not reads:
+        return max_mismatches
+    lanes = df.Lane.astype(str)
+    safe = max_mismatches
+    for lane in sorted(set(lanes) - {""}) or [""]:
+        rows = df[lanes.isin({lane, ""})]
+        samples = pd.factorize(rows.Sample_ID)[0]
+        different = samples[:, None] != samples[None, :]
+        if not different.any():
+            continue
+        # Reads are assigned unambiguously with m mismatches if, for every pair of samples,
+        # at least one index read differs in more than 2m positions
+        pair_safe = None
+        for read in reads:
+            codes = _encode_indexes(rows[read].astype(str).tolist())
+            distances = (codes[:, None, :] != codes[None, :, :]).sum(axis=2)
+            pair_safe = (
+                (distances - 1) // 2
+                if pair_safe is None
+                else np.maximum(pair_safe, (distances - 1) // 2)
+            )
+        collisions = np.argwhere(different & (pair_safe < 0))
+        assert (
+            len(collisions) == 0
+        ), f"Index sequences collide for samples {rows.Sample_ID.iloc[collisions[0][0]]} and {rows.Sample_ID.iloc[collisions[0][1]]}{f' in lane {lane}' if lane else ''}."
+        safe = min(safe, int(pair_safe[different].min()))
+    return safe
+
+
 def generate_sample_sheet(
     df: pd.DataFrame,
-    index_kits: set[IndexKit] | None,
+    index_kits: IndexKitRegistry | None,
     filename: str | None = None,
 ) -> pd.DataFrame:
     """
@@ -170,14 +395,14 @@ def generate_sample_sheet(
 
     Arguments:
         ``df``: DataFrame containing run metadata for a single library.\n
-        ``index_kits``: Set of IndexKit objects to search for matching index kit or ``None``.\n
+        ``index_kits``: IndexKitRegistry object to search for matching index kit or ``None``.\n
         ``filename``: Output file path or ``None``.
 
     Returns:
-        Writes formatted CSV string to ``filename`` (if provided) and returns DataFrame containing CSV data.
+        Writes formatted CSV string to ``filename`` (if provided and contents have changed) and returns DataFrame containing CSV data.
     """
     index_kit = (
-        _get_index_kit(index_names=set(df.sample_index.unique()), index_kits=index_kits)
+        index_kits.resolve(names=set(df.sample_index.unique()))
         if index_kits is not None
         else None
     )
@@ -226,14 +451,24 @@ def generate_sample_sheet(
             )
 
     if filename is not None:
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        csv_string = "[Data]\n" + out.to_csv(header=True, index=False)
-        with open(file=filename, mode="w", encoding="UTF-8") as file:
-            file.write(csv_string)
+        write_if_changed(filename=filename, content=format_sample_sheet(out))
 
     return out
 
 
+def format_sample_sheet(df: pd.DataFrame) -> str:
+    """
+    Format bcl2fastq sample sheet.
+
+    Arguments:
+        ``df``: DataFrame containing sample sheet data.
+
+    Returns:
+        Formatted CSV string.
+    """
+    return "[Data]\n" + df.to_csv(header=True, index=False)
+
+
 # ==============================
 # SCRIPT
 # ==============================
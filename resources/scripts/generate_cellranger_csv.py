@@ -19,7 +19,8 @@ import os
 import docopt
 from loguru import logger
 import pandas as pd
-from id import lib_id
+from metadata import read_metadata
+from output import write_changed, write_if_changed
 
 
 # ==============================
@@ -48,28 +49,40 @@ Options:
 @logger.catch(reraise=True)
 def _main(opt: dict) -> None:
     # Read input CSV and check fields are valid
-    md = pd.read_csv(opt["--md"], header=0, sep=None, engine="python")
-    assert set(md.columns).issuperset(
-        {"run", "lib_type", "sample_id"}
-    ), "Invalid metadata table file."
-
-    # Add unique library ID
-    md = md.assign(lib_id=lambda x: lib_id(x.lib_type.tolist(), x.run.tolist()))
+    md = read_metadata(md=opt["--md"])
 
     # Generate library sheets
+    generate_library_sheets(
+        df=md.runs, fastqdir=opt["--fastqdir"], outdir=opt["--outdir"]
+    )
+
+
+def generate_library_sheets(df: pd.DataFrame, fastqdir: str, outdir: str) -> dict[str, list[str]]:
+    """
+    Generate CSV library sheets for all samples.
+
+    Arguments:
+        ``df``: DataFrame containing run metadata with unique library IDs.\n
+        ``fastqdir``: FASTQ directory.\n
+        ``outdir``: Output directory.
+
+    Returns:
+        Writes library sheets to ``outdir`` (if contents have changed) and returns dictionary
+        with lists of output file paths that were written (``written``) and left unchanged
+        (``unchanged``).
+    """
     logger.info("Generating library sheets for cellranger count")
-    for x in md.sample_id.unique():
-        generate_library_sheet(
-            df=md[(md.sample_id == x) & (~md.lib_type.isin({"ATAC", "BCR", "TCR"}))][
-                ["sample_id", "lib_id", "lib_type"]
-            ].drop_duplicates(),
-            fastqdir=opt["--fastqdir"],
-            filename=os.path.join(opt["--outdir"], f"{x}.csv"),
-        )
-        logger.success(
-            "Output file: {}",
-            os.path.abspath(os.path.join(opt["--outdir"], f"{x}.csv")),
-        )
+    libs = df[~df.lib_type.isin({"ATAC", "BCR", "TCR"})][
+        ["sample_id", "lib_id", "lib_type"]
+    ].drop_duplicates()
+    groups = dict(tuple(libs.groupby("sample_id", sort=False)))
+    outputs = {}
+    for x in df.sample_id.unique():
+        outputs[os.path.join(outdir, f"{x}.csv")] = generate_library_sheet(
+            df=groups.get(x, libs.iloc[:0]),
+            fastqdir=fastqdir,
+        ).to_csv(header=True, index=False)
+    return write_changed(outputs)
 
 
 def generate_library_sheet(
@@ -86,7 +99,7 @@ def generate_library_sheet(
         ``filename``: Output file path or ``None``.
 
     Returns:
-        Writes formatted CSV string to ``filename`` (if provided) and returns DataFrame containing CSV data.
+        Writes formatted CSV string to ``filename`` (if provided and contents have changed) and returns DataFrame containing CSV data.
     """
     out = pd.DataFrame(
         {
@@ -110,9 +123,7 @@ def generate_library_sheet(
     )
 
     if filename is not None:
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        with open(file=filename, mode="w", encoding="UTF-8") as file:
-            out.to_csv(path_or_buf=file, header=True, index=False)
+        write_if_changed(filename=filename, content=out.to_csv(header=True, index=False))
 
     return out
 
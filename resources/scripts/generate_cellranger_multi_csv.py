@@ -23,7 +23,8 @@ import os
 import docopt
 from loguru import logger
 import pandas as pd
-from id import lib_id
+from metadata import read_metadata
+from output import write_changed, write_if_changed
 
 
 # ==============================
@@ -60,45 +61,113 @@ Options:
 """
 
 
+# ==============================
+# GLOBAL VARIABLES
+# ==============================
+# Cell Ranger multi gene expression options (with defaults)
+OPTIONS = {
+    "create-bam": "true",
+    "tenx-cloud-token-path": None,
+    "cell-annotation-model": None,
+    "chemistry": None,
+    "expect-cells": None,
+    "force-cells": None,
+    "include-introns": None,
+    "no-secondary": None,
+    "check-library-compatibility": None,
+    "emptydrops-minimum-umis": None,
+}
+
+
 # ==============================
 # FUNCTIONS
 # ==============================
 @logger.catch(reraise=True)
 def _main(opt: dict) -> None:
     # Read input CSVs and check fields are valid
-    md = pd.read_csv(opt["--md"], header=0, sep=None, engine="python")
-    assert set(md.columns).issuperset(
-        {"run", "lib_type", "sample_id"}
-    ), "Invalid metadata table file."
+    md = read_metadata(md=opt["--md"], hashes=opt["--hashes"])
+
+    # Generate configuration sheets
+    generate_config_sheets(
+        df=md.runs,
+        fastqdir=opt["--fastqdir"],
+        outdir=opt["--outdir"],
+        options={k: opt[f"--{k}"] for k in OPTIONS},
+        hashes=md.hashes,
+        features=opt["--features"],
+        transcriptome=opt["--transcriptome"],
+        vdj=opt["--vdj"],
+    )
 
-    if opt["--hashes"]:
-        hashes = pd.read_csv(opt["--hashes"], header=0, sep=None, engine="python")
-        assert set(hashes.columns).issuperset(
-            {"sample_id", "hash_id"}
-        ), "Invalid sample hashing CSV file."
 
-    # Add unique library ID
-    md = md.assign(lib_id=lambda x: lib_id(x.lib_type.tolist(), x.run.tolist()))
+def get_options(options: dict) -> dict:
+    """
+    Get Cell Ranger multi gene expression options.
 
-    # Generate library sheets
+    Arguments:
+        ``options``: Dictionary of option names (without leading '--') and values.
+
+    Returns:
+        Dictionary of all option names and values formatted as strings (or ``None`` if not set)
+        with defaults for missing options.
+    """
+    assert set(options.keys()).issubset(
+        OPTIONS.keys()
+    ), f"Invalid cellranger multi options: {', '.join(set(options.keys()) - OPTIONS.keys())}"
+    return {
+        **OPTIONS,
+        **{
+            k: v if isinstance(v, str) or v is None else str(v).lower()
+            for k, v in options.items()
+        },
+    }
+
+
+def generate_config_sheets(
+    df: pd.DataFrame,
+    fastqdir: str,
+    outdir: str,
+    options: dict,
+    hashes: pd.DataFrame | None = None,
+    features: str | None = None,
+    transcriptome: str | None = None,
+    vdj: str | None = None,
+) -> dict[str, list[str]]:
+    """
+    Generate CSV configuration sheets for all samples.
+
+    Arguments:
+        ``df``: DataFrame containing run metadata with unique library IDs.\n
+        ``fastqdir``: FASTQ directory.\n
+        ``outdir``: Output directory.\n
+        ``options``: Dictionary of Cell Ranger multi gene expression options.\n
+        ``hashes``: DataFrame containing sample hashing metadata or ``None``.\n
+        ``features``: Features reference CSV file path or ``None``.\n
+        ``transcriptome``: Cell Ranger transcriptome reference path or ``None``.\n
+        ``vdj``: Cell Ranger VDJ reference path or ``None``.
+
+    Returns:
+        Writes configuration sheets to ``outdir`` (if contents have changed) and returns dictionary
+        with lists of output file paths that were written (``written``) and left unchanged
+        (``unchanged``).
+    """
     logger.info("Generating configuration sheets for cellranger multi")
-    for x in md.sample_id.unique():
-        generate_config_sheet(
-            libraries=md[(md.sample_id == x) & (md.lib_type.isin({"GEX", "ADT", "HTO", "CRISPR", "BCR", "TCR"}))][
-                ["sample_id", "lib_id", "lib_type"]
-            ].drop_duplicates(),
-            fastqdir=opt["--fastqdir"],
-            options={k.removeprefix("--"): opt[k] for k in {"--create-bam", "--tenx-cloud-token-path", "--cell-annotation-model", "--chemistry", "--expect-cells", "--force-cells", "--include-introns", "--no-secondary", "--check-library-compatibility", "--emptydrops-minimum-umis"} if k in opt},
-            hashes=hashes[hashes.sample_id == x] if opt["--hashes"] else None,
-            features=opt["--features"],
-            transcriptome=opt["--transcriptome"],
-            vdj=opt["--vdj"],
-            filename=os.path.join(opt["--outdir"], f"{x}.csv"),
-        )
-        logger.success(
-            "Output file: {}",
-            os.path.abspath(os.path.join(opt["--outdir"], f"{x}.csv")),
+    libs = df[df.lib_type.isin({"GEX", "ADT", "HTO", "CRISPR", "BCR", "TCR"})][
+        ["sample_id", "lib_id", "lib_type"]
+    ].drop_duplicates()
+    groups = dict(tuple(libs.groupby("sample_id", sort=False)))
+    outputs = {}
+    for x in df.sample_id.unique():
+        outputs[os.path.join(outdir, f"{x}.csv")] = generate_config_sheet(
+            libraries=groups.get(x, libs.iloc[:0]),
+            fastqdir=fastqdir,
+            options=options,
+            hashes=hashes[hashes.sample_id == x] if hashes is not None else None,
+            features=features,
+            transcriptome=transcriptome,
+            vdj=vdj,
         )
+    return write_changed(outputs)
 
 
 def _generate_library_sheet(df: pd.DataFrame, fastqdir: str) -> pd.DataFrame:
@@ -168,7 +237,7 @@ def generate_config_sheet(
         ``filename``: Output file path or ``None``.
 
     Returns:
-        Writes formatted CSV string to ``filename`` (if provided) and returns CSV string.
+        Writes formatted CSV string to ``filename`` (if provided and contents have changed) and returns CSV string.
     """
     libraries = _generate_library_sheet(libraries, fastqdir)
     if hashes is not None:
@@ -198,9 +267,7 @@ def generate_config_sheet(
     out = "\n".join(out)
 
     if filename:
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        with open(file=filename, mode="w", encoding="UTF-8") as file:
-            file.write(out)
+        write_if_changed(filename=filename, content=out)
 
     return out
 
@@ -20,7 +20,8 @@ import yaml
 import docopt
 from loguru import logger
 import pandas as pd
-from id import lib_id
+from metadata import read_metadata
+from output import write_if_changed
 
 
 # ==============================
@@ -42,29 +43,28 @@ Options:
 """
 
 
+# ==============================
+# GLOBAL VARIABLES
+# ==============================
+# Use LibYAML bindings if available
+DUMPER = getattr(yaml, "CDumper", yaml.Dumper)
+
+
 # ==============================
 # FUNCTIONS
 # ==============================
 @logger.catch(reraise=True)
 def _main(opt: dict) -> None:
     # Read input CSV and check fields are valid
-    md = pd.read_csv(opt["--md"], header=0, sep=None, engine="python")
-    assert set(md.columns).issuperset(
-        {"run", "format", "lib_type", "sample_id"}
-    ), "Invalid metadata table file."
-
-    # Add unique library ID
-    md = md.assign(lib_id=lambda x: lib_id(x.lib_type.tolist(), x.run.tolist()))
+    md = read_metadata(md=opt["--md"])
+    md.require({"run", "format", "lib_type", "sample_id"})
 
     # Generate info YAML
     logger.info("Generating info YAML")
     generate_info_yaml(
-        df=md[["sample_id", "lib_id", "format", "lib_type", "run"]].drop_duplicates(),
+        df=md.runs[["sample_id", "lib_id", "format", "lib_type", "run"]].drop_duplicates(),
         filename=os.path.join(opt["--outdir"], "info.yaml"),
     )
-    logger.success(
-        "Output file: {}", os.path.abspath(os.path.join(opt["--outdir"], "info.yaml"))
-    )
 
 
 def generate_info_yaml(df: pd.DataFrame, filename: str | None = None) -> dict:
@@ -76,18 +76,20 @@ def generate_info_yaml(df: pd.DataFrame, filename: str | None = None) -> dict:
         ``filename``: Output file path or ``None``.
 
     Returns:
-        Writes formatted YAML string to ``filename`` (if provided) and returns dictionary containing YAML data.
+        Writes formatted YAML string to ``filename`` (if provided and contents have changed) and returns dictionary containing YAML data.
     """
-    out = {
-        sample_id: libs.loc[sample_id].to_dict("index")
-        for sample_id, libs in df.set_index(["sample_id", "lib_id"]).groupby(
-            "sample_id"
-        )
-    }
+    assert not df.duplicated(
+        ["sample_id", "lib_id"]
+    ).any(), "Duplicate sample/library IDs with different metadata."
+    fields = [x for x in df.columns if x not in {"sample_id", "lib_id"}]
+    out = {}
+    for sample_id, lib_id, *values in df[["sample_id", "lib_id", *fields]].itertuples(
+        index=False
+    ):
+        out.setdefault(sample_id, {})[lib_id] = dict(zip(fields, values))
 
     if filename is not None:
-        with open(file=filename, mode="w", encoding="UTF-8") as file:
-            yaml.dump(data=out, stream=file)
+        write_if_changed(filename=filename, content=yaml.dump(data=out, Dumper=DUMPER))
 
     return out
 
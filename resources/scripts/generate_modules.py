@@ -18,6 +18,7 @@ import string
 import yaml
 import docopt
 from loguru import logger
+from output import write_if_changed
 
 
 # ==============================
@@ -67,10 +68,6 @@ def _main(opt: dict) -> None:
             template=opt["--template"],
             filename=os.path.join(opt["--outdir"], f"{name}.smk"),
         )
-        logger.success(
-            "Output file: {}",
-            os.path.abspath(os.path.join(opt["--outdir"], f"{name}.smk")),
-        )
 
 
 def generate_module(
@@ -85,7 +82,7 @@ def generate_module(
         ``filename``: Output file path or ``None``.
 
     Returns:
-        Writes module script to ``filename`` (if provided) and returns script as string.
+        Writes module script to ``filename`` (if provided and contents have changed) and returns script as string.
     """
     with open(file=template, mode="r", encoding="UTF-8") as file:
         template = string.Template(file.read())
@@ -98,8 +95,7 @@ def generate_module(
     )
 
     if filename is not None:
-        with open(file=filename, mode="w", encoding="UTF-8") as file:
-            file.write(out)
+        write_if_changed(filename=filename, content=out)
 
     return out
 
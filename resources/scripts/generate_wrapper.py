@@ -15,6 +15,7 @@ import os
 import string
 import docopt
 from loguru import logger
+from output import write_if_changed
 
 
 # ==============================
@@ -60,7 +61,6 @@ def _main(opt: dict) -> None:
         template=opt["--template"],
         filename=opt["--file"],
     )
-    logger.success("Output file: {}", os.path.abspath(opt["--file"]))
 
 
 def generate_wrapper(module: str, template: str, filename: str | None = None) -> str:
@@ -73,7 +73,7 @@ def generate_wrapper(module: str, template: str, filename: str | None = None) ->
         ``filename``: Output file path or ``None``.
 
     Returns:
-        Writes wrapper script to ``filename`` (if provided) and returns script as string.
+        Writes wrapper script to ``filename`` (if provided and contents have changed) and returns script as string.
     """
     with open(file=template, mode="r", encoding="UTF-8") as file:
         template = string.Template(file.read())
@@ -81,8 +81,7 @@ def generate_wrapper(module: str, template: str, filename: str | None = None) ->
     out = template.substitute(LOAD=LOAD.format(module))
 
     if filename is not None:
-        with open(file=filename, mode="w", encoding="UTF-8") as file:
-            file.write(out)
+        write_if_changed(filename=filename, content=out)
 
     return out
 
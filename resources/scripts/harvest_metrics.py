@@ -0,0 +1,289 @@
+#!/bin/env python
+
+
+"""
+Harvests mapping/counting metrics from tool output files into one consolidated per-sample table.
+Tool output files are found for each sample in the pipeline output directory and parsed
+concurrently (one parser per tool output file format); metrics are saved as a typed columnar table
+with one row per sample and one float column per tool metric (named <tool>/<metric>; percentages
+are converted to fractions).
+Output is written as Parquet (default) or Feather.
+Requires:
+- pyarrow (or fastparquet for Parquet output)
+- Pipeline output directory with one subfolder for each sample in tool output directories e.g.
+    starsolo/<sample>/Log.final.out
+    starsolo/<sample>/Solo.out/<feature>/Summary.csv
+    chromap_macs2/<sample>/chromap.out
+    chromap_macs2/<sample>/chromap_summary.csv
+    chromap_macs2/<sample>/fragment_summary.tsv
+    barcounter/<sample>/<sample>_BarCounter.log
+    cellranger*/<sample>/outs/metrics_summary.csv (or summary.csv for Cell Ranger ARC)
+"""
+
+
+# ==============================
+# MODULES
+# ==============================
+import os
+import re
+import csv
+import glob
+from concurrent.futures import ThreadPoolExecutor
+import docopt
+from loguru import logger
+import pandas as pd
+
+
+# ==============================
+# COMMAND LINE OPTIONS
+# ==============================
+# Define options
+DOC = """
+Harvest tool metrics into consolidated per-sample table
+
+Usage:
+  harvest_metrics.py --inputdir=<inputdir> --outdir=<outdir> [--samples=<samples> --format=<format> --threads=<threads>] [options]
+
+Arguments:
+  -i --inputdir=<inputdir>  Pipeline output directory (required)
+  -o --outdir=<outdir>      Output directory (required)
+  -s --samples=<samples>    Comma-separated list of sample IDs (defaults to all sample folders in tool output directories)
+  -f --format=<format>      Output format (parquet, feather) [default: parquet]
+  -t --threads=<threads>    Number of threads [default: 1]
+
+Options:
+  -h --help                 Show this screen
+"""
+
+
+# ==============================
+# GLOBAL VARIABLES
+# ==============================
+FORMATS = ("parquet", "feather")
+
+
+# ==============================
+# FUNCTIONS
+# ==============================
+@logger.catch(reraise=True)
+def _main(opt: dict) -> None:
+    assert opt["--format"] in FORMATS, f"Invalid output format: {opt['--format']}."
+    samples = (
+        opt["--samples"].split(",")
+        if opt["--samples"]
+        else find_samples(opt["--inputdir"])
+    )
+    logger.info("Harvesting metrics for {} samples", len(samples))
+    df = harvest(inputdir=opt["--inputdir"], samples=samples, threads=int(opt["--threads"]))
+    logger.info("Harvested {} metrics for {} samples", df.shape[1], df.shape[0])
+    filename = write_table(df, outdir=opt["--outdir"], name="metrics", fmt=opt["--format"])
+    logger.success("Output file: {}", os.path.abspath(filename))
+
+
+def _number(value: str) -> float | None:
+    value = value.strip().replace(",", "")
+    scale = 1.0
+    if value.endswith("%"):
+        value, scale = value[:-1], 0.01
+    try:
+        return float(value) * scale
+    except ValueError:
+        return None
+
+
+def _pairs(pairs) -> dict[str, float]:
+    out = {}
+    for key, value in pairs:
+        number = _number(value)
+        if number is not None:
+            out[key.strip()] = number
+    return out
+
+
+def parse_star_log(path: str) -> dict[str, float]:
+    """
+    Parse STAR Log.final.out file ('<metric> | <value>' lines).
+    """
+    with open(file=path, mode="r", encoding="UTF-8") as file:
+        return _pairs(line.split("|", 1) for line in file if "|" in line)
+
+
+def parse_solo_summary(path: str) -> dict[str, float]:
+    """
+    Parse STARsolo Summary.csv file ('<metric>,<value>' rows); metrics are prefixed with feature type.
+    """
+    feature = os.path.basename(os.path.dirname(path))
+    with open(file=path, mode="r", encoding="UTF-8", newline="") as file:
+        return {
+            f"{feature}/{k}": v
+            for k, v in _pairs((row[0], row[-1]) for row in csv.reader(file) if len(row) >= 2).items()
+        }
+
+
+def parse_chromap_log(path: str) -> dict[str, float]:
+    """
+    Parse chromap log file ('<metric>: <value>.' lines).
+    """
+    pattern = re.compile(r"^([^:]+): ([\d.]+)\.?$")
+    with open(file=path, mode="r", encoding="UTF-8") as file:
+        return _pairs(
+            match.groups() for line in file if (match := pattern.match(line.strip())) is not None
+        )
+
+
+def parse_chromap_summary(path: str) -> dict[str, float]:
+    """
+    Parse chromap per-barcode summary CSV file (metrics are summed across barcodes).
+    """
+    df = pd.read_csv(path, header=0, index_col=0)
+    return {k: float(v) for k, v in df.select_dtypes("number").sum().items()}
+
+
+def parse_table_row(path: str) -> dict[str, float]:
+    """
+    Parse TSV file with one header row and one row of values (e.g. fragment_summary.tsv).
+    """
+    df = pd.read_csv(path, sep="\t", header=0, nrows=1)
+    return {k: float(v) for k, v in df.select_dtypes("number").iloc[0].items()}
+
+
+def parse_barcounter_log(path: str) -> dict[str, float]:
+    """
+    Parse BarCounter log file ('\\t<metric>: <value>' lines).
+    """
+    pattern = re.compile(r"\t([^\t:]+): (\d+)\s*$")
+    with open(file=path, mode="r", encoding="UTF-8") as file:
+        return _pairs(
+            match.groups() for line in file if (match := pattern.search(line)) is not None
+        )
+
+
+def parse_cellranger_metrics(path: str) -> dict[str, float]:
+    """
+    Parse Cell Ranger metrics summary CSV file (one header row and one row of values, or
+    Cell Ranger multi format with one row per metric).
+    """
+    with open(file=path, mode="r", encoding="UTF-8", newline="") as file:
+        rows = list(csv.reader(file))
+    if not rows:
+        return {}
+    header = rows[0]
+    if "Metric Name" in header and "Metric Value" in header:
+        index = {k: header.index(k) for k in ("Library Type", "Metric Name", "Metric Value")}
+        return _pairs(
+            (f"{row[index['Library Type']]}/{row[index['Metric Name']]}", row[index["Metric Value"]])
+            for row in rows[1:]
+        )
+    return _pairs(zip(header, rows[1])) if len(rows) > 1 else {}
+
+
+# Tool output files (relative to sample folder in pipeline output directory) and parsers
+SOURCES = [
+    ("star", "starsolo/{sample}/Log.final.out", parse_star_log),
+    ("starsolo", "starsolo/{sample}/Solo.out/*/Summary.csv", parse_solo_summary),
+    ("chromap", "chromap_macs2/{sample}/chromap.out", parse_chromap_log),
+    ("chromap", "chromap_macs2/{sample}/chromap_summary.csv", parse_chromap_summary),
+    ("fragment_stats", "chromap_macs2/{sample}/fragment_summary.tsv", parse_table_row),
+    ("barcounter", "barcounter/{sample}/{sample}_BarCounter.log", parse_barcounter_log),
+    ("cellranger", "cellranger/{sample}/outs/metrics_summary.csv", parse_cellranger_metrics),
+    ("cellranger_atac", "cellranger_atac/{sample}/outs/summary.csv", parse_cellranger_metrics),
+    ("cellranger_arc", "cellranger_arc/{sample}/outs/summary.csv", parse_cellranger_metrics),
+    ("cellranger_vdj", "cellranger_vdj/{sample}/outs/metrics_summary.csv", parse_cellranger_metrics),
+    ("cellranger_multi", "cellranger_multi/{sample}/outs/per_sample_outs/*/metrics_summary.csv", parse_cellranger_metrics),
+]
+
+
+def find_samples(inputdir: str) -> list[str]:
+    """
+    Find sample folders in tool output directories.
+
+    Arguments:
+        ``inputdir``: Pipeline output directory.
+
+    Returns:
+        Sorted list of sample IDs.
+    """
+    tooldirs = {pattern.split("/", 1)[0] for _, pattern, _ in SOURCES}
+    return sorted(
+        {
+            entry.name
+            for tooldir in tooldirs
+            if os.path.isdir(os.path.join(inputdir, tooldir))
+            for entry in os.scandir(os.path.join(inputdir, tooldir))
+            if entry.is_dir()
+        }
+    )
+
+
+def _parse(tool: str, sample: str, path: str, parser) -> tuple[str, str, dict[str, float]]:
+    try:
+        return tool, sample, parser(path)
+    except Exception as err:  # pylint: disable=broad-except
+        logger.warning("Unable to parse {} ({}): {}", path, tool, err)
+        return tool, sample, {}
+
+
+def harvest(inputdir: str, samples: list[str], threads: int = 1) -> pd.DataFrame:
+    """
+    Find and parse tool output files for all samples concurrently.
+
+    Arguments:
+        ``inputdir``: Pipeline output directory.\n
+        ``samples``: List of sample IDs.\n
+        ``threads``: Number of threads. Default: ``1``.
+
+    Returns:
+        DataFrame with one row per sample (index ``sample``) and one float column per tool metric.
+    """
+    tasks = [
+        (tool, sample, path, parser)
+        for sample in samples
+        for tool, pattern, parser in SOURCES
+        for path in sorted(glob.glob(os.path.join(inputdir, pattern.format(sample=glob.escape(sample)))))
+    ]
+    logger.info("Parsing {} tool output files", len(tasks))
+    records = {sample: {} for sample in samples}
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+        for tool, sample, metrics in executor.map(lambda x: _parse(*x), tasks):
+            records[sample].update({f"{tool}/{k}": v for k, v in metrics.items()})
+    # Samples without any metrics are kept as empty rows
+    df = pd.DataFrame.from_dict(records, orient="index", dtype="float64").reindex(samples)
+    df.index.name = "sample"
+    return df.sort_index(axis=0).sort_index(axis=1)
+
+
+def write_table(df: pd.DataFrame, outdir: str, name: str, fmt: str = "parquet") -> str:
+    """
+    Write table atomically as Parquet or Feather.
+
+    Arguments:
+        ``df``: DataFrame.\n
+        ``outdir``: Output directory.\n
+        ``name``: Output file name (without extension).\n
+        ``fmt``: Output format ('parquet' or 'feather'). Default: ``"parquet"``.
+
+    Returns:
+        Path to output file.
+    """
+    os.makedirs(outdir, exist_ok=True)
+    filename = os.path.join(outdir, f"{name}.{fmt}")
+    tempfile = os.path.join(outdir, f".{name}.{fmt}.{os.getpid()}.tmp")
+    try:
+        if fmt == "parquet":
+            df.to_parquet(tempfile, index=True)
+        else:
+            df.reset_index().to_feather(tempfile)
+        os.replace(tempfile, filename)
+    except ImportError as err:
+        raise RuntimeError(f"{fmt.capitalize()} output requires pyarrow: {err}") from err
+    finally:
+        if os.path.isfile(tempfile):
+            os.remove(tempfile)
+    return filename
+
+
+# ==============================
+# SCRIPT
+# ==============================
+if __name__ == "__main__":
+    _main(opt=docopt.docopt(DOC))
@@ -42,4 +42,4 @@ def fcid(run: list[str]) -> list[str]:
     Returns:
         List of flow cell IDs.
     """
-    return map(lambda x: x.split("_")[-1], run)
+    return [x.split("_")[-1] for x in run]
@@ -0,0 +1,191 @@
+"""
+Functions for estimating job resources for use with preprocessing pipeline rules.
+Memory, runtime and disk requirements are estimated from total input FASTQ size and reference
+size using a linear model for each rule; models are refined using benchmark records from previous
+pipeline runs saved under the pipeline state directory.
+"""
+
+import os
+import csv
+import glob
+import numpy as np
+
+
+PIPELINE_DIR = ".pipeline"
+HEADROOM = 1.2
+GB = 1 << 30
+MB = 1 << 20
+
+# Resource models for each rule:
+# (intercept, per GB of input FASTQ, per MB of reference, default if input size unknown, maximum)
+# mem_mb and disk_mb in MB; runtime in minutes
+MODELS = {
+    "cellranger": {
+        "mem_mb": (16000, 500, 1.0, 256000, 256000),
+        "runtime": (60, 6, 0, 360, 2880),
+        "disk_mb": (20000, 3000, 0, 20000, None),
+    },
+    "cellranger_atac": {
+        "mem_mb": (16000, 400, 1.0, 256000, 256000),
+        "runtime": (60, 5, 0, 360, 2880),
+        "disk_mb": (20000, 3000, 0, 20000, None),
+    },
+    "cellranger_arc": {
+        "mem_mb": (32000, 500, 1.0, 256000, 256000),
+        "runtime": (90, 6, 0, 360, 2880),
+        "disk_mb": (40000, 3000, 0, 40000, None),
+    },
+    "cellranger_vdj": {
+        "mem_mb": (16000, 300, 0.5, 256000, 256000),
+        "runtime": (30, 4, 0, 360, 2880),
+        "disk_mb": (10000, 2000, 0, 10000, None),
+    },
+    "cellranger_multi": {
+        "mem_mb": (32000, 500, 1.0, 256000, 256000),
+        "runtime": (90, 6, 0, 360, 2880),
+        "disk_mb": (40000, 3000, 0, 40000, None),
+    },
+    "starsolo": {
+        "mem_mb": (4000, 200, 1.1, 51200, 256000),
+        "runtime": (15, 3, 0, 180, 1440),
+        "disk_mb": (10000, 2000, 0, 10000, None),
+    },
+    # Batch of samples mapped sequentially against one shared genome (memory scales with the
+    # largest sample and includes BAM sorting RAM; runtime and disk scale with all samples)
+    "starsolo_batch": {
+        "mem_mb": (14000, 200, 1.1, 61440, 256000),
+        "runtime": (20, 3, 0, 720, 2880),
+        "disk_mb": (10000, 2000, 0, 10000, None),
+    },
+    "chromap": {
+        "mem_mb": (4000, 300, 1.2, 51200, 256000),
+        "runtime": (15, 2, 0, 180, 1440),
+        "disk_mb": (10000, 1500, 0, 10000, None),
+    },
+}
+
+# Benchmark record fields used to refine each resource (with conversion to resource units)
+BENCHMARK_FIELDS = {
+    "mem_mb": ("max_rss", 1),
+    "runtime": ("s", 1 / 60),
+    "disk_mb": ("io_out", 1),
+}
+
+_REFERENCES = {}
+_BENCHMARKS = {}
+
+
+def reference_size(paths: list[str]) -> int:
+    """
+    Get total size of reference files (directories are walked recursively).
+
+    Arguments:
+        ``paths``: List of reference file or directory paths.
+
+    Returns:
+        Total size in bytes (missing paths are ignored).
+    """
+    total = 0
+    for path in paths:
+        if path not in _REFERENCES:
+            size = 0
+            stack = [path]
+            while stack:
+                current = stack.pop()
+                try:
+                    if not os.path.isdir(current):
+                        size += os.stat(current).st_size
+                        continue
+                    with os.scandir(current) as entries:
+                        for entry in entries:
+                            if entry.is_dir(follow_symlinks=True):
+                                stack.append(entry.path)
+                            else:
+                                size += entry.stat().st_size
+                except FileNotFoundError:
+                    continue
+            _REFERENCES[path] = size
+        total += _REFERENCES[path]
+    return total
+
+
+def read_benchmarks(rule: str, pipeline_dir: str = PIPELINE_DIR) -> dict[str, list[dict]]:
+    """
+    Read benchmark records for a rule from previous pipeline runs.
+
+    Arguments:
+        ``rule``: Rule name.\n
+        ``pipeline_dir``: Pipeline state directory. Default: ``".pipeline"``.
+
+    Returns:
+        Dictionary of lists of benchmark records (field names as keys and numeric values) with
+        job keys (benchmark file names without extension, e.g. sample ID) as keys.
+    """
+    key = (rule, pipeline_dir)
+    if key not in _BENCHMARKS:
+        records = {}
+        for path in sorted(
+            glob.glob(os.path.join(pipeline_dir, "benchmarks", "**", rule, "*.tsv"), recursive=True)
+        ):
+            with open(file=path, mode="r", encoding="UTF-8") as file:
+                for row in csv.DictReader(file, delimiter="\t"):
+                    record = {}
+                    for field, value in row.items():
+                        try:
+                            record[field] = float(value)
+                        except (TypeError, ValueError):
+                            continue
+                    records.setdefault(os.path.splitext(os.path.basename(path))[0], []).append(record)
+        _BENCHMARKS[key] = records
+    return _BENCHMARKS[key]
+
+
+def estimate(
+    rule: str,
+    resource: str,
+    fastq_bytes: int,
+    reference_bytes: int = 0,
+    observations: list[tuple[int, dict]] | None = None,
+    attempt: int = 1,
+) -> int:
+    """
+    Estimate resource requirement for a job.
+
+    Arguments:
+        ``rule``: Rule name (must be in ``MODELS``).\n
+        ``resource``: Resource name ('mem_mb', 'runtime' or 'disk_mb').\n
+        ``fastq_bytes``: Total size of input FASTQ files in bytes.\n
+        ``reference_bytes``: Total size of reference files in bytes. Default: ``0``.\n
+        ``observations``: List of tuples of input FASTQ size in bytes and benchmark record from
+        previous runs of the rule or ``None``.\n
+        ``attempt``: Snakemake job attempt number (estimate is scaled for retried jobs). Default: ``1``.
+
+    Returns:
+        Estimated resource requirement (rule default if input FASTQ size is unknown).
+    """
+    assert rule in MODELS, f"No resource model for rule {rule}."
+    intercept, slope, per_reference, default, maximum = MODELS[rule][resource]
+    if not fastq_bytes:
+        return default
+
+    base = intercept + per_reference * reference_bytes / MB
+    value = base + slope * fastq_bytes / GB
+    field, scale = BENCHMARK_FIELDS[resource]
+    points = [
+        (size / GB, record[field] * scale)
+        for size, record in observations or []
+        if size and record.get(field, None) is not None
+    ]
+    if points:
+        x, y = np.array(points, dtype=float).T
+        fit = np.polyfit(x, y, 1) if len(x) >= 3 and np.ptp(x) > 0 else None
+        if fit is not None and fit[0] >= 0:
+            # Least-squares fit shifted up to cover the largest observed underestimate
+            residual = max(float((y - np.polyval(fit, x)).max()), 0)
+            value = float(np.polyval(fit, fastq_bytes / GB)) + residual
+        else:
+            # Scale prior model by the largest observed ratio to its prediction
+            value *= float((y / (base + slope * x)).max())
+
+    value = max(value, intercept) * HEADROOM * attempt
+    return int(min(value, maximum) if maximum is not None else value)
@@ -0,0 +1,125 @@
+#!/bin/env python
+
+
+"""
+Creates symbolic links to FASTQ files for a library in the pipeline output directory.
+Input directory is scanned once and all links are created in a single process; existing links
+that already point to the correct target are left unchanged.
+Requires:
+- Input FASTQ directory with FASTQ files named according to default Illumina convention
+  e.g. SampleID_Sx_Lxxx_Rx_001.fastq.gz
+"""
+
+
+# ==============================
+# MODULES
+# ==============================
+import os
+import docopt
+from loguru import logger
+from fastq_manifest import describe_fastq, manifest_path, parse_fastq_name, write_manifest
+
+
+# ==============================
+# COMMAND LINE OPTIONS
+# ==============================
+# Define options
+DOC = """
+Create symbolic links to FASTQ files for a library
+
+Usage:
+  link_fastq.py --indir=<indir> --outdir=<outdir> --stamp=<stamp> [options]
+
+Arguments:
+  -i --indir=<indir>        Input FASTQ directory (required)
+  -o --outdir=<outdir>      Output FASTQ directory (required)
+  -s --stamp=<stamp>        Stamp file to create on completion (required)
+
+Options:
+  -h --help                 Show this screen
+"""
+
+
+# ==============================
+# FUNCTIONS
+# ==============================
+@logger.catch(reraise=True)
+def _main(opt: dict) -> None:
+    fastqs = link_fastqs(indir=opt["--indir"], outdir=opt["--outdir"])
+
+    # Create stamp file and FASTQ manifest
+    with open(file=opt["--stamp"], mode="a", encoding="UTF-8"):
+        os.utime(opt["--stamp"])
+    write_manifest(
+        fastqs=fastqs, stamp=opt["--stamp"], filename=manifest_path(opt["--stamp"])
+    )
+    logger.success("Output directory: {}", os.path.abspath(opt["--outdir"]))
+
+
+def link_fastq(target: str, link: str) -> bool:
+    """
+    Create (or replace) symbolic link to FASTQ file.
+
+    Arguments:
+        ``target``: Absolute path to FASTQ file.\n
+        ``link``: Path to symbolic link.
+
+    Returns:
+        ``True`` if link was created or replaced; ``False`` if link already points to ``target``.
+    """
+    try:
+        if os.readlink(link) == target:
+            return False
+    except OSError:
+        pass
+    tempfile = os.path.join(os.path.dirname(link), f".{os.path.basename(link)}.tmp")
+    if os.path.lexists(tempfile):
+        os.remove(tempfile)
+    os.symlink(target, tempfile)
+    os.replace(tempfile, link)
+    return True
+
+
+def link_fastqs(indir: str, outdir: str) -> list[dict]:
+    """
+    Create symbolic links to FASTQ files (reads only, first chunk) in input directory (recursively).
+
+    Arguments:
+        ``indir``: Input FASTQ directory.\n
+        ``outdir``: Output FASTQ directory.
+
+    Returns:
+        List of FASTQ manifest records for linked FASTQ files (undetermined reads are excluded).
+    """
+    os.makedirs(outdir, exist_ok=True)
+    fastqs = []
+    n_linked, n_created = 0, 0
+    stack = [os.path.abspath(indir)]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    stack.append(entry.path)
+                    continue
+                fields = parse_fastq_name(entry.name)
+                if fields is None or not fields["read"].startswith("R") or fields["chunk"] != "001":
+                    continue
+                link = os.path.join(outdir, entry.name)
+                n_linked += 1
+                if link_fastq(target=entry.path, link=link):
+                    logger.info("Processing file: {}", entry.path)
+                    n_created += 1
+                fastq = describe_fastq(link, size=entry.stat().st_size)
+                if fastq is not None:
+                    fastqs.append(fastq)
+    logger.info(
+        "Linked {} FASTQ files ({} already up to date)", n_linked, n_linked - n_created
+    )
+    return fastqs
+
+
+# ==============================
+# SCRIPT
+# ==============================
+if __name__ == "__main__":
+    _main(opt=docopt.docopt(DOC))
@@ -0,0 +1,98 @@
+"""
+Functions and classes for reading run metadata for use with preprocessing pipeline scripts.
+"""
+
+import os
+import pandas as pd
+from id import lib_id
+
+
+# Separators for unambiguous file extensions (other files, e.g. .txt, are sniffed)
+SEPARATORS = {".tsv": "\t", ".tab": "\t", ".csv": ","}
+
+
+class Metadata:
+    """
+    Object class containing parsed run metadata (runs table with unique library IDs and
+    optional sample hashing table).
+    """
+
+    def __init__(
+        self,
+        runs: pd.DataFrame,
+        hashes: pd.DataFrame | None = None,
+    ) -> None:
+        assert set(runs.columns).issuperset(
+            {"run", "lib_type", "sample_id"}
+        ), "Invalid metadata table file."
+        if hashes is not None:
+            assert set(hashes.columns).issuperset(
+                {"sample_id", "hash_id"}
+            ), "Invalid sample hashing CSV file."
+        self.runs = runs.assign(lib_id=_lib_ids(runs))
+        self.hashes = hashes
+
+    def __repr__(self) -> str:
+        return f"Metadata\nRuns: {self.runs.run.nunique()}\nSamples: {self.runs.sample_id.nunique()}\nLibraries: {self.runs.lib_id.nunique()}"
+
+    @property
+    def formats(self) -> set[str]:
+        """
+        Set of input file types (upper case) in runs table.
+        """
+        if "format" not in self.runs.columns:
+            return set()
+        return set(self.runs.format.dropna().str.upper().unique())
+
+    def require(self, columns: set[str]) -> None:
+        """
+        Check runs table contains fields.
+
+        Arguments:
+            ``columns``: Set of required field names.
+        """
+        assert set(self.runs.columns).issuperset(columns), "Invalid metadata table file."
+
+
+def read_table(filename: str) -> pd.DataFrame:
+    """
+    Read delimited table file (with headers); separator is inferred from file extension for
+    .tsv, .tab and .csv files (otherwise sniffed from file contents, e.g. for .txt files).
+
+    Arguments:
+        ``filename``: Table file path.
+
+    Returns:
+        DataFrame containing table data.
+    """
+    sep = SEPARATORS.get(os.path.splitext(filename)[1].lower())
+    if sep is None:
+        return pd.read_csv(filename, header=0, sep=None, engine="python")
+    return pd.read_csv(filename, header=0, sep=sep)
+
+
+def read_metadata(md: str, hashes: str | None = None) -> Metadata:
+    """
+    Read run metadata.
+
+    Arguments:
+        ``md``: Metadata table file.\n
+        ``hashes``: Sample hashing CSV file or ``None``.
+
+    Returns:
+        Metadata object.
+    """
+    return Metadata(
+        runs=read_table(md),
+        hashes=read_table(hashes) if hashes else None,
+    )
+
+
+def _lib_ids(runs: pd.DataFrame) -> list[str]:
+    # Generate library IDs once per unique library type/run combination
+    keys = list(zip(runs.lib_type.astype(str), runs.run.astype(str)))
+    unique = list(dict.fromkeys(keys))
+    ids = dict(
+        zip(unique, lib_id([x for x, _ in unique], [y for _, y in unique]))
+    )
+    return [ids[x] for x in keys]
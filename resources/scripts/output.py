@@ -0,0 +1,79 @@
+"""
+Functions for writing output files for use with preprocessing pipeline scripts.
+"""
+
+import os
+import hashlib
+from loguru import logger
+
+
+BLOCK_SIZE = 1 << 20
+
+
+def file_hash(filename: str) -> str | None:
+    """
+    Calculate SHA-256 hash of file contents.
+
+    Arguments:
+        ``filename``: File path.
+
+    Returns:
+        Hexadecimal digest or ``None`` if file does not exist.
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(file=filename, mode="rb") as file:
+            while block := file.read(BLOCK_SIZE):
+                digest.update(block)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def write_if_changed(filename: str, content: str) -> bool:
+    """
+    Write file atomically only if contents have changed (existing file is left untouched otherwise).
+
+    Arguments:
+        ``filename``: Output file path.\n
+        ``content``: File contents.
+
+    Returns:
+        ``True`` if file was written; ``False`` if file already exists with identical contents.
+    """
+    data = content.encode("UTF-8")
+    if file_hash(filename) == hashlib.sha256(data).hexdigest():
+        logger.info("Output file unchanged: {}", os.path.abspath(filename))
+        return False
+    if os.path.dirname(filename):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+    tempfile = os.path.join(
+        os.path.dirname(filename), f".{os.path.basename(filename)}.{os.getpid()}.tmp"
+    )
+    with open(file=tempfile, mode="wb") as file:
+        file.write(data)
+    os.replace(tempfile, filename)
+    logger.success("Output file: {}", os.path.abspath(filename))
+    return True
+
+
+def write_changed(
+    outputs: dict[str, str], changes: dict[str, list[str]] | None = None
+) -> dict[str, list[str]]:
+    """
+    Write files atomically only if contents have changed and record which files were written.
+
+    Arguments:
+        ``outputs``: Dictionary of file contents with output file paths as keys.\n
+        ``changes``: Dictionary to add output file paths to (as returned by ``write_changed``) or
+        ``None`` (new dictionary).
+
+    Returns:
+        Dictionary with lists of output file paths that were written (``written``) and left
+        unchanged (``unchanged``).
+    """
+    changes = changes if changes is not None else {"written": [], "unchanged": []}
+    for filename, content in outputs.items():
+        written = write_if_changed(filename=filename, content=content)
+        changes["written" if written else "unchanged"].append(filename)
+    return changes
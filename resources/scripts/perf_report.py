@@ -0,0 +1,245 @@
+#!/bin/env python
+
+
+"""
+Reports job performance from Snakemake benchmark records of previous pipeline runs.
+Benchmark records are combined across run snapshots into per-rule and per-job (sample/library)
+tables; jobs in the latest snapshot that used more wall time or memory than in their previous
+snapshot are flagged as regressions.
+Requires:
+- Pipeline state directory with benchmark snapshots saved by run.py
+    .pipeline/benchmarks/<timestamp>/<rule>/<job>.tsv
+"""
+
+
+# ==============================
+# MODULES
+# ==============================
+import os
+import glob
+import json
+import docopt
+from loguru import logger
+import pandas as pd
+from output import write_if_changed
+
+
+# ==============================
+# COMMAND LINE OPTIONS
+# ==============================
+# Define options
+DOC = """
+Report job performance from benchmark records of previous pipeline runs
+
+Usage:
+  perf_report.py --pipelinedir=<pipelinedir> [--outdir=<outdir>] [--threshold=<threshold>] [options]
+
+Arguments:
+  -p --pipelinedir=<pipelinedir>  Pipeline state directory (required)
+  -o --outdir=<outdir>            Output directory (defaults to 'perf' in pipeline state directory)
+  -t --threshold=<threshold>      Minimum relative increase in wall time or max RSS flagged as regression [default: 0.2]
+
+Options:
+  -h --help                       Show this screen
+"""
+
+
+# ==============================
+# GLOBAL VARIABLES
+# ==============================
+# Benchmark fields reported (Snakemake benchmark TSV columns)
+FIELDS = ["s", "max_rss", "io_in", "io_out", "mean_load", "cpu_time"]
+# Benchmark fields checked for regressions
+REGRESSION_FIELDS = ["s", "max_rss"]
+
+
+# ==============================
+# FUNCTIONS
+# ==============================
+@logger.catch(reraise=True)
+def _main(opt: dict) -> None:
+    outdir = opt["--outdir"] or os.path.join(opt["--pipelinedir"], "perf")
+    df = read_benchmarks(os.path.join(opt["--pipelinedir"], "benchmarks"))
+    assert not df.empty, f"No benchmark records found in {os.path.join(opt['--pipelinedir'], 'benchmarks')}"
+    logger.info(
+        "Read {} benchmark records from {} run snapshots", len(df), df["snapshot"].nunique()
+    )
+
+    rules = summarise_rules(df)
+    jobs = summarise_jobs(df)
+    regressions = find_regressions(df, threshold=float(opt["--threshold"]))
+    write_if_changed(os.path.join(outdir, "rules.tsv"), rules.to_csv(sep="\t", index=False))
+    write_if_changed(os.path.join(outdir, "jobs.tsv"), jobs.to_csv(sep="\t", index=False))
+    write_if_changed(
+        os.path.join(outdir, "regressions.tsv"), regressions.to_csv(sep="\t", index=False)
+    )
+    write_if_changed(
+        os.path.join(outdir, "summary.json"),
+        json.dumps(summarise(df, rules=rules, regressions=regressions), indent=2),
+    )
+
+    logger.info(
+        "Latest run snapshot ({}):\n{}",
+        df["snapshot"].max(),
+        rules[rules["snapshot"] == df["snapshot"].max()].to_string(index=False),
+    )
+    if regressions.empty:
+        logger.success("No regressions against previous run snapshots")
+    else:
+        logger.warning(
+            "{} regressions against previous run snapshots:\n{}",
+            len(regressions),
+            regressions.to_string(index=False),
+        )
+
+
+def read_benchmarks(benchmark_dir: str) -> pd.DataFrame:
+    """
+    Read Snakemake benchmark records from run snapshots.
+
+    Arguments:
+        ``benchmark_dir``: Directory containing one subfolder for each run snapshot, each with one
+        subfolder of benchmark TSV files for each rule.
+
+    Returns:
+        DataFrame with one row per benchmark file (repeated measurements are averaged) and columns
+        ``snapshot``, ``rule``, ``job`` and benchmark fields.
+    """
+    records = []
+    for path in sorted(glob.glob(os.path.join(benchmark_dir, "*", "*", "**", "*.tsv"), recursive=True)):
+        snapshot, rule, *job = os.path.relpath(path, benchmark_dir).split(os.sep)
+        bench = pd.read_csv(path, sep="\t", na_values=["NA", "-"])
+        records.append(
+            {
+                "snapshot": snapshot,
+                "rule": rule,
+                "job": os.path.splitext("/".join(job))[0],
+                **{
+                    field: pd.to_numeric(bench[field], errors="coerce").mean()
+                    if field in bench.columns
+                    else float("nan")
+                    for field in FIELDS
+                },
+            }
+        )
+    return pd.DataFrame.from_records(records, columns=["snapshot", "rule", "job", *FIELDS])
+
+
+def summarise_rules(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Summarise benchmark records per rule for each run snapshot.
+
+    Arguments:
+        ``df``: DataFrame as returned by ``read_benchmarks``.
+
+    Returns:
+        DataFrame with number of jobs, total/mean/max wall time (s), max RSS (MB), total I/O (MB)
+        and total CPU time (s) per rule and run snapshot.
+    """
+    return (
+        df.groupby(["snapshot", "rule"])
+        .agg(
+            jobs=("job", "size"),
+            total_s=("s", "sum"),
+            mean_s=("s", "mean"),
+            max_s=("s", "max"),
+            max_rss=("max_rss", "max"),
+            io_in=("io_in", "sum"),
+            io_out=("io_out", "sum"),
+            cpu_time=("cpu_time", "sum"),
+        )
+        .reset_index()
+        .round(2)
+    )
+
+
+def summarise_jobs(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Summarise benchmark records per job (sample/library) across run snapshots.
+
+    Arguments:
+        ``df``: DataFrame as returned by ``read_benchmarks``.
+
+    Returns:
+        DataFrame with number of runs, latest run snapshot, latest and mean wall time (s) and
+        latest and max RSS (MB) per rule and job.
+    """
+    df = df.sort_values("snapshot")
+    return (
+        df.groupby(["rule", "job"])
+        .agg(
+            runs=("snapshot", "size"),
+            snapshot=("snapshot", "last"),
+            s=("s", "last"),
+            mean_s=("s", "mean"),
+            max_rss=("max_rss", "last"),
+            peak_rss=("max_rss", "max"),
+        )
+        .reset_index()
+        .round(2)
+    )
+
+
+def find_regressions(df: pd.DataFrame, threshold: float = 0.2) -> pd.DataFrame:
+    """
+    Compare jobs in the latest run snapshot against their most recent previous benchmark record.
+
+    Arguments:
+        ``df``: DataFrame as returned by ``read_benchmarks``.\n
+        ``threshold``: Minimum relative increase flagged as regression. Default: ``0.2``.
+
+    Returns:
+        DataFrame with rule, job, field, previous snapshot, previous and latest values and relative
+        change for each regression.
+    """
+    columns = ["rule", "job", "field", "previous_snapshot", "previous", "latest", "change"]
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+    latest = df["snapshot"].max()
+    current = df[df["snapshot"] == latest].set_index(["rule", "job"])
+    previous = (
+        df[df["snapshot"] < latest]
+        .sort_values("snapshot")
+        .groupby(["rule", "job"])
+        .last()
+    )
+    merged = current.join(previous, how="inner", lsuffix="_latest", rsuffix="_previous")
+    regressions = []
+    for (rule, job), row in merged.iterrows():
+        for field in REGRESSION_FIELDS:
+            before, after = row[f"{field}_previous"], row[f"{field}_latest"]
+            if pd.notna(before) and pd.notna(after) and before > 0 and after > before * (1 + threshold):
+                regressions.append(
+                    [rule, job, field, row["snapshot_previous"], before, after, round(after / before - 1, 3)]
+                )
+    return pd.DataFrame(regressions, columns=columns)
+
+
+def summarise(df: pd.DataFrame, rules: pd.DataFrame, regressions: pd.DataFrame) -> dict:
+    """
+    Build performance summary for export.
+
+    Arguments:
+        ``df``: DataFrame as returned by ``read_benchmarks``.\n
+        ``rules``: DataFrame as returned by ``summarise_rules``.\n
+        ``regressions``: DataFrame as returned by ``find_regressions``.
+
+    Returns:
+        Dictionary with list of run snapshots, per-rule summary for the latest snapshot and list of regressions.
+    """
+    latest = df["snapshot"].max()
+    return {
+        "snapshots": sorted(df["snapshot"].unique().tolist()),
+        "latest": latest,
+        "rules": json.loads(
+            rules[rules["snapshot"] == latest].drop(columns="snapshot").to_json(orient="records")
+        ),
+        "regressions": json.loads(regressions.to_json(orient="records")),
+    }
+
+
+# ==============================
+# SCRIPT
+# ==============================
+if __name__ == "__main__":
+    _main(opt=docopt.docopt(DOC))
@@ -0,0 +1,190 @@
+#!/bin/env python
+
+
+"""
+Post-processes mapping/counting output directories (e.g. STARsolo and MACS2 count matrices).
+Count matrix files (barcodes.tsv, features.tsv and matrix.mtx) in count matrix subfolders and
+BAM files are found in a single walk of the output directory; count matrix files are compressed
+with pigz and BAM files are indexed with samtools concurrently across the allocated threads.
+Outputs are written atomically; files that are already compressed or indexed are skipped so
+that retried jobs only process remaining files.
+Requires:
+- samtools available in PATH (if output directory contains BAM files)
+- pigz available in PATH (falls back to gzip compression in Python if unavailable)
+"""
+
+
+# ==============================
+# MODULES
+# ==============================
+import os
+import gzip
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import docopt
+from loguru import logger
+
+
+# ==============================
+# COMMAND LINE OPTIONS
+# ==============================
+# Define options
+DOC = """
+Compress count matrix files and index BAM files in output directory
+
+Usage:
+  postprocess.py --dir=<dir> [--matrix-dir=<name>...] [--threads=<threads>] [options]
+
+Arguments:
+  -d --dir=<dir>                Output directory (required)
+  -m --matrix-dir=<name>        Name of count matrix subfolder(s) containing files to compress (can be specified multiple times)
+  -t --threads=<threads>        Number of threads [default: 1]
+
+Options:
+  -h --help                     Show this screen
+  --no-index                    Do not index BAM files
+"""
+
+
+# ==============================
+# GLOBAL VARIABLES
+# ==============================
+MATRIX_FILES = ("barcodes.tsv", "features.tsv", "matrix.mtx")
+
+
+# ==============================
+# FUNCTIONS
+# ==============================
+@logger.catch(reraise=True)
+def _main(opt: dict) -> None:
+    done = postprocess(
+        outdir=opt["--dir"],
+        matrix_dirs=opt["--matrix-dir"],
+        index=not opt["--no-index"],
+        threads=int(opt["--threads"]),
+    )
+    logger.success("Post-processed {} files in {}", len(done), os.path.abspath(opt["--dir"]))
+
+
+def find_outputs(outdir: str, matrix_dirs: list[str], index: bool = True) -> dict[str, list[str]]:
+    """
+    Find count matrix files to compress and BAM files to index in a single walk of output directory.
+
+    Arguments:
+        ``outdir``: Output directory.\n
+        ``matrix_dirs``: List of names of count matrix subfolders.\n
+        ``index``: Boolean indicating whether to find BAM files. Default: ``True``.
+
+    Returns:
+        Dictionary with lists of paths to uncompressed count matrix files (``compress``) and BAM
+        files without up-to-date index (``index``).
+    """
+    outputs = {"compress": [], "index": []}
+    matrix_dirs = set(matrix_dirs)
+    for root, _, files in os.walk(outdir):
+        parts = set(os.path.relpath(root, outdir).split(os.sep))
+        for name in files:
+            path = os.path.join(root, name)
+            if name in MATRIX_FILES and parts & matrix_dirs:
+                outputs["compress"].append(path)
+            elif index and name.endswith(".bam"):
+                bai = f"{path}.bai"
+                if not os.path.isfile(bai) or os.path.getmtime(bai) < os.path.getmtime(path):
+                    outputs["index"].append(path)
+    return outputs
+
+
+def compress(path: str, threads: int = 1) -> str:
+    """
+    Compress file atomically (input file is removed after compressed file is written).
+
+    Arguments:
+        ``path``: File path.\n
+        ``threads``: Number of pigz threads. Default: ``1``.
+
+    Returns:
+        Path to compressed file.
+    """
+    output = f"{path}.gz"
+    tempfile = os.path.join(os.path.dirname(path), f".{os.path.basename(output)}.{os.getpid()}.tmp")
+    try:
+        with open(file=tempfile, mode="wb") as file:
+            if shutil.which("pigz") is not None:
+                subprocess.run(["pigz", "-c", "-p", str(threads), path], stdout=file, check=True)
+            else:
+                with open(file=path, mode="rb") as src, gzip.GzipFile(fileobj=file, mode="wb") as dst:
+                    shutil.copyfileobj(src, dst, length=1 << 20)
+        os.replace(tempfile, output)
+    finally:
+        if os.path.isfile(tempfile):
+            os.remove(tempfile)
+    os.remove(path)
+    return output
+
+
+def index_bam(path: str, threads: int = 1) -> str:
+    """
+    Index BAM file atomically.
+
+    Arguments:
+        ``path``: BAM file path.\n
+        ``threads``: Number of samtools threads. Default: ``1``.
+
+    Returns:
+        Path to BAM index file.
+    """
+    output = f"{path}.bai"
+    tempfile = os.path.join(os.path.dirname(path), f".{os.path.basename(output)}.{os.getpid()}.tmp")
+    try:
+        subprocess.run(
+            ["samtools", "index", "-b", "-@", str(threads), path, tempfile], check=True
+        )
+        os.replace(tempfile, output)
+    finally:
+        if os.path.isfile(tempfile):
+            os.remove(tempfile)
+    return output
+
+
+def postprocess(
+    outdir: str, matrix_dirs: list[str], index: bool = True, threads: int = 1
+) -> list[str]:
+    """
+    Compress count matrix files and index BAM files concurrently.
+
+    Arguments:
+        ``outdir``: Output directory.\n
+        ``matrix_dirs``: List of names of count matrix subfolders.\n
+        ``index``: Boolean indicating whether to index BAM files. Default: ``True``.\n
+        ``threads``: Total number of threads (shared between concurrent tasks). Default: ``1``.
+
+    Returns:
+        List of paths to compressed and index files.
+    """
+    outputs = find_outputs(outdir, matrix_dirs=matrix_dirs, index=index)
+    tasks = [(compress, x) for x in outputs["compress"]] + [(index_bam, x) for x in outputs["index"]]
+    if not tasks:
+        logger.info("No files to post-process in {}", os.path.abspath(outdir))
+        return []
+    # Largest files first so that long-running tasks start early; threads are shared in
+    # proportion to file size (at least 1 thread per task)
+    sizes = {path: os.path.getsize(path) for _, path in tasks}
+    tasks.sort(key=lambda x: sizes[x[1]], reverse=True)
+    total = max(sum(sizes.values()), 1)
+    with ThreadPoolExecutor(max_workers=max(1, min(len(tasks), threads))) as executor:
+        futures = [
+            executor.submit(func, path, threads=max(1, threads * sizes[path] // total))
+            for func, path in tasks
+        ]
+        done = [future.result() for future in futures]
+    for path in done:
+        logger.info("Output file: {}", path)
+    return done
+
+
+# ==============================
+# SCRIPT
+# ==============================
+if __name__ == "__main__":
+    _main(opt=docopt.docopt(DOC))
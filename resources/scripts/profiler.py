@@ -0,0 +1,155 @@
+"""
+Functions for profiling Snakemake workflow construction for use with preprocessing pipeline modules.
+Profiling is opt-in (set environment variable PIPELINE_PROFILE=1 or 'profile_dag: True' in pipeline
+configuration); rule helper functions are wrapped with call counters and cumulative timers and
+a ranked report is written when DAG construction has finished.
+"""
+
+import os
+import time
+import atexit
+import functools
+import contextlib
+import types
+
+
+ENV_VAR = "PIPELINE_PROFILE"
+REPORT_DIR = "logs/dag_profile"
+
+
+class DagProfiler:
+    """
+    Object class containing call counts and cumulative times for profiled functions and sections
+    (all methods are no-ops if profiling is disabled).
+    """
+
+    def __init__(self, enabled: bool, report_dir: str = REPORT_DIR) -> None:
+        self.enabled = enabled
+        self.report_dir = report_dir
+        self.start = time.perf_counter()
+        self.stats = {}
+        self.written = None
+        if enabled:
+            atexit.register(self.report)
+
+    def __repr__(self) -> str:
+        return f"DagProfiler\nEnabled: {self.enabled}\nProfiled entries: {len(self.stats)}"
+
+    @classmethod
+    def from_config(cls, config: dict) -> "DagProfiler":
+        """
+        Create profiler, enabled if environment variable PIPELINE_PROFILE or config key 'profile_dag' is set.
+
+        Arguments:
+            ``config``: Snakemake ``config`` dictionary.
+
+        Returns:
+            DagProfiler object.
+        """
+        value = os.environ.get(ENV_VAR, "").strip().lower()
+        return cls(enabled=value not in ("", "0", "false", "no") or bool(config.get("profile_dag", False)))
+
+    def _record(self, name: str, elapsed: float) -> None:
+        entry = self.stats.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+
+    def timer(self, name: str):
+        """
+        Start timing a section of code that cannot be wrapped in a ``with`` block (e.g. Snakemake
+        ``include`` directives).
+
+        Arguments:
+            ``name``: Section name used in report.
+
+        Returns:
+            Function to call at the end of the section.
+        """
+        if not self.enabled:
+            return lambda: None
+        start = time.perf_counter()
+        return lambda: self._record(name, time.perf_counter() - start)
+
+    @contextlib.contextmanager
+    def section(self, name: str):
+        """
+        Time a block of code.
+
+        Arguments:
+            ``name``: Section name used in report.
+        """
+        stop = self.timer(name)
+        try:
+            yield
+        finally:
+            stop()
+
+    def wrap(self, func, name: str | None = None):
+        """
+        Wrap function with call counter and cumulative timer.
+
+        Arguments:
+            ``func``: Function to wrap.\n
+            ``name``: Name used in report or ``None`` (for function name).
+
+        Returns:
+            Wrapped function (or ``func`` if profiling is disabled).
+        """
+        if not self.enabled or getattr(func, "__profiled__", False):
+            return func
+        name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._record(name, time.perf_counter() - start)
+
+        wrapper.__profiled__ = True
+        return wrapper
+
+    def instrument(self, module: types.ModuleType, namespace: dict | None = None) -> None:
+        """
+        Wrap all functions defined in a module (including private helpers so that calls between
+        helpers are counted) and replace references to them in a namespace.
+
+        Arguments:
+            ``module``: Module containing functions to wrap.\n
+            ``namespace``: Dictionary of names (e.g. Snakefile ``globals()``) or ``None``.
+        """
+        if not self.enabled:
+            return
+        for name, func in list(vars(module).items()):
+            if not isinstance(func, types.FunctionType) or func.__module__ != module.__name__:
+                continue
+            wrapped = self.wrap(func, name=f"{module.__name__.rsplit('.', 1)[-1]}.{name}")
+            setattr(module, name, wrapped)
+            if namespace is not None and namespace.get(name, None) is func:
+                namespace[name] = wrapped
+
+    def report(self) -> str | None:
+        """
+        Write ranked report (by cumulative time) to report directory; only the first call writes a report.
+
+        Returns:
+            Path to report file or ``None`` if profiling is disabled.
+        """
+        if not self.enabled or self.written is not None:
+            return self.written
+        total = time.perf_counter() - self.start
+        rows = sorted(self.stats.items(), key=lambda x: x[1][1], reverse=True)
+        os.makedirs(self.report_dir, exist_ok=True)
+        self.written = os.path.join(
+            self.report_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.tsv"
+        )
+        with open(file=self.written, mode="w", encoding="UTF-8") as file:
+            file.write("rank\tname\tcalls\ttotal_s\tmean_ms\tpercent\n")
+            for rank, (name, (calls, elapsed)) in enumerate(rows, start=1):
+                file.write(
+                    f"{rank}\t{name}\t{calls}\t{elapsed:.4f}\t{1000 * elapsed / calls:.4f}\t{100 * elapsed / total:.1f}\n"
+                )
+            file.write(f"\tTOTAL\t\t{total:.4f}\t\t100.0\n")
+        print(f"DAG profile: {os.path.abspath(self.written)}")
+        return self.written
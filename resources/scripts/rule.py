@@ -3,8 +3,65 @@ Functions for use in Snakemake rule definitions.
 """
 
 import os
-import glob
-import xml.etree.ElementTree as ET
+import csv
+import json
+import types
+from resources.scripts.fastq_manifest import FastqManifest, get_manifest
+from resources.scripts.job_resources import PIPELINE_DIR, estimate, read_benchmarks, reference_size
+from resources.scripts.runinfo import CACHE_DIR, bases_mask as _bases_mask, get_run_info
+
+
+class _LibraryIndex:
+    """
+    Immutable index of sample/library info for constant-time lookups in rule helpers.
+    """
+
+    __slots__ = ("info", "samples", "libs", "sample_libs", "lib_samples", "_select")
+
+    def __init__(self, info: dict) -> None:
+        libs = {}
+        sample_libs = {}
+        lib_samples = {}
+        for sample, records in info.items():
+            sample_libs[sample] = tuple(records.keys())
+            for lib, record in records.items():
+                libs[lib] = types.MappingProxyType(dict(record))
+                lib_samples.setdefault(lib, []).append(sample)
+        self.info = info
+        self.samples = tuple(info.keys())
+        self.libs = types.MappingProxyType(libs)
+        self.sample_libs = types.MappingProxyType(sample_libs)
+        self.lib_samples = types.MappingProxyType(
+            {lib: tuple(samples) for lib, samples in lib_samples.items()}
+        )
+        self._select = {}
+
+    def select(self, sample: str, lib_types: set[str]) -> tuple[str]:
+        """
+        Get libraries for a sample matching a set of library types (use * to match any library type).
+        """
+        key = (sample, frozenset(lib_types))
+        if key not in self._select:
+            self._select[key] = tuple(
+                lib
+                for lib in self.sample_libs[sample]
+                if "*" in key[1] or self.libs[lib]["lib_type"] in key[1]
+            )
+        return self._select[key]
+
+
+_INDEX = {}
+_MANIFESTS = {}
+_LANES = {}
+_OBSERVATIONS = {}
+
+
+def _get_index(info: dict) -> _LibraryIndex:
+    # Index is keyed by object identity; stored reference to info guards against ID reuse
+    index = _INDEX.get(id(info), None)
+    if index is None or index.info is not info:
+        index = _INDEX[id(info)] = _LibraryIndex(info)
+    return index
 
 
 def _get_fastq_rule(lib: str, libs: str, read_trim: bool) -> str:
@@ -17,9 +74,30 @@ def _get_fastq_rule(lib: str, libs: str, read_trim: bool) -> str:
     return rule
 
 
+def _get_fastq_stamp(lib: str, libs: dict, read_trim: bool) -> str | None:
+    stamp = os.path.abspath(f"stamps/{_get_fastq_rule(lib, libs, read_trim)}/{lib}.stamp")
+    return stamp if os.path.isfile(stamp) else None
+
+
+def _get_fastq_manifest(
+    lib: str, libs: dict, output_dir: str, read_trim: bool
+) -> FastqManifest:
+    # Manifests are memoized per library until the FASTQ stamp file changes (FASTQ directories
+    # without a stamp file, e.g. before demultiplexing, are scanned once)
+    stamp = _get_fastq_stamp(lib, libs, read_trim)
+    key = (stamp, os.stat(stamp).st_mtime_ns) if stamp is not None else None
+    cached = _MANIFESTS.get(lib, None)
+    if cached is None or cached[0] != key:
+        cached = _MANIFESTS[lib] = (
+            key,
+            get_manifest(os.path.join(output_dir, f"fastqs/{lib}"), stamp=stamp),
+        )
+    return cached[1]
+
+
 def parse_info(info: dict) -> dict:
     """
-    Parse dictionary of sample/library info.
+    Parse dictionary of sample/library info and build the library index used by all rule helpers.
 
     Arguments:
         ``info``: dictionary of sample/library info.
@@ -27,13 +105,9 @@ def parse_info(info: dict) -> dict:
     Returns:
         Dictionary of parsed sample/library info.
     """
-    samples = list(info.keys())
-
-    libs = {}
-    for sample in samples:
-        libs.update(info[sample])
+    index = _get_index(info)
 
-    return {"samples": samples, "libs": libs}
+    return {"samples": list(index.samples), "libs": dict(index.libs)}
 
 
 def get_run_path(wildcards, info: dict, run_dir: str) -> str:
@@ -48,7 +122,7 @@ def get_run_path(wildcards, info: dict, run_dir: str) -> str:
     Returns:
         Path to run folder.
     """
-    libs = parse_info(info)["libs"]
+    libs = _get_index(info).libs
     return os.path.join(run_dir, libs[wildcards.lib]["run"])
 
 
@@ -63,12 +137,16 @@ def get_lib_type(wildcards, info: dict) -> str:
     Returns:
         Library type.
     """
-    libs = parse_info(info)["libs"]
+    libs = _get_index(info).libs
     return libs[wildcards.lib]["lib_type"]
 
 
 def get_bases_mask_flag(
-    wildcards, bases_mask: dict | None, info: dict, run_dir: str
+    wildcards,
+    bases_mask: dict | None,
+    info: dict,
+    run_dir: str,
+    cache_dir: str | None = CACHE_DIR,
 ) -> str:
     """
     Get bases mask flag for bcl2fastq.
@@ -77,29 +155,283 @@ def get_bases_mask_flag(
         ``wildcards``: Snakemake ``wildcards`` object.\n
         ``bases_mask``: dictionary of bases mask strings with library types as keys.\n
         ``info``: dictionary of sample/library info.\n
-        ``run_dir``: raw sequencing runs directory.
+        ``run_dir``: raw sequencing runs directory.\n
+        ``cache_dir``: run metadata cache directory or ``None``. Default: ``".cache"``.
 
     Returns:
         String containing bases mask flag to be inserted into shell command.
     """
-    libs = parse_info(info)["libs"]
-    n_reads = sum(
-        1
-        for _ in ET.parse(
-            os.path.join(run_dir, libs[wildcards.lib]["run"], "RunInfo.xml")
-        )
-        .getroot()
-        .iter("Read")
-    )
+    libs = _get_index(info).libs
     mask = (
-        bases_mask.get(libs[wildcards.lib]["lib_type"], None).split(",")
+        bases_mask.get(libs[wildcards.lib]["lib_type"], None)
         if bases_mask is not None
         else None
     )
-    if mask is not None:
-        if len(mask) == 4 and n_reads == 3:
-            mask.pop(2)
-    return f"--use-bases-mask={','.join(mask)}" if mask is not None else ""
+    if mask is None:
+        return ""
+    run_info = get_run_info(
+        os.path.join(run_dir, libs[wildcards.lib]["run"]), cache_dir=cache_dir
+    )
+    return f"--use-bases-mask={_bases_mask(run_info, mask)}"
+
+
+def _get_barcode_mismatches_flag(filename: str, custom_flags: str) -> str:
+    if "--barcode-mismatches" in custom_flags:
+        return ""
+    try:
+        with open(file=filename, mode="r", encoding="UTF-8") as file:
+            mismatches = int(file.read().strip())
+    except FileNotFoundError:
+        return ""
+    return f"--barcode-mismatches={mismatches}"
+
+
+def get_barcode_mismatches_flag(
+    wildcards, metadata_dir: str, custom_flags: str = ""
+) -> str:
+    """
+    Get barcode mismatches flag for bcl2fastq.
+
+    Arguments:
+        ``wildcards``: Snakemake ``wildcards`` object.\n
+        ``metadata_dir``: metadata directory.\n
+        ``custom_flags``: custom bcl2fastq flags (barcode mismatches flag is omitted if already specified).
+
+    Returns:
+        String containing barcode mismatches flag (from barcode mismatches file generated by
+        generate_bcl2fastq_csv.py) to be inserted into shell command.
+    """
+    return _get_barcode_mismatches_flag(
+        os.path.join(metadata_dir, "bcl2fastq", f"{wildcards.lib}.mismatches"),
+        custom_flags=custom_flags,
+    )
+
+
+def get_lanes(
+    wildcards,
+    info: dict,
+    metadata_dir: str,
+    run_dir: str,
+    cache_dir: str | None = CACHE_DIR,
+) -> list[int]:
+    """
+    Get lanes to demultiplex for a library (lanes specified in bcl2fastq sample sheet or all lanes
+    in run folder if any sample is not assigned to a lane).
+
+    Arguments:
+        ``wildcards``: Snakemake ``wildcards`` object.\n
+        ``info``: dictionary of sample/library info.\n
+        ``metadata_dir``: metadata directory.\n
+        ``run_dir``: raw sequencing runs directory.\n
+        ``cache_dir``: run metadata cache directory or ``None``. Default: ``".cache"``.
+
+    Returns:
+        Sorted list of lane numbers.
+    """
+    key = (wildcards.lib, metadata_dir)
+    if key not in _LANES:
+        with open(
+            file=os.path.join(metadata_dir, "bcl2fastq", f"{wildcards.lib}.csv"),
+            mode="r",
+            encoding="UTF-8",
+        ) as file:
+            lanes = {row["Lane"] for row in csv.DictReader(file.readlines()[1:])}
+        if "" in lanes or not lanes:
+            libs = _get_index(info).libs
+            run_info = get_run_info(
+                os.path.join(run_dir, libs[wildcards.lib]["run"]), cache_dir=cache_dir
+            )
+            _LANES[key] = list(run_info.lanes)
+        else:
+            _LANES[key] = sorted(int(x) for x in lanes)
+    return _LANES[key]
+
+
+def get_lane_stamps(
+    wildcards,
+    info: dict,
+    metadata_dir: str,
+    run_dir: str,
+    cache_dir: str | None = CACHE_DIR,
+) -> list[str]:
+    """
+    Get paths to per-lane bcl2fastq stamp files for a library.
+
+    Arguments:
+        ``wildcards``: Snakemake ``wildcards`` object.\n
+        ``info``: dictionary of sample/library info.\n
+        ``metadata_dir``: metadata directory.\n
+        ``run_dir``: raw sequencing runs directory.\n
+        ``cache_dir``: run metadata cache directory or ``None``. Default: ``".cache"``.
+
+    Returns:
+        List of paths to stamp files.
+    """
+    return [
+        os.path.abspath(f"stamps/bcl2fastq_lane/{wildcards.lib}/{lane}.stamp")
+        for lane in get_lanes(
+            wildcards,
+            info=info,
+            metadata_dir=metadata_dir,
+            run_dir=run_dir,
+            cache_dir=cache_dir,
+        )
+    ]
+
+
+def read_demux_plan(metadata_dir: str) -> dict:
+    """
+    Read merged demultiplexing plan generated by generate_bcl2fastq_csv.py.
+
+    Arguments:
+        ``metadata_dir``: metadata directory.
+
+    Returns:
+        Dictionary of demultiplexing groups (``groups``) with run folder name and list of library IDs,
+        and dictionary of demultiplexing groups with library IDs as keys (``libs``).
+    """
+    filename = os.path.join(metadata_dir, "bcl2fastq", "demux.json")
+    if not os.path.isfile(filename):
+        return {"groups": {}, "libs": {}}
+    with open(file=filename, mode="r", encoding="UTF-8") as file:
+        groups = json.load(file)
+    return {
+        "groups": groups,
+        "libs": {lib: group for group, entry in groups.items() for lib in entry["libs"]},
+    }
+
+
+def get_demux_group(wildcards, plan: dict) -> str:
+    """
+    Get merged demultiplexing group for a library.
+
+    Arguments:
+        ``wildcards``: Snakemake ``wildcards`` object.\n
+        ``plan``: dictionary as returned by ``read_demux_plan``.
+
+    Returns:
+        Demultiplexing group.
+    """
+    return plan["libs"][wildcards.lib]
+
+
+def get_demux_run_path(wildcards, plan: dict, run_dir: str) -> str:
+    """
+    Get path to run folder for a merged demultiplexing group.
+
+    Arguments:
+        ``wildcards``: Snakemake ``wildcards`` object.\n
+        ``plan``: dictionary as returned by ``read_demux_plan``.\n
+        ``run_dir``: raw sequencing runs directory.
+
+    Returns:
+        Path to run folder.
+    """
+    return os.path.join(run_dir, plan["groups"][wildcards.group]["run"])
+
+
+def get_demux_bases_mask_flag(wildcards, plan: dict) -> str:
+    """
+    Get bases mask flag for bcl2fastq for a merged demultiplexing group (unified bases mask of all
+    libraries in the group).
+
+    Arguments:
+        ``wildcards``: Snakemake ``wildcards`` object.\n
+        ``plan``: dictionary as returned by ``read_demux_plan``.
+
+    Returns:
+        String containing bases mask flag to be inserted into shell command.
+    """
+    mask = plan["groups"][wildcards.group]["mask"]
+    if mask is None:
+        return ""
+    return f"--use-bases-mask={mask}"
+
+
+def get_demux_barcode_mismatches_flag(
+    wildcards, metadata_dir: str, custom_flags: str = ""
+) -> str:
+    """
+    Get barcode mismatches flag for bcl2fastq for a merged demultiplexing group.
+
+    Arguments:
+        ``wildcards``: Snakemake ``wildcards`` object.\n
+        ``metadata_dir``: metadata directory.\n
+        ``custom_flags``: custom bcl2fastq flags (barcode mismatches flag is omitted if already specified).
+
+    Returns:
+        String containing barcode mismatches flag to be inserted into shell command.
+    """
+    return _get_barcode_mismatches_flag(
+        os.path.join(metadata_dir, "bcl2fastq", "demux", f"{wildcards.group}.mismatches"),
+        custom_flags=custom_flags,
+    )
+
+
+def read_starsolo_batches(metadata_dir: str) -> dict:
+    """
+    Read STARsolo batch plan generated by compile_metadata.py.
+
+    Arguments:
+        ``metadata_dir``: metadata directory.
+
+    Returns:
+        Dictionary of lists of sample IDs with batch IDs as keys (``batches``) and dictionary of
+        batch IDs with sample IDs as keys (``samples``).
+    """
+    filename = os.path.join(metadata_dir, "starsolo", "batches.json")
+    if not os.path.isfile(filename):
+        return {"batches": {}, "samples": {}}
+    with open(file=filename, mode="r", encoding="UTF-8") as file:
+        batches = json.load(file)
+    return {
+        "batches": batches,
+        "samples": {sample: batch for batch, samples in batches.items() for sample in samples},
+    }
+
+
+def get_starsolo_batch(wildcards, plan: dict) -> str:
+    """
+    Get STARsolo batch for a sample.
+
+    Arguments:
+        ``wildcards``: Snakemake ``wildcards`` object.\n
+        ``plan``: dictionary as returned by ``read_starsolo_batches``.
+
+    Returns:
+        Batch ID.
+    """
+    return plan["samples"][wildcards.sample]
+
+
+def get_batch_inputs(
+    wildcards, plan: dict, lib_types: set[str], info: dict, read_trim: bool
+) -> list[str]:
+    """
+    Get path to FASTQ stamp files for specific library type(s) for all samples in a batch.
+
+    Arguments:
+        ``wildcards``: Snakemake ``wildcards`` object.\n
+        ``plan``: dictionary as returned by ``read_starsolo_batches``.\n
+        ``lib_types``: set of library types (use * to match any library type).\n
+        ``info``: dictionary of sample/library info.\n
+        ``read_trim``: boolean indicating whether FASTQ read trimming is enabled.
+
+    Returns:
+        List of paths to FASTQ stamp files.
+    """
+    return list(
+        dict.fromkeys(
+            path
+            for sample in plan["batches"][wildcards.batch]
+            for path in get_count_inputs(
+                types.SimpleNamespace(sample=sample),
+                lib_types=lib_types,
+                info=info,
+                read_trim=read_trim,
+            )
+        )
+    )
 
 
 def get_read_trim_flags(
@@ -117,7 +449,7 @@ def get_read_trim_flags(
     Returns:
         Read trimming flags to be inserted into shell command.
     """
-    libs = parse_info(info)["libs"]
+    libs = _get_index(info).libs
     read_trim = (
         read_trim.get(libs[wildcards.lib]["lib_type"], {})
         if read_trim is not None
@@ -146,17 +478,21 @@ def get_count_inputs(
     Returns:
         List of paths to FASTQ stamp files.
     """
-    libs = parse_info(info)["libs"]
+    index = _get_index(info)
     inputs = [
-        f"stamps/{_get_fastq_rule(lib, libs, read_trim)}/{lib}.stamp"
-        for lib in info[wildcards.sample].keys()
-        if any(x in {libs[lib]["lib_type"], "*"} for x in lib_types)
+        f"stamps/{_get_fastq_rule(lib, index.libs, read_trim)}/{lib}.stamp"
+        for lib in index.select(wildcards.sample, lib_types)
     ]
     return [os.path.abspath(path) for path in inputs]
 
 
 def get_count_fastqs(
-    wildcards, lib_types: set[str], read: str, info: dict, output_dir: str
+    wildcards,
+    lib_types: set[str],
+    read: str,
+    info: dict,
+    output_dir: str,
+    read_trim: bool = False,
 ) -> str:
     """
     Get input FASTQ string for count-type tool (e.g. STARsolo, chromap, barcounter).
@@ -166,22 +502,18 @@ def get_count_fastqs(
         ``lib_types``: set of library types (use * to match any library type).\n
         ``read``: string specifying read number ('R1, 'R2' or 'R3').\n
         ``info``: dictionary of sample/library info.\n
-        ``output_dir``: pipeline output directory.
+        ``output_dir``: pipeline output directory.\n
+        ``read_trim``: boolean indicating whether FASTQ read trimming is enabled.
 
     Returns:
         Comma-separated string of paths to input FASTQs.
     """
-    libs = parse_info(info)["libs"]
+    index = _get_index(info)
     fastqs = [
         fastq
-        for lib in info[wildcards.sample].keys()
-        if any(x in {libs[lib]["lib_type"], "*"} for x in lib_types)
-        for fastq in glob.glob(
-            os.path.join(
-                output_dir,
-                f"fastqs/{lib}/**/{wildcards.sample}_*_{read}_001.fastq.gz",
-            ),
-            recursive=True,
+        for lib in index.select(wildcards.sample, lib_types)
+        for fastq in _get_fastq_manifest(lib, index.libs, output_dir, read_trim).get(
+            wildcards.sample, read
         )
     ]
     fastqs.sort()
@@ -203,11 +535,9 @@ def get_count_fastqdirs(
     Returns:
         Comma-separated string of paths to input FASTQ directory.
     """
-    libs = parse_info(info)["libs"]
     dirs = [
         os.path.join(output_dir, f"fastqs/{lib}")
-        for lib in info[wildcards.sample].keys()
-        if any(x in {libs[lib]["lib_type"], "*"} for x in lib_types)
+        for lib in _get_index(info).select(wildcards.sample, lib_types)
     ]
     return ",".join(dirs)
 
@@ -224,35 +554,216 @@ def get_fastqc_inputs(wildcards, info: dict, read_trim: bool) -> str:
     Returns:
         Path to FASTQ stamp file.
     """
-    libs = parse_info(info)["libs"]
+    libs = _get_index(info).libs
     return os.path.abspath(
         f"stamps/{_get_fastq_rule(wildcards.lib, libs, read_trim)}/{wildcards.lib}.stamp"
     )
 
 
-def get_fastqc_fastqs(wildcards, info: dict, output_dir: str) -> str:
+def get_fastqc_chunk_stamps(wildcards, checkpoint) -> list[str]:
+    """
+    Get path to FastQC chunk stamp files for a specific library (requires FastQC scatter plan).
+
+    Arguments:
+        ``wildcards``: Snakemake ``wildcards`` object.\n
+        ``checkpoint``: Snakemake checkpoint object for FastQC scatter plan.
+
+    Returns:
+        List of paths to FastQC chunk stamp files.
+    """
+    with open(
+        file=checkpoint.get(lib=wildcards.lib).output[0], mode="r", encoding="UTF-8"
+    ) as file:
+        chunks = json.load(file)
+    return [os.path.abspath(f"stamps/fastqc_chunk/{wildcards.lib}/{chunk}.stamp") for chunk in chunks]
+
+
+def get_fastqc_chunk_fastqs(wildcards) -> str:
+    """
+    Get input FASTQ string for a FastQC chunk.
+
+    Arguments:
+        ``wildcards``: Snakemake ``wildcards`` object.
+
+    Returns:
+        Whitespace-separated string of paths to input FASTQs.
+    """
+    with open(
+        file=os.path.abspath(f"stamps/fastqc_plan/{wildcards.lib}.json"), mode="r", encoding="UTF-8"
+    ) as file:
+        return " ".join(json.load(file)[wildcards.chunk])
+
+
+def get_count_reads_inputs(info: dict, read_trim: bool) -> list[str]:
+    """
+    Get path to FASTQ stamp files for all libraries.
+
+    Arguments:
+        ``info``: dictionary of sample/library info.\n
+        ``read_trim``: boolean indicating whether FASTQ read trimming is enabled.
+
+    Returns:
+        List of paths to FASTQ stamp files.
+    """
+    libs = _get_index(info).libs
+    return [
+        os.path.abspath(f"stamps/{_get_fastq_rule(lib, libs, read_trim)}/{lib}.stamp")
+        for lib in libs
+    ]
+
+
+def get_fastqc_fastqs(wildcards, info: dict, output_dir: str, read_trim: bool = False) -> str:
     """
     Get input FASTQ string for fastqc.
 
     Arguments:
         ``wildcards``: Snakemake ``wildcards`` object.\n
         ``info``: dictionary of sample/library info.\n
-        ``output_dir``: pipeline output directory.
+        ``output_dir``: pipeline output directory.\n
+        ``read_trim``: boolean indicating whether FASTQ read trimming is enabled.
 
     Returns:
         Whitespace-separated string of paths to input FASTQs.
     """
+    index = _get_index(info)
+    manifest = _get_fastq_manifest(wildcards.lib, index.libs, output_dir, read_trim)
     fastqs = [
         fastq
-        for sample in info.keys()
-        if wildcards.lib in info[sample].keys()
-        for fastq in glob.glob(
-            os.path.join(
-                output_dir,
-                f"fastqs/{wildcards.lib}/**/{sample}_*.fastq.gz",
-            ),
-            recursive=True,
-        )
+        for sample in index.lib_samples[wildcards.lib]
+        for fastq in manifest.get(sample)
     ]
     fastqs.sort()
     return " ".join(fastqs)
+
+
+def _get_fastq_bytes(
+    sample: str, lib_types: set[str], index: _LibraryIndex, output_dir: str, read_trim: bool
+) -> int:
+    return sum(
+        _get_fastq_manifest(lib, index.libs, output_dir, read_trim).size(sample)
+        for lib in index.select(sample, lib_types)
+    )
+
+
+def _get_observations(rule: str, pipeline_dir: str, key: tuple, job_bytes) -> list[tuple[int, dict]]:
+    # Input sizes of benchmarked jobs are looked up once per rule/pipeline directory (not per
+    # resource evaluation of every job); job_bytes returns None for jobs not in current run
+    cache_key = (rule, pipeline_dir, key)
+    if cache_key not in _OBSERVATIONS:
+        observations = []
+        for job, records in read_benchmarks(rule, pipeline_dir=pipeline_dir).items():
+            size = job_bytes(job)
+            if size is not None:
+                observations.extend((size, record) for record in records)
+        _OBSERVATIONS[cache_key] = observations
+    return _OBSERVATIONS[cache_key]
+
+
+def get_job_resource(
+    wildcards,
+    attempt: int,
+    resource: str,
+    rule: str,
+    lib_types: set[str],
+    info: dict,
+    output_dir: str,
+    references: list[str] | None = None,
+    pipeline_dir: str | None = None,
+    read_trim: bool = False,
+) -> int:
+    """
+    Get estimated job resource requirement for count-type tool from input FASTQ and reference sizes
+    (refined using benchmark records from previous pipeline runs).
+
+    Arguments:
+        ``wildcards``: Snakemake ``wildcards`` object.\n
+        ``attempt``: Snakemake job attempt number.\n
+        ``resource``: resource name ('mem_mb', 'runtime' or 'disk_mb').\n
+        ``rule``: rule name.\n
+        ``lib_types``: set of library types (use * to match any library type).\n
+        ``info``: dictionary of sample/library info.\n
+        ``output_dir``: pipeline output directory.\n
+        ``references``: list of paths to reference files/directories or ``None``.\n
+        ``pipeline_dir``: pipeline state directory or ``None`` (for ``.pipeline`` in output directory).\n
+        ``read_trim``: boolean indicating whether FASTQ read trimming is enabled.
+
+    Returns:
+        Estimated resource requirement (MB for 'mem_mb' and 'disk_mb'; minutes for 'runtime').
+    """
+    index = _get_index(info)
+    pipeline_dir = pipeline_dir or os.path.join(output_dir, PIPELINE_DIR)
+    observations = _get_observations(
+        rule,
+        pipeline_dir=pipeline_dir,
+        key=(id(index), frozenset(lib_types), output_dir, read_trim),
+        job_bytes=lambda sample: _get_fastq_bytes(sample, lib_types, index, output_dir, read_trim)
+        if sample in index.sample_libs
+        else None,
+    )
+    return estimate(
+        rule=rule,
+        resource=resource,
+        fastq_bytes=_get_fastq_bytes(wildcards.sample, lib_types, index, output_dir, read_trim),
+        reference_bytes=reference_size(references or []),
+        observations=observations,
+        attempt=attempt,
+    )
+
+
+def get_batch_resource(
+    wildcards,
+    attempt: int,
+    resource: str,
+    rule: str,
+    plan: dict,
+    lib_types: set[str],
+    info: dict,
+    output_dir: str,
+    references: list[str] | None = None,
+    pipeline_dir: str | None = None,
+    read_trim: bool = False,
+) -> int:
+    """
+    Get estimated job resource requirement for a batch of samples processed sequentially
+    (memory is estimated from the largest sample; runtime and disk from all samples).
+
+    Arguments:
+        ``wildcards``: Snakemake ``wildcards`` object.\n
+        ``attempt``: Snakemake job attempt number.\n
+        ``resource``: resource name ('mem_mb', 'runtime' or 'disk_mb').\n
+        ``rule``: rule name.\n
+        ``plan``: dictionary as returned by ``read_starsolo_batches``.\n
+        ``lib_types``: set of library types (use * to match any library type).\n
+        ``info``: dictionary of sample/library info.\n
+        ``output_dir``: pipeline output directory.\n
+        ``references``: list of paths to reference files/directories or ``None``.\n
+        ``pipeline_dir``: pipeline state directory or ``None`` (for ``.pipeline`` in output directory).\n
+        ``read_trim``: boolean indicating whether FASTQ read trimming is enabled.
+
+    Returns:
+        Estimated resource requirement (MB for 'mem_mb' and 'disk_mb'; minutes for 'runtime').
+    """
+    index = _get_index(info)
+    pipeline_dir = pipeline_dir or os.path.join(output_dir, PIPELINE_DIR)
+    aggregate = max if resource == "mem_mb" else sum
+
+    def batch_bytes(batch: str) -> int:
+        return aggregate(
+            _get_fastq_bytes(sample, lib_types, index, output_dir, read_trim)
+            for sample in plan["batches"][batch]
+        )
+
+    observations = _get_observations(
+        rule,
+        pipeline_dir=pipeline_dir,
+        key=(id(index), id(plan), frozenset(lib_types), output_dir, read_trim, aggregate.__name__),
+        job_bytes=lambda batch: batch_bytes(batch) if batch in plan["batches"] else None,
+    )
+    return estimate(
+        rule=rule,
+        resource=resource,
+        fastq_bytes=batch_bytes(wildcards.batch),
+        reference_bytes=reference_size(references or []),
+        observations=observations,
+        attempt=attempt,
+    )
@@ -0,0 +1,157 @@
+"""
+Functions for parsing and caching Illumina run metadata (RunInfo.xml) for use with preprocessing pipeline scripts.
+"""
+
+import os
+import json
+import xml.etree.ElementTree as ET
+
+
+CACHE_DIR = ".cache"
+
+_RUNS = {}
+
+
+class RunInfo:
+    """
+    Object class containing read structure and flow cell information about an Illumina sequencing run.
+    """
+
+    def __init__(
+        self, flowcell: str, reads: list[tuple[int, int, bool]], lanes: int
+    ) -> None:
+        self.flowcell = flowcell
+        self.reads = tuple((int(n), int(cycles), bool(index)) for n, cycles, index in reads)
+        self.lanes = tuple(range(1, int(lanes) + 1))
+
+    def __repr__(self) -> str:
+        return f"RunInfo\nFlow cell: {self.flowcell}\nReads: {self.n_reads}\nLanes: {len(self.lanes)}"
+
+    @property
+    def n_reads(self) -> int:
+        """
+        Number of reads (including index reads).
+        """
+        return len(self.reads)
+
+    @property
+    def read_lengths(self) -> tuple[int]:
+        """
+        Number of cycles for each read.
+        """
+        return tuple(cycles for _, cycles, _ in self.reads)
+
+    @property
+    def index_reads(self) -> tuple[bool]:
+        """
+        Index read flag for each read.
+        """
+        return tuple(index for _, _, index in self.reads)
+
+    def to_dict(self) -> dict:
+        """
+        Convert to dictionary (for serialisation).
+        """
+        return {
+            "flowcell": self.flowcell,
+            "reads": [list(x) for x in self.reads],
+            "lanes": len(self.lanes),
+        }
+
+
+def parse_run_info(path: str) -> RunInfo:
+    """
+    Parse RunInfo.xml file.
+
+    Arguments:
+        ``path``: Path to RunInfo.xml file.
+
+    Returns:
+        RunInfo object.
+    """
+    root = ET.parse(path).getroot()
+    flowcell = root.find(".//Flowcell")
+    layout = root.find(".//FlowcellLayout")
+    reads = sorted(
+        (
+            int(read.get("Number")),
+            int(read.get("NumCycles")),
+            read.get("IsIndexedRead", "N").upper() == "Y",
+        )
+        for read in root.iter("Read")
+    )
+    return RunInfo(
+        flowcell=flowcell.text.strip() if flowcell is not None else "",
+        reads=reads,
+        lanes=int(layout.get("LaneCount", 1)) if layout is not None else 1,
+    )
+
+
+def _cache_file(cache_dir: str) -> str:
+    return os.path.join(cache_dir, "runinfo.json")
+
+
+def _read_cache(cache_dir: str) -> dict:
+    try:
+        with open(file=_cache_file(cache_dir), mode="r", encoding="UTF-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_cache(cache: dict, cache_dir: str) -> None:
+    os.makedirs(cache_dir, exist_ok=True)
+    tempfile = f"{_cache_file(cache_dir)}.{os.getpid()}.tmp"
+    with open(file=tempfile, mode="w", encoding="UTF-8") as file:
+        json.dump(cache, fp=file)
+    os.replace(tempfile, _cache_file(cache_dir))
+
+
+def get_run_info(run_path: str, cache_dir: str | None = CACHE_DIR) -> RunInfo:
+    """
+    Get run metadata for an Illumina run folder, parsing RunInfo.xml at most once per
+    file version (keyed by path and modification time).
+
+    Arguments:
+        ``run_path``: Path to Illumina run folder.\n
+        ``cache_dir``: Directory for persistent cache across pipeline invocations or ``None``
+        (in-memory cache only). Default: ``".cache"``.
+
+    Returns:
+        RunInfo object (shared between all callers for the same run folder).
+    """
+    path = os.path.abspath(os.path.join(run_path, "RunInfo.xml"))
+    mtime = os.stat(path).st_mtime_ns
+    key = (path, mtime)
+    if key not in _RUNS:
+        cache = _read_cache(cache_dir) if cache_dir is not None else {}
+        entry = cache.get(path, None)
+        if entry is not None and entry["mtime"] == mtime:
+            _RUNS[key] = RunInfo(**entry["run_info"])
+        else:
+            _RUNS[key] = parse_run_info(path)
+            if cache_dir is not None:
+                cache[path] = {"mtime": mtime, "run_info": _RUNS[key].to_dict()}
+                _write_cache(cache, cache_dir)
+    return _RUNS[key]
+
+
+def bases_mask(run_info: RunInfo, mask: str | None) -> str | None:
+    """
+    Derive bases mask for bcl2fastq from run read structure and library type bases mask.
+
+    Arguments:
+        ``run_info``: RunInfo object.\n
+        ``mask``: Comma-separated bases mask string for library type or ``None``.
+
+    Returns:
+        Bases mask string adjusted to number of reads in run or ``None``
+        (if ``mask`` is ``None``).
+    """
+    if mask is None:
+        return None
+    mask = mask.split(",")
+    # Drop i5 index mask for single-indexed runs
+    if len(mask) == 4 and run_info.n_reads == 3:
+        mask.pop(2)
+    return ",".join(mask)
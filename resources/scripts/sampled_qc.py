@@ -0,0 +1,338 @@
+#!/bin/env python
+
+
+"""
+Performs sampled QC of FASTQ files as a fast alternative to FastQC.
+A bounded number of reads is taken from each FASTQ file (either the first N reads or a uniform
+reservoir sample of all reads) and per-position mean base quality and base composition are
+calculated over batches of reads; run time is therefore nearly independent of sequencing depth
+(for the default first N reads method).
+Output is written as MultiQC custom content (one set of files per FASTQ file):
+    <fastq>_sampled_qc_stats_mqc.tsv: summary statistics (general statistics table)
+    <fastq>_per_base_quality_mqc.json: mean base quality per position (line graph)
+    <fastq>_per_base_gc_mqc.json: GC content per position (line graph)
+    <fastq>_per_base_n_mqc.json: N content per position (line graph)
+    <fastq>_per_base_content.tsv: base composition per position (A/C/G/T/N counts and mean quality)
+Requires:
+- FASTQ files (gzip-compressed or plain text)
+"""
+
+
+# ==============================
+# MODULES
+# ==============================
+import os
+import gzip
+import json
+import random
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import docopt
+from loguru import logger
+import numpy as np
+import pandas as pd
+
+
+# ==============================
+# COMMAND LINE OPTIONS
+# ==============================
+# Define options
+DOC = """
+Perform sampled QC of FASTQ files
+
+Usage:
+  sampled_qc.py --outdir=<outdir> [--reads=<reads> --method=<method> --batch-size=<size> --seed=<seed> --threads=<threads>] [options] <fastqs>...
+
+Arguments:
+  <fastqs>                  FASTQ files (required)
+  -o --outdir=<outdir>      Output directory (required)
+  -n --reads=<reads>        Maximum number of reads sampled from each FASTQ file [default: 200000]
+  -m --method=<method>      Sampling method ('head' for first reads or 'reservoir' for uniform sample of all reads) [default: head]
+  -b --batch-size=<size>    Number of reads processed per batch [default: 10000]
+  --seed=<seed>             Random seed for reservoir sampling [default: 0]
+  -t --threads=<threads>    Number of parallel processes [default: 1]
+
+Options:
+  -h --help                 Show this screen
+"""
+
+
+# ==============================
+# GLOBAL VARIABLES
+# ==============================
+BASES = b"ACGTN"
+PHRED_OFFSET = 33
+LINEGRAPHS = {
+    "per_base_quality": ("Sampled QC: Mean Quality Scores", "Phred Score"),
+    "per_base_gc": ("Sampled QC: Per Base GC Content", "% GC"),
+    "per_base_n": ("Sampled QC: Per Base N Content", "% N"),
+}
+
+
+# ==============================
+# CLASSES
+# ==============================
+class PositionStats:
+    """
+    Object class containing per-position base counts and quality sums for a FASTQ file.
+    """
+
+    def __init__(self) -> None:
+        self.reads = 0
+        self.bases = np.zeros((len(BASES), 0), dtype=np.int64)
+        self.quality = np.zeros(0, dtype=np.int64)
+        self.depth = np.zeros(0, dtype=np.int64)
+        self.length = 0
+
+    def __repr__(self) -> str:
+        return f"PositionStats\nReads: {self.reads}\nMax length: {self.depth.size}"
+
+    def _resize(self, length: int) -> None:
+        if length > self.depth.size:
+            pad = length - self.depth.size
+            self.bases = np.pad(self.bases, ((0, 0), (0, pad)))
+            self.quality = np.pad(self.quality, (0, pad))
+            self.depth = np.pad(self.depth, (0, pad))
+
+    def update(self, seqs: list[bytes], quals: list[bytes]) -> None:
+        """
+        Add batch of reads.
+
+        Arguments:
+            ``seqs``: List of read sequences.\n
+            ``quals``: List of read quality strings.
+        """
+        if not seqs:
+            return
+        seq, qual, valid = to_matrix(seqs), to_matrix(quals), None
+        lengths = np.fromiter((len(x) for x in seqs), dtype=np.int64, count=len(seqs))
+        if lengths.min() != lengths.max():
+            valid = np.arange(seq.shape[1]) < lengths[:, None]
+        self._resize(seq.shape[1])
+        width = seq.shape[1]
+        for i, base in enumerate(BASES):
+            self.bases[i, :width] += (seq == base).sum(axis=0)
+        scores = qual.astype(np.int64) - PHRED_OFFSET
+        if valid is not None:
+            scores[~valid] = 0
+            self.depth[:width] += valid.sum(axis=0)
+        else:
+            self.depth[:width] += len(seqs)
+        self.quality[:width] += scores.sum(axis=0)
+        self.reads += len(seqs)
+        self.length += int(lengths.sum())
+
+    def table(self) -> pd.DataFrame:
+        """
+        Get per-position statistics.
+
+        Returns:
+            DataFrame with one row per position (1-based) and columns with base counts, mean
+            quality, % GC and % N.
+        """
+        depth = np.maximum(self.depth, 1)
+        df = pd.DataFrame(self.bases.T, columns=list(BASES.decode()))
+        df.insert(0, "position", np.arange(1, self.depth.size + 1))
+        df["depth"] = self.depth
+        df["mean_quality"] = self.quality / depth
+        df["gc"] = 100 * (self.bases[1] + self.bases[2]) / depth
+        df["n"] = 100 * self.bases[4] / depth
+        return df.round(3)
+
+    def summary(self) -> dict:
+        """
+        Get summary statistics.
+
+        Returns:
+            Dictionary with number of sampled reads, mean read length, mean quality, % GC and % N.
+        """
+        total = max(int(self.depth.sum()), 1)
+        return {
+            "sampled_reads": self.reads,
+            "mean_length": round(self.length / max(self.reads, 1), 2),
+            "mean_quality": round(float(self.quality.sum()) / total, 2),
+            "percent_gc": round(100 * float(self.bases[1:3].sum()) / total, 2),
+            "percent_n": round(100 * float(self.bases[4].sum()) / total, 3),
+        }
+
+
+# ==============================
+# FUNCTIONS
+# ==============================
+@logger.catch(reraise=True)
+def _main(opt: dict) -> None:
+    assert opt["--method"] in ("head", "reservoir"), "Sampling method must be 'head' or 'reservoir'."
+    os.makedirs(opt["--outdir"], exist_ok=True)
+    fastqs = sorted(set(opt["<fastqs>"]))
+    logger.info("Sampling up to {} reads from {} FASTQ files", opt["--reads"], len(fastqs))
+    kwargs = {
+        "outdir": opt["--outdir"],
+        "reads": int(opt["--reads"]),
+        "method": opt["--method"],
+        "batch_size": int(opt["--batch-size"]),
+        "seed": int(opt["--seed"]),
+    }
+    with ProcessPoolExecutor(max_workers=max(min(int(opt["--threads"]), len(fastqs)), 1)) as executor:
+        futures = {fastq: executor.submit(run_qc, fastq=fastq, **kwargs) for fastq in fastqs}
+        for fastq, future in futures.items():
+            logger.info("{}: {}", get_name(fastq), future.result())
+    logger.success("Output directory: {}", os.path.abspath(opt["--outdir"]))
+
+
+def get_name(fastq: str) -> str:
+    """
+    Get sample name for FASTQ file as used by FastQC.
+
+    Arguments:
+        ``fastq``: Path to FASTQ file.
+
+    Returns:
+        FASTQ file name without extensions.
+    """
+    name = os.path.basename(fastq)
+    for ext in (".gz", ".fastq", ".fq"):
+        name = name.removesuffix(ext)
+    return name
+
+
+def read_fastq(fastq: str):
+    """
+    Iterate over reads in FASTQ file.
+
+    Arguments:
+        ``fastq``: Path to FASTQ file (gzip-compressed or plain text).
+
+    Returns:
+        Generator of tuples of read sequence and quality string.
+    """
+    with (gzip.open if fastq.endswith(".gz") else open)(fastq, mode="rb") as file:
+        for _, seq, _, qual in itertools.zip_longest(*[file] * 4):
+            if qual is None:
+                break
+            yield seq.rstrip(), qual.rstrip()
+
+
+def sample_reads(fastq: str, reads: int, method: str = "head", seed: int = 0):
+    """
+    Sample reads from FASTQ file.
+
+    Arguments:
+        ``fastq``: Path to FASTQ file.\n
+        ``reads``: Maximum number of reads sampled.\n
+        ``method``: Sampling method (``"head"`` or ``"reservoir"``). Default: ``"head"``.\n
+        ``seed``: Random seed for reservoir sampling. Default: ``0``.
+
+    Returns:
+        Iterable of tuples of read sequence and quality string.
+    """
+    if method == "head":
+        return itertools.islice(read_fastq(fastq), reads)
+    # Reservoir sampling (Algorithm L) to keep a uniform sample of all reads in bounded memory
+    rng = random.Random(seed)
+    records = read_fastq(fastq)
+    reservoir = list(itertools.islice(records, reads))
+    if len(reservoir) < reads:
+        return reservoir
+    w = np.exp(np.log(rng.random()) / reads)
+    while True:
+        skip = int(np.floor(np.log(rng.random()) / np.log(1 - w)))
+        record = next(itertools.islice(records, skip, None), None)
+        if record is None:
+            return reservoir
+        reservoir[rng.randrange(reads)] = record
+        w *= np.exp(np.log(rng.random()) / reads)
+
+
+def to_matrix(lines: list[bytes]) -> np.ndarray:
+    """
+    Convert list of byte strings to 2D array padded with zeros.
+
+    Arguments:
+        ``lines``: List of byte strings.
+
+    Returns:
+        2D uint8 array with one row per string.
+    """
+    width = max(len(x) for x in lines)
+    if all(len(x) == width for x in lines):
+        return np.frombuffer(b"".join(lines), dtype=np.uint8).reshape(len(lines), width)
+    return np.frombuffer(b"".join(x.ljust(width, b"\0") for x in lines), dtype=np.uint8).reshape(
+        len(lines), width
+    )
+
+
+def run_qc(
+    fastq: str,
+    outdir: str,
+    reads: int = 200000,
+    method: str = "head",
+    batch_size: int = 10000,
+    seed: int = 0,
+) -> dict:
+    """
+    Calculate and write sampled QC statistics for a FASTQ file.
+
+    Arguments:
+        ``fastq``: Path to FASTQ file.\n
+        ``outdir``: Output directory.\n
+        ``reads``: Maximum number of reads sampled. Default: ``200000``.\n
+        ``method``: Sampling method (``"head"`` or ``"reservoir"``). Default: ``"head"``.\n
+        ``batch_size``: Number of reads processed per batch. Default: ``10000``.\n
+        ``seed``: Random seed for reservoir sampling. Default: ``0``.
+
+    Returns:
+        Dictionary of summary statistics as returned by ``PositionStats.summary``.
+    """
+    stats = PositionStats()
+    records = iter(sample_reads(fastq, reads=reads, method=method, seed=seed))
+    while batch := list(itertools.islice(records, batch_size)):
+        seqs, quals = zip(*batch)
+        stats.update(list(seqs), list(quals))
+    write_outputs(get_name(fastq), stats=stats, outdir=outdir)
+    return stats.summary()
+
+
+def write_outputs(name: str, stats: PositionStats, outdir: str) -> None:
+    """
+    Write sampled QC statistics as MultiQC custom content.
+
+    Arguments:
+        ``name``: Sample name.\n
+        ``stats``: PositionStats object.\n
+        ``outdir``: Output directory.
+    """
+    table = stats.table()
+    table.to_csv(os.path.join(outdir, f"{name}_per_base_content.tsv"), sep="\t", index=False)
+    summary = stats.summary()
+    with open(
+        file=os.path.join(outdir, f"{name}_sampled_qc_stats_mqc.tsv"), mode="w", encoding="UTF-8"
+    ) as file:
+        file.write("# plot_type: 'generalstats'\n")
+        file.write("\t".join(["Sample", *summary.keys()]) + "\n")
+        file.write("\t".join([name, *map(str, summary.values())]) + "\n")
+    columns = {"per_base_quality": "mean_quality", "per_base_gc": "gc", "per_base_n": "n"}
+    for key, (title, ylab) in LINEGRAPHS.items():
+        content = {
+            "id": f"sampled_qc_{key}",
+            "section_name": title,
+            "description": "Calculated from sampled reads of each FASTQ file.",
+            "plot_type": "linegraph",
+            "pconfig": {
+                "id": f"sampled_qc_{key}_plot",
+                "title": title,
+                "xlab": "Position (bp)",
+                "ylab": ylab,
+            },
+            "data": {name: dict(zip(table["position"].tolist(), table[columns[key]].tolist()))},
+        }
+        with open(
+            file=os.path.join(outdir, f"{name}_{key}_mqc.json"), mode="w", encoding="UTF-8"
+        ) as file:
+            json.dump(content, fp=file)
+
+
+# ==============================
+# SCRIPT
+# ==============================
+if __name__ == "__main__":
+    _main(opt=docopt.docopt(DOC))
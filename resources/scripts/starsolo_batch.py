@@ -0,0 +1,276 @@
+#!/bin/env python
+
+
+"""
+Runs STARsolo for a batch of samples against one copy of the STAR genome in shared memory.
+The genome is loaded once (--genomeLoad LoadAndExit), each sample is mapped using the shared copy
+(--genomeLoad LoadAndKeep) and the genome is removed from shared memory when the batch finishes
+or fails (including termination by the job scheduler). Completed samples are recorded with
+per-sample markers so that a re-run batch only maps samples whose inputs or settings have changed.
+Requires:
+- Batch plan file generated by compile_metadata.py
+- Info YAML file generated by generate_info_yaml.py
+- FASTQ directory with one subfolder for each library
+- Plain-text cell barcode whitelist cached by whitelist_cache.py
+- STAR, samtools and pigz available in PATH
+"""
+
+
+# ==============================
+# MODULES
+# ==============================
+import os
+import sys
+import json
+import signal
+import shutil
+import subprocess
+import yaml
+import docopt
+from loguru import logger
+from fastq_manifest import scan_fastqs
+from postprocess import postprocess
+
+
+# ==============================
+# COMMAND LINE OPTIONS
+# ==============================
+# Define options
+DOC = """
+Run STARsolo for a batch of samples using a shared genome
+
+Usage:
+  starsolo_batch.py --plan=<plan> --batch=<batch> --info=<info> --fastqdir=<fastqdir> --reference=<reference> --whitelist=<whitelist> --outdir=<outdir> --stamp=<stamp> [--flags=<flags> --bam-sort-ram=<bytes> --threads=<threads>] [options]
+
+Arguments:
+  -p --plan=<plan>              Batch plan file (required)
+  -b --batch=<batch>            Batch ID (required)
+  -i --info=<info>              Info YAML file (required)
+  -f --fastqdir=<fastqdir>      FASTQ directory (required)
+  -r --reference=<reference>    STAR genome directory (required)
+  -w --whitelist=<whitelist>    Plain-text cell barcode whitelist (required)
+  -o --outdir=<outdir>          STARsolo output directory (required)
+  -s --stamp=<stamp>            Stamp file to create on completion (required)
+  --flags=<flags>               Additional STAR flags [default: ]
+  --bam-sort-ram=<bytes>        Maximum RAM for sorting BAM files (ignored if --limitBAMsortRAM is in flags) [default: 10000000000]
+  -t --threads=<threads>        Number of threads [default: 1]
+
+Options:
+  -h --help                     Show this screen
+"""
+
+
+# ==============================
+# GLOBAL VARIABLES
+# ==============================
+LIB_TYPES = {"GEX"}
+MARKER = ".starsolo_batch.json"
+
+
+# ==============================
+# FUNCTIONS
+# ==============================
+@logger.catch(reraise=True)
+def _main(opt: dict) -> None:
+    with open(file=opt["--info"], mode="r", encoding="UTF-8") as file:
+        info = yaml.load(stream=file, Loader=yaml.SafeLoader)
+    samples = read_plan(opt["--plan"])[opt["--batch"]]
+    threads = int(opt["--threads"])
+    flags = opt["--flags"] or ""
+    if "--limitBAMsortRAM" not in flags:
+        flags = f"{flags} --limitBAMsortRAM {opt['--bam-sort-ram']}".strip()
+
+    # Treat termination by job scheduler as failure so that shared memory is always released
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+    tmpdir = os.path.join(opt["--outdir"], f".{opt['--batch']}")
+    os.makedirs(tmpdir, exist_ok=True)
+    logger.info("Loading genome {} into shared memory", opt["--reference"])
+    genome(opt["--reference"], mode="LoadAndExit", tmpdir=tmpdir)
+    try:
+        for sample in samples:
+            r1, r2 = get_sample_fastqs(info, sample=sample, fastqdir=opt["--fastqdir"])
+            run_sample(
+                sample=sample,
+                r1=r1,
+                r2=r2,
+                reference=opt["--reference"],
+                whitelist=opt["--whitelist"],
+                outdir=opt["--outdir"],
+                flags=flags,
+                threads=threads,
+            )
+    finally:
+        logger.info("Removing genome {} from shared memory", opt["--reference"])
+        genome(opt["--reference"], mode="Remove", tmpdir=tmpdir)
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    with open(file=opt["--stamp"], mode="a", encoding="UTF-8"):
+        os.utime(opt["--stamp"])
+    logger.success("Output directory: {}", os.path.abspath(opt["--outdir"]))
+
+
+def plan_batches(
+    samples: list[str], size: int, previous: dict[str, list[str]] | None = None
+) -> dict[str, list[str]]:
+    """
+    Group samples into batches, keeping samples in their previous batches where possible so that
+    batches only change when samples are added or removed.
+
+    Arguments:
+        ``samples``: List of sample IDs.\n
+        ``size``: Maximum number of samples per batch.\n
+        ``previous``: Dictionary of lists of sample IDs with batch IDs as keys from previous plan or ``None``.
+
+    Returns:
+        Dictionary of lists of sample IDs with batch IDs (``batch-<n>``) as keys.
+    """
+    assert size > 0, "Batch size must be a positive integer."
+    remaining = set(samples)
+    plan = {}
+    for batch, members in (previous or {}).items():
+        members = [x for x in members if x in remaining]
+        if members:
+            plan[batch] = members
+            remaining.difference_update(members)
+    n = max([int(x.rsplit("-", 1)[-1]) for x in plan] + [0])
+    pending = [x for x in samples if x in remaining]
+    for i in range(0, len(pending), size):
+        n += 1
+        plan[f"batch-{n}"] = pending[i : i + size]
+    return plan
+
+
+def read_plan(filename: str) -> dict[str, list[str]]:
+    """
+    Read batch plan file.
+
+    Arguments:
+        ``filename``: Batch plan JSON file.
+
+    Returns:
+        Dictionary as returned by ``plan_batches``.
+    """
+    with open(file=filename, mode="r", encoding="UTF-8") as file:
+        return json.load(file)
+
+
+def get_sample_fastqs(info: dict, sample: str, fastqdir: str) -> tuple[list[str], list[str]]:
+    """
+    Get R1 and R2 FASTQ files for a sample.
+
+    Arguments:
+        ``info``: Dictionary of sample/library info.\n
+        ``sample``: Sample ID.\n
+        ``fastqdir``: FASTQ directory.
+
+    Returns:
+        Tuple of sorted lists of paths to R1 and R2 FASTQ files.
+    """
+    fastqs = [
+        fastq
+        for lib, record in info[sample].items()
+        if record["lib_type"] in LIB_TYPES
+        for fastq in scan_fastqs(os.path.join(fastqdir, lib))
+        if fastq["sample"] == sample
+    ]
+    return tuple(
+        sorted(x["path"] for x in fastqs if x["read"] == read) for read in ("R1", "R2")
+    )
+
+
+def genome(reference: str, mode: str, tmpdir: str) -> None:
+    """
+    Load or remove STAR genome in shared memory.
+
+    Arguments:
+        ``reference``: STAR genome directory.\n
+        ``mode``: STAR --genomeLoad mode ('LoadAndExit' or 'Remove').\n
+        ``tmpdir``: Directory for STAR log files.
+    """
+    subprocess.run(
+        [
+            "STAR",
+            "--genomeLoad",
+            mode,
+            "--genomeDir",
+            reference,
+            "--outFileNamePrefix",
+            os.path.join(tmpdir, f"{mode}."),
+        ],
+        check=mode != "Remove",
+    )
+
+
+def _signature(r1: list[str], r2: list[str], reference: str, whitelist: str, flags: str) -> dict:
+    return {
+        "fastqs": [[x, os.stat(x).st_size, os.stat(x).st_mtime_ns] for x in [*r1, *r2]],
+        "reference": os.path.abspath(reference),
+        "whitelist": os.path.abspath(whitelist),
+        "flags": flags,
+    }
+
+
+def run_sample(
+    sample: str,
+    r1: list[str],
+    r2: list[str],
+    reference: str,
+    whitelist: str,
+    outdir: str,
+    flags: str,
+    threads: int = 1,
+) -> None:
+    """
+    Map a sample using STARsolo with the genome in shared memory, index BAM files and compress
+    count matrix files (skipped if the sample was completed with identical inputs and settings).
+
+    Arguments:
+        ``sample``: Sample ID.\n
+        ``r1``: List of paths to R1 FASTQ files.\n
+        ``r2``: List of paths to R2 FASTQ files.\n
+        ``reference``: STAR genome directory.\n
+        ``whitelist``: Plain-text cell barcode whitelist.\n
+        ``outdir``: STARsolo output directory.\n
+        ``flags``: Additional STAR flags.\n
+        ``threads``: Number of threads.
+    """
+    assert r1 and r2, f"No R1/R2 FASTQ files found for sample {sample}."
+    sampledir = os.path.join(outdir, sample)
+    marker = os.path.join(sampledir, MARKER)
+    signature = _signature(r1, r2, reference, whitelist, flags)
+    if os.path.isfile(marker):
+        with open(file=marker, mode="r", encoding="UTF-8") as file:
+            if json.load(file) == signature:
+                logger.info("Skipping completed sample: {}", sample)
+                return
+        os.remove(marker)
+
+    logger.info("Mapping sample: {}", sample)
+    os.makedirs(sampledir, exist_ok=True)
+    subprocess.run(
+        " ".join(
+            [
+                "STAR",
+                f"--readFilesIn {','.join(r2)} {','.join(r1)}",
+                f"--genomeDir {reference}",
+                "--genomeLoad LoadAndKeep",
+                f"--soloCBwhitelist {whitelist}",
+                f"--outFileNamePrefix {sampledir}/",
+                flags,
+                f"--runThreadN {threads}",
+            ]
+        ),
+        shell=True,
+        executable="/bin/bash",
+        check=True,
+    )
+    postprocess(sampledir, matrix_dirs=["Solo.out"], threads=threads)
+    with open(file=marker, mode="w", encoding="UTF-8") as file:
+        json.dump(signature, fp=file)
+
+
+# ==============================
+# SCRIPT
+# ==============================
+if __name__ == "__main__":
+    _main(opt=docopt.docopt(DOC))
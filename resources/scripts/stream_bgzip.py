@@ -0,0 +1,137 @@
+#!/bin/env python
+
+
+"""
+Runs a command that writes a large text output file (e.g. chromap fragments) through a named pipe
+into bgzip so that output is compressed as it is produced (no uncompressed intermediate file).
+The compressed output is written atomically, indexed with tabix and its MD5 checksum (calculated
+from the compressed stream as it is written) is saved alongside in md5sum format.
+Requires:
+- bgzip and tabix (htslib) available in PATH
+- Command with output file path replaced by {fifo}
+"""
+
+
+# ==============================
+# MODULES
+# ==============================
+import os
+import hashlib
+import tempfile
+import threading
+import subprocess
+import docopt
+from loguru import logger
+
+
+# ==============================
+# COMMAND LINE OPTIONS
+# ==============================
+# Define options
+DOC = """
+Stream command output through bgzip
+
+Usage:
+  stream_bgzip.py --output=<output> [--preset=<preset> --threads=<threads>] [options] [--] <command>...
+
+Arguments:
+  <command>                     Command to run (output file path replaced by {fifo}) (required)
+  -o --output=<output>          Compressed output file (required)
+  -p --preset=<preset>          tabix preset (gff, bed, sam, vcf) [default: bed]
+  -t --threads=<threads>        Number of bgzip threads [default: 1]
+
+Options:
+  -h --help                     Show this screen
+  --no-index                    Do not index output file
+"""
+
+
+# ==============================
+# GLOBAL VARIABLES
+# ==============================
+PLACEHOLDER = "{fifo}"
+BLOCK_SIZE = 1 << 20
+
+
+# ==============================
+# FUNCTIONS
+# ==============================
+@logger.catch(reraise=True)
+def _main(opt: dict) -> None:
+    assert any(PLACEHOLDER in x for x in opt["<command>"]), f"Command must contain {PLACEHOLDER}."
+    digest = stream_bgzip(
+        command=opt["<command>"], output=opt["--output"], threads=int(opt["--threads"])
+    )
+    with open(file=f"{opt['--output']}.md5", mode="w", encoding="UTF-8") as file:
+        file.write(f"{digest}  {os.path.basename(opt['--output'])}\n")
+    if not opt["--no-index"]:
+        logger.info("Indexing output file: {}", opt["--output"])
+        subprocess.run(["tabix", "-f", "-p", opt["--preset"], opt["--output"]], check=True)
+    logger.success("Output file: {}", os.path.abspath(opt["--output"]))
+
+
+def stream_bgzip(command: list[str], output: str, threads: int = 1) -> str:
+    """
+    Run command with output file replaced by a named pipe read by bgzip.
+
+    Arguments:
+        ``command``: Command and arguments (output file path replaced by ``{fifo}``).\n
+        ``output``: Compressed output file path.\n
+        ``threads``: Number of bgzip threads. Default: ``1``.
+
+    Returns:
+        MD5 hexadecimal digest of compressed output file.
+    """
+    outdir = os.path.dirname(os.path.abspath(output))
+    partial = os.path.join(outdir, f".{os.path.basename(output)}.{os.getpid()}.tmp")
+    digest = hashlib.md5()
+    os.makedirs(outdir, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=outdir, prefix=".fifo.") as tmpdir:
+        fifo = os.path.join(tmpdir, "output.fifo")
+        os.mkfifo(fifo)
+        command = [x.replace(PLACEHOLDER, fifo) for x in command]
+        # A writer end is held open until the command exits so that bgzip only receives EOF
+        # when the command has finished (including if it fails before opening its output)
+        reader = os.open(fifo, os.O_RDONLY | os.O_NONBLOCK)
+        os.set_blocking(reader, True)
+        writer = os.open(fifo, os.O_WRONLY)
+        bgzip = subprocess.Popen(
+            ["bgzip", "-c", "-@", str(threads)], stdin=reader, stdout=subprocess.PIPE
+        )
+        os.close(reader)
+        logger.info("Running command: {}", " ".join(command))
+        try:
+            proc = subprocess.Popen(command)
+        except OSError:
+            os.close(writer)
+            bgzip.kill()
+            raise
+        watcher = threading.Thread(target=lambda: (proc.wait(), os.close(writer)))
+        watcher.start()
+        try:
+            with open(file=partial, mode="wb") as file:
+                while block := bgzip.stdout.read(BLOCK_SIZE):
+                    digest.update(block)
+                    file.write(block)
+            watcher.join()
+            bgzip.wait()
+            if proc.returncode != 0 or bgzip.returncode != 0:
+                raise RuntimeError(
+                    f"Streaming failed (command exit code {proc.returncode}, bgzip exit code {bgzip.returncode})"
+                )
+            os.replace(partial, output)
+        finally:
+            for process in (proc, bgzip):
+                if process.poll() is None:
+                    process.kill()
+            watcher.join()
+            if os.path.isfile(partial):
+                os.remove(partial)
+    return digest.hexdigest()
+
+
+# ==============================
+# SCRIPT
+# ==============================
+if __name__ == "__main__":
+    _main(opt=docopt.docopt(DOC))
@@ -0,0 +1,201 @@
+#!/bin/env python
+
+
+"""
+Trims FASTQ files for a library using seqtk trimfq and compresses output using pigz.
+FASTQ files for all reads and lanes are processed concurrently using a bounded pool of pipelines;
+output files are written atomically and per-file completion markers allow interrupted jobs to resume.
+Requires:
+- Input FASTQ directory with FASTQ files named according to default Illumina convention
+  e.g. SampleID_Sx_Lxxx_Rx_001.fastq.gz
+- seqtk and pigz available in PATH
+"""
+
+
+# ==============================
+# MODULES
+# ==============================
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import docopt
+from loguru import logger
+from fastq_manifest import describe_fastq, manifest_path, write_manifest
+
+
+# ==============================
+# COMMAND LINE OPTIONS
+# ==============================
+# Define options
+DOC = """
+Trim FASTQ files for a library using seqtk trimfq
+
+Usage:
+  trim_fastq.py --indir=<indir> --outdir=<outdir> --stamp=<stamp> [--r1=<flags> --r2=<flags> --r3=<flags> --threads=<threads>] [options]
+
+Arguments:
+  -i --indir=<indir>        Input FASTQ directory (required)
+  -o --outdir=<outdir>      Output FASTQ directory (required)
+  -s --stamp=<stamp>        Stamp file to create on completion (required)
+  --r1=<flags>              seqtk trimfq flags for read 1 [default: -L 150]
+  --r2=<flags>              seqtk trimfq flags for read 2 [default: -L 150]
+  --r3=<flags>              seqtk trimfq flags for read 3 [default: -L 150]
+  -t --threads=<threads>    Number of threads [default: 1]
+
+Options:
+  -h --help                 Show this screen
+"""
+
+
+# ==============================
+# GLOBAL VARIABLES
+# ==============================
+READS = ("R1", "R2", "R3")
+MARKER_DIR = ".trimfastq"
+
+
+# ==============================
+# FUNCTIONS
+# ==============================
+@logger.catch(reraise=True)
+def _main(opt: dict) -> None:
+    flags = {read: opt[f"--{read.lower()}"] for read in READS}
+    fastqs = list_fastqs(opt["--indir"])
+    logger.info("Found {} FASTQ files in {}", len(fastqs), os.path.abspath(opt["--indir"]))
+    outputs = trim_fastqs(
+        fastqs=fastqs,
+        outdir=opt["--outdir"],
+        flags=flags,
+        threads=int(opt["--threads"]),
+    )
+
+    # Create stamp file and FASTQ manifest
+    with open(file=opt["--stamp"], mode="a", encoding="UTF-8"):
+        os.utime(opt["--stamp"])
+    write_manifest(
+        fastqs=[describe_fastq(path) for path in outputs],
+        stamp=opt["--stamp"],
+        filename=manifest_path(opt["--stamp"]),
+    )
+    logger.success("Output directory: {}", os.path.abspath(opt["--outdir"]))
+
+
+def list_fastqs(indir: str) -> list[str]:
+    """
+    List FASTQ files (read 1-3, first chunk) in input directory (recursively) in a single pass.
+
+    Arguments:
+        ``indir``: Input FASTQ directory.
+
+    Returns:
+        Sorted list of paths to FASTQ files.
+    """
+    fastqs = []
+    stack = [indir]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    stack.append(entry.path)
+                    continue
+                fastq = describe_fastq(entry.path, size=0)
+                if fastq is not None and fastq["read"] in READS and fastq["chunk"] == "001":
+                    fastqs.append(entry.path)
+    return sorted(fastqs)
+
+
+def _marker(outdir: str, name: str) -> str:
+    return os.path.join(outdir, MARKER_DIR, f"{name}.done")
+
+
+def _is_done(outdir: str, name: str, flags: str) -> bool:
+    try:
+        with open(file=_marker(outdir, name), mode="r", encoding="UTF-8") as file:
+            return file.read() == flags and os.path.isfile(os.path.join(outdir, name))
+    except FileNotFoundError:
+        return False
+
+
+def trim_fastq(path: str, outdir: str, flags: str, threads: int = 1) -> str:
+    """
+    Trim FASTQ file using seqtk trimfq and compress using pigz (skipping files already trimmed
+    with the same flags).
+
+    Arguments:
+        ``path``: Path to input FASTQ file.\n
+        ``outdir``: Output FASTQ directory.\n
+        ``flags``: seqtk trimfq flags.\n
+        ``threads``: Number of pigz compression threads.
+
+    Returns:
+        Path to output FASTQ file.
+    """
+    name = os.path.basename(path)
+    output = os.path.join(outdir, name)
+    if _is_done(outdir, name, flags):
+        logger.info("Skipping completed file: {}", path)
+        return output
+
+    logger.info("Processing file: {}", path)
+    tempfile = os.path.join(outdir, f".{name}.tmp")
+    with open(file=tempfile, mode="wb") as file:
+        seqtk = subprocess.Popen(
+            ["seqtk", "trimfq", *flags.split(), path], stdout=subprocess.PIPE
+        )
+        pigz = subprocess.Popen(
+            ["pigz", "-p", str(threads)], stdin=seqtk.stdout, stdout=file
+        )
+        seqtk.stdout.close()
+        pigz.wait()
+        seqtk.wait()
+    if seqtk.returncode != 0 or pigz.returncode != 0:
+        os.remove(tempfile)
+        raise RuntimeError(
+            f"Trimming failed for {path} (seqtk exit code {seqtk.returncode}, pigz exit code {pigz.returncode})"
+        )
+    os.replace(tempfile, output)
+    with open(file=_marker(outdir, name), mode="w", encoding="UTF-8") as file:
+        file.write(flags)
+    return output
+
+
+def trim_fastqs(
+    fastqs: list[str], outdir: str, flags: dict[str, str], threads: int = 1
+) -> list[str]:
+    """
+    Trim FASTQ files concurrently.
+
+    Arguments:
+        ``fastqs``: List of paths to input FASTQ files.\n
+        ``outdir``: Output FASTQ directory.\n
+        ``flags``: Dictionary of seqtk trimfq flags with read numbers ('R1', 'R2' or 'R3') as keys.\n
+        ``threads``: Total number of threads (each pipeline uses 1 seqtk process and at least 1
+        pigz thread).
+
+    Returns:
+        List of paths to output FASTQ files.
+    """
+    os.makedirs(os.path.join(outdir, MARKER_DIR), exist_ok=True)
+    if not fastqs:
+        return []
+    workers = max(1, min(len(fastqs), threads // 2))
+    pigz_threads = max(1, threads // workers - 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                trim_fastq,
+                path=path,
+                outdir=outdir,
+                flags=flags[describe_fastq(path, size=0)["read"]],
+                threads=pigz_threads,
+            )
+            for path in fastqs
+        ]
+        return [future.result() for future in futures]
+
+
+# ==============================
+# SCRIPT
+# ==============================
+if __name__ == "__main__":
+    _main(opt=docopt.docopt(DOC))
@@ -0,0 +1,156 @@
+#!/bin/env python
+
+
+"""
+Decompresses a cell barcode whitelist once into a content-hashed cache directory and links the
+cached plain-text copy to a stable path for use by mapping/counting rules.
+Cache entries are keyed by the SHA-256 hash of the whitelist file contents and marked as used
+each time they are requested; least recently used entries are removed when the total size of
+the cache exceeds the size budget.
+Requires:
+- Cell barcode whitelist (gzip-compressed or plain text) with one barcode per line
+"""
+
+
+# ==============================
+# MODULES
+# ==============================
+import os
+import gzip
+import shutil
+import docopt
+from loguru import logger
+from output import file_hash
+
+
+# ==============================
+# COMMAND LINE OPTIONS
+# ==============================
+# Define options
+DOC = """
+Cache decompressed cell barcode whitelist
+
+Usage:
+  whitelist_cache.py --whitelist=<whitelist> --cachedir=<cachedir> --output=<output> --stamp=<stamp> [--budget=<bytes>] [options]
+
+Arguments:
+  -w --whitelist=<whitelist>    Cell barcode whitelist file (required)
+  -c --cachedir=<cachedir>      Cache directory (required)
+  -o --output=<output>          Path to link cached plain-text whitelist (required)
+  -s --stamp=<stamp>            Stamp file to create on completion (required)
+  -b --budget=<bytes>           Maximum total size of cached whitelists [default: 1073741824]
+
+Options:
+  -h --help                     Show this screen
+"""
+
+
+# ==============================
+# GLOBAL VARIABLES
+# ==============================
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+# ==============================
+# FUNCTIONS
+# ==============================
+@logger.catch(reraise=True)
+def _main(opt: dict) -> None:
+    cache_dir = os.path.join(opt["--cachedir"], "whitelists")
+    path = cache_whitelist(whitelist=opt["--whitelist"], cache_dir=cache_dir)
+    link_file(src=path, dst=opt["--output"])
+    for removed in evict(cache_dir=cache_dir, budget=int(opt["--budget"]), keep={path}):
+        logger.info("Removed least recently used whitelist: {}", removed)
+
+    with open(file=opt["--stamp"], mode="a", encoding="UTF-8"):
+        os.utime(opt["--stamp"])
+    logger.success("Output file: {}", os.path.abspath(opt["--output"]))
+
+
+def cache_whitelist(whitelist: str, cache_dir: str) -> str:
+    """
+    Get cached plain-text copy of whitelist (decompressing and caching it if required).
+
+    Arguments:
+        ``whitelist``: Cell barcode whitelist file (gzip-compressed or plain text).\n
+        ``cache_dir``: Whitelist cache directory.
+
+    Returns:
+        Path to cached plain-text whitelist.
+    """
+    path = os.path.join(cache_dir, f"{file_hash(whitelist)}.txt")
+    if os.path.isfile(path):
+        logger.info("Using cached whitelist: {}", path)
+        os.utime(path)
+        return path
+    os.makedirs(cache_dir, exist_ok=True)
+    tempfile = f"{path}.{os.getpid()}.tmp"
+    with open(file=whitelist, mode="rb") as file:
+        compressed = file.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+    with (gzip.open if compressed else open)(whitelist, mode="rb") as src, open(
+        file=tempfile, mode="wb"
+    ) as dst:
+        shutil.copyfileobj(src, dst, length=1 << 20)
+    os.replace(tempfile, path)
+    logger.info("Saved cached whitelist: {}", path)
+    return path
+
+
+def link_file(src: str, dst: str) -> None:
+    """
+    Atomically hard link file to destination path (falling back to copying if source and
+    destination are on different file systems); linked copies are unaffected by cache eviction.
+
+    Arguments:
+        ``src``: Source file path.\n
+        ``dst``: Destination file path.
+    """
+    if os.path.dirname(dst):
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.isfile(dst) and os.path.samefile(src, dst):
+        return
+    tempfile = os.path.join(os.path.dirname(dst), f".{os.path.basename(dst)}.{os.getpid()}.tmp")
+    try:
+        os.link(src, tempfile)
+    except OSError:
+        shutil.copyfile(src, tempfile)
+    os.replace(tempfile, dst)
+
+
+def evict(cache_dir: str, budget: int, keep: set[str] | None = None) -> list[str]:
+    """
+    Remove least recently used cached whitelists until total size is within budget.
+
+    Arguments:
+        ``cache_dir``: Whitelist cache directory.\n
+        ``budget``: Maximum total size of cached whitelists (bytes).\n
+        ``keep``: Set of paths to cached whitelists that are never removed or ``None``.
+
+    Returns:
+        List of removed paths.
+    """
+    keep = {os.path.abspath(x) for x in keep or set()}
+    entries = []
+    with os.scandir(cache_dir) as files:
+        for entry in files:
+            if entry.is_file() and entry.name.endswith(".txt"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(x[1] for x in entries)
+    removed = []
+    for _, size, path in sorted(entries):
+        if total <= budget:
+            break
+        if os.path.abspath(path) in keep:
+            continue
+        os.remove(path)
+        total -= size
+        removed.append(path)
+    return removed
+
+
+# ==============================
+# SCRIPT
+# ==============================
+if __name__ == "__main__":
+    _main(opt=docopt.docopt(DOC))
@@ -12,13 +12,18 @@ Runs preprocessing pipeline.
 import os
 import glob
 import sys
+import json
 import shutil
 import hashlib
 from datetime import datetime
 import yaml
 import docopt
-import pandas as pd
 from loguru import logger
+from resources.scripts.fingerprint import (
+    compare_fingerprints,
+    global_fingerprint,
+    invalidate_stamps,
+)
 
 
 # ==============================
@@ -36,6 +41,7 @@ Options:
   -c --clean                Remove existing pipeline results in output directory
   -f --force                Overwrite existing pipeline results in output directory
   -u --update               Update module scripts using rule specifications in 'config/modules.yaml' (will not run pipeline)
+  -p --report-perf          Report job performance from benchmark records of previous pipeline runs saved in output directory (will not run pipeline)
 """
 
 
@@ -45,50 +51,47 @@ Options:
 @logger.catch(reraise=True)
 def _main(opt: dict) -> None:
     # Get and execute shell command
-    cmd = _get_cmd(update=opt["--update"])
+    cmd = _get_cmd(update=opt["--update"], report_perf=opt["--report-perf"])
+    if opt["--report-perf"]:
+        if os.system(" && ".join(cmd)):
+            logger.error("Performance report failed")
+            sys.exit(1)
+        return
     if not opt["--update"]:
+        # Compile metadata first (sample/library fingerprints are required to check previous results)
+        if os.system(cmd.pop(0)):
+            logger.error("Pipeline aborted")
+            sys.exit(1)
         # Check if output directory contains results of a previous pipeline run
-        if os.path.exists(os.path.join(OUTPUT_DIR, ".pipeline", "md5sum")):
+        fingerprints = {
+            "global": global_fingerprint(config, ["VERSION", *GLOBAL_METADATA]),
+            **_read_json(os.path.join(METADATA_DIR, "fingerprints.json")),
+        }
+        previous = _read_json(os.path.join(OUTPUT_DIR, ".pipeline", "fingerprints.json"))
+        if previous:
+            if previous.get("global", None) != fingerprints["global"]:
+                _check_overwrite(opt)
+            else:
+                _invalidate(compare_fingerprints(previous, fingerprints))
+        elif os.path.exists(os.path.join(OUTPUT_DIR, ".pipeline", "md5sum")):
             if _file_to_str(
                 os.path.join(OUTPUT_DIR, ".pipeline", "md5sum")
             ) != _get_hash(config, "VERSION", *METADATA):
-                if opt["--clean"]:
-                    logger.critical(
-                        "Removing existing pipeline results in {}", OUTPUT_DIR
-                    )
-                    match str(
-                        input("Are you sure you want to continue? (y/N) ")
-                    ).lower():
-                        case "y" | "yes":
-                            shutil.rmtree(OUTPUT_DIR)
-                        case _:
-                            logger.error("Pipeline aborted")
-                            sys.exit(1)
-                elif opt["--force"]:
-                    logger.critical(
-                        "Overwriting existing pipeline results in {}", OUTPUT_DIR
-                    )
-                    match str(
-                        input("Are you sure you want to continue? (y/N) ")
-                    ).lower():
-                        case "y" | "yes":
-                            pass
-                        case _:
-                            logger.error("Pipeline aborted")
-                            sys.exit(1)
-                else:
-                    logger.warning(
-                        "Specified output directory contains results of a previous pipeline run from {} with different version, configuration and/or metadata ({}).\nUse --force to overwrite existing results (if required).\nUse --clean to remove existing results.",
-                        _file_to_str(
-                            os.path.join(OUTPUT_DIR, ".pipeline", "timestamp")
-                        ),
-                        os.path.join(OUTPUT_DIR, ".pipeline"),
-                    )
-                    sys.exit(0)
+                _check_overwrite(opt)
+        # Save fingerprints now that stamps of changed samples/libraries have been invalidated
+        os.makedirs(os.path.join(OUTPUT_DIR, ".pipeline"), exist_ok=True)
+        with open(
+            file=os.path.join(OUTPUT_DIR, ".pipeline", "fingerprints.json"),
+            mode="w",
+            encoding="UTF-8",
+        ) as f:
+            json.dump(fingerprints, fp=f, indent=2)
         logger.info("Starting pipeline using module {}", MODULE)
     if not os.system(" && ".join(cmd)) and not opt["--update"]:
         # Save run configuration and metadata to output directory for reproducibility
         os.makedirs(os.path.join(OUTPUT_DIR, ".pipeline"), exist_ok=True)
+        now = datetime.now()
+        timestamp = now.strftime("%Y%m%d-%H%M%S")
         with open(
             file=os.path.join(OUTPUT_DIR, ".pipeline", "md5sum"),
             mode="w",
@@ -100,7 +103,7 @@ def _main(opt: dict) -> None:
             mode="w",
             encoding="UTF-8",
         ) as f:
-            f.write(str(datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            f.write(str(now.strftime("%Y-%m-%d %H:%M:%S")))
         shutil.copy(src=CONFIG, dst=os.path.join(OUTPUT_DIR, ".pipeline"))
         shutil.copy(src="VERSION", dst=os.path.join(OUTPUT_DIR, ".pipeline"))
         for f in METADATA:
@@ -111,6 +114,14 @@ def _main(opt: dict) -> None:
                 dst=os.path.join(OUTPUT_DIR, ".pipeline", "logs"),
                 dirs_exist_ok=True,
             )
+        # Move job benchmark records to new snapshot (one per pipeline run)
+        if os.path.exists("benchmarks"):
+            shutil.copytree(
+                src="benchmarks",
+                dst=os.path.join(OUTPUT_DIR, ".pipeline", "benchmarks", timestamp),
+                dirs_exist_ok=True,
+            )
+            shutil.rmtree("benchmarks")
         # Clean up cluster logs
         if glob.glob("sps-*"):
             os.system("rm -r sps-*")
@@ -120,31 +131,84 @@ def _main(opt: dict) -> None:
         )
 
 
-def _cmd(*args):
-    cmd = [" ".join(args)]
-    return cmd
+def _check_overwrite(opt: dict) -> None:
+    # Results of a previous run with different version, global configuration and/or metadata
+    if opt["--clean"]:
+        logger.critical("Removing existing pipeline results in {}", OUTPUT_DIR)
+        match str(input("Are you sure you want to continue? (y/N) ")).lower():
+            case "y" | "yes":
+                shutil.rmtree(OUTPUT_DIR)
+            case _:
+                logger.error("Pipeline aborted")
+                sys.exit(1)
+    elif opt["--force"]:
+        logger.critical("Overwriting existing pipeline results in {}", OUTPUT_DIR)
+        match str(input("Are you sure you want to continue? (y/N) ")).lower():
+            case "y" | "yes":
+                pass
+            case _:
+                logger.error("Pipeline aborted")
+                sys.exit(1)
+    else:
+        logger.warning(
+            "Specified output directory contains results of a previous pipeline run from {} with different version, configuration and/or metadata ({}).\nUse --force to overwrite existing results (if required).\nUse --clean to remove existing results.",
+            _file_to_str(os.path.join(OUTPUT_DIR, ".pipeline", "timestamp")),
+            os.path.join(OUTPUT_DIR, ".pipeline"),
+        )
+        sys.exit(0)
 
 
-def _get_index_kit_flags(dual: list[str] | None, single: list[str] | None) -> str:
-    dual_flag = f"--dual={','.join(dual)}" if dual is not None else ""
-    single_flag = f"--single={','.join(single)}" if single is not None else ""
-    return f"{dual_flag} {single_flag}"
+def _invalidate(changes: dict) -> None:
+    # Invalidate stamps of changed samples/libraries only (new samples/libraries have no stamps)
+    for level, name in (("samples", "Samples"), ("libs", "Libraries")):
+        logger.info(
+            "{}: {} new, {} changed, {} removed, {} unchanged",
+            name,
+            *[len(changes[level][x]) for x in ("new", "changed", "removed", "unchanged")],
+        )
+    if changes["samples"]["removed"]:
+        logger.warning(
+            "Results of removed samples are left in output directory: {}",
+            ", ".join(changes["samples"]["removed"]),
+        )
+    names = {*changes["samples"]["changed"], *changes["libs"]["changed"]}
+    # Groups (merged demultiplexing groups and STARsolo batches) containing changed or new
+    # libraries/samples must also be re-run
+    libs = {*changes["libs"]["changed"], *changes["libs"]["new"]}
+    names.update(
+        group
+        for group, x in _read_json(os.path.join(METADATA_DIR, "bcl2fastq", "demux.json")).items()
+        if set(x["libs"]) & libs
+    )
+    samples = {*changes["samples"]["changed"], *changes["samples"]["new"]}
+    names.update(
+        batch
+        for batch, x in _read_json(os.path.join(METADATA_DIR, "starsolo", "batches.json")).items()
+        if set(x) & samples
+    )
+    for path in invalidate_stamps(names):
+        logger.info("Invalidated: {}", path)
 
 
-def _get_reverse_complement_flag(reverse_complement: bool) -> str:
-    return "--reversecomplement" if reverse_complement else ""
+def _read_json(path: os.PathLike) -> dict:
+    if os.path.isfile(path):
+        with open(file=path, mode="r", encoding="UTF-8") as f:
+            return json.load(f)
+    return {}
 
 
-def _get_options_flags(options: dict) -> str:
-    return " ".join(
-        f"--{k}={v if isinstance(v, str) else str(v).lower()}"
-        for k, v in options.items()
-        if options
-    )
+def _cmd(*args):
+    cmd = [" ".join(args)]
+    return cmd
 
 
-def _get_cmd(update: bool = False) -> list[str]:
-    if update:
+def _get_cmd(update: bool = False, report_perf: bool = False) -> list[str]:
+    if report_perf:
+        cmd = _cmd(
+            f"{SCRIPTS_DIR}/perf_report.py",
+            f"--pipelinedir={os.path.join(OUTPUT_DIR, '.pipeline')}",
+        )
+    elif update:
         cmd = _cmd(
             f"{SCRIPTS_DIR}/generate_modules.py",
             "--modules=config/modules.yaml",
@@ -153,52 +217,11 @@ def _get_cmd(update: bool = False) -> list[str]:
         )
     else:
         cmd = _cmd(
-            f"{SCRIPTS_DIR}/generate_wrapper.py",
-            f"--module={MODULE}",
+            f"{SCRIPTS_DIR}/compile_metadata.py",
+            f"--config={CONFIG}",
+            "--modules=config/modules.yaml",
             "--template=resources/templates/wrapper.template",
         )
-        if "bcl2fastq" in RULES and "BCL" in INPUT_FORMATS:
-            cmd += _cmd(
-                f"{SCRIPTS_DIR}/generate_bcl2fastq_csv.py",
-                f"--md={INPUT_TABLE}",
-                f"--outdir={os.path.join(METADATA_DIR, 'bcl2fastq')}",
-                _get_index_kit_flags(
-                    dual=DUAL,
-                    single=SINGLE,
-                ),
-                _get_reverse_complement_flag(reverse_complement=REVERSE_COMPLEMENT),
-            )
-        if "cellranger" in RULES:
-            cmd += _cmd(
-                f"{SCRIPTS_DIR}/generate_cellranger_csv.py",
-                f"--md={INPUT_TABLE}",
-                f"--fastqdir={os.path.join(OUTPUT_DIR, 'fastqs')}",
-                f"--outdir={os.path.join(METADATA_DIR, 'cellranger')}",
-            )
-        if "cellranger_arc" in RULES:
-            cmd += _cmd(
-                f"{SCRIPTS_DIR}/generate_cellranger_arc_csv.py",
-                f"--md={INPUT_TABLE}",
-                f"--fastqdir={os.path.join(OUTPUT_DIR, 'fastqs')}",
-                f"--outdir={os.path.join(METADATA_DIR, 'cellranger_arc')}",
-            )
-        if "cellranger_multi" in RULES:
-            cmd += _cmd(
-                f"{SCRIPTS_DIR}/generate_cellranger_multi_csv.py",
-                f"--md={INPUT_TABLE}",
-                f"--fastqdir={os.path.join(OUTPUT_DIR, 'fastqs')}",
-                f"--outdir={os.path.join(METADATA_DIR, 'cellranger')}",
-                f"--features={os.path.abspath(FEATURES)}" if FEATURES else "",
-                f"--hashes={os.path.abspath(HASHES)}" if HASHES else "",
-                f"--transcriptome={TRANSCRIPTOME}" if TRANSCRIPTOME else "",
-                f"--vdj={VDJ}" if VDJ else "",
-                _get_options_flags(options=CELLRANGER_MULTI_OPTIONS),
-            )
-        cmd += _cmd(
-            f"{SCRIPTS_DIR}/generate_info_yaml.py",
-            f"--md={INPUT_TABLE}",
-            f"--outdir={METADATA_DIR}",
-        )
         cmd += _cmd("snakemake --profile=profile")
     return cmd
 
@@ -239,17 +262,10 @@ with open(file=CONFIG, mode="r", encoding="UTF-8") as file:
         if config.get("hashes", None)
         else None
     )
-    DUAL = config.get("dual_index_kits", None)
-    SINGLE = config.get("single_index_kits", None)
-    REVERSE_COMPLEMENT = config.get("reverse_complement", False)
-    TRANSCRIPTOME = config.get("cellranger_reference", None)
-    VDJ = config.get("cellranger_vdj_reference", None)
-    CELLRANGER_MULTI_OPTIONS = config.get("cellranger_multi_options", {})
     try:
         INPUT_TABLE = os.path.join(METADATA_DIR, config["runs"])
-        df = pd.read_csv(INPUT_TABLE, header=0, sep=None, engine="python")
-        assert "format" in df.columns
-        INPUT_FORMATS = set(df.format.dropna().str.upper().unique())
+        if not os.path.isfile(INPUT_TABLE):
+            raise FileNotFoundError(INPUT_TABLE)
         OUTPUT_DIR = config["output_dir"]
         MODULE = config["module"]
     except KeyError as err:
@@ -258,19 +274,10 @@ with open(file=CONFIG, mode="r", encoding="UTF-8") as file:
     except FileNotFoundError as err:
         logger.exception("Input table not found: {}", INPUT_TABLE)
         raise FileNotFoundError from err
-    except AssertionError as err:
-        logger.exception("Input table does not contain 'format' column: {}", INPUT_TABLE)
-        raise AssertionError from err
 METADATA = [
     _ for _ in [INPUT_TABLE, TAGS, FEATURES, HASHES] if _ is not None and os.path.isfile(_)
 ]
-
-with open(file="config/modules.yaml", mode="r", encoding="UTF-8") as file:
-    try:
-        RULES = yaml.load(stream=file, Loader=yaml.SafeLoader)[MODULE]
-    except KeyError as err:
-        logger.exception("Module {} not specified in {}", err, file.name)
-        raise KeyError from err
+GLOBAL_METADATA = [_ for _ in [TAGS, FEATURES, HASHES] if _ is not None]
 
 if __name__ == "__main__":
     _main(opt=docopt.docopt(DOC))
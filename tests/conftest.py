@@ -0,0 +1,11 @@
+"""
+Shared pytest configuration
+"""
+
+
+import os
+import sys
+
+
+# Scripts import sibling modules by name (as when run from resources/scripts)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "resources", "scripts"))
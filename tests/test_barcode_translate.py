@@ -0,0 +1,127 @@
+"""
+Tests for resources/scripts/barcode_translate.py
+"""
+
+
+import os
+
+import numpy as np
+import pytest
+
+from resources.scripts import barcode_translate
+
+
+@pytest.fixture(name="table")
+def fixture_table(tmp_path):
+    reference = tmp_path / "translation.tsv"
+    reference.write_text(
+        "AAAACCCCGGGGTTTT\tTTTTGGGGCCCCAAAA\nACGTACGTACGTACGT\tTGCATGCATGCATGCA\n",
+        encoding="UTF-8",
+    )
+    return barcode_translate.compile_table(str(reference))
+
+
+def test_translate(table):
+    barcodes = np.array(["ACGTACGTACGTACGT", "AAAACCCCGGGGTTTT"], dtype=object)
+    assert barcode_translate.translate(barcodes, table).tolist() == [
+        "TGCATGCATGCATGCA",
+        "TTTTGGGGCCCCAAAA",
+    ]
+
+
+@pytest.mark.parametrize("barcode", ["AAAACCCCGGGGTTTTA", "AAAACCCCGGGGTTT", "AAAACCCCGGGGTTTN"])
+def test_translate_invalid_barcode(table, barcode):
+    with pytest.raises(KeyError):
+        barcode_translate.translate(np.array([barcode], dtype=object), table)
+
+
+def test_encode_barcodes_length():
+    _, valid = barcode_translate.encode_barcodes(
+        np.array([b"ACGTACGTACGTACGT", b"ACGTACGTACGTACGTA", b"ACGTACGTACGTACG"]), 16
+    )
+    assert valid.tolist() == [True, False, False]
+
+
+def random_barcodes(n: int, length: int = 16, seed: int = 0) -> list[str]:
+    rng = np.random.default_rng(seed)
+    return ["".join(x) for x in rng.choice(list("ACGT"), size=(n, length))]
+
+
+@pytest.fixture(name="reference")
+def fixture_reference(tmp_path):
+    sources, targets = random_barcodes(2000, seed=1), random_barcodes(2000, seed=2)
+    reference = tmp_path / "translation.tsv"
+    reference.write_text(
+        "".join(f"{x}\t{y}\n" for x, y in zip(sources, targets)), encoding="UTF-8"
+    )
+    return str(reference), dict(zip(sources, targets))
+
+
+@pytest.mark.parametrize("fixed_width", [True, False])
+def test_duplicate_barcodes_use_last_translation(tmp_path, monkeypatch, fixed_width):
+    reference = tmp_path / "translation.tsv"
+    reference.write_text(
+        "AAAACCCCGGGGTTTT\tTTTTGGGGCCCCAAAA\n"
+        "ACGTACGTACGTACGT\tTGCATGCATGCATGCA\n"
+        "AAAACCCCGGGGTTTT\tCCCCCCCCCCCCCCCC\n",
+        encoding="UTF-8",
+    )
+    if not fixed_width:
+        monkeypatch.setattr(barcode_translate, "_read_fixed_width", lambda *args: None)
+    table = barcode_translate.compile_table(str(reference), chunksize=2)
+    assert len(table["keys"]) == 2
+    assert barcode_translate.translate(
+        np.array(["AAAACCCCGGGGTTTT"], dtype=object), table
+    ).tolist() == ["CCCCCCCCCCCCCCCC"]
+
+
+def test_fixed_width_matches_delimited(reference, monkeypatch):
+    path, lookup = reference
+    assert barcode_translate._read_fixed_width(path, chunksize=300) is not None
+    fast = barcode_translate.compile_table(path, chunksize=300)
+    monkeypatch.setattr(barcode_translate, "_read_fixed_width", lambda *args: None)
+    slow = barcode_translate.compile_table(path, chunksize=300)
+    assert fast["length"] == slow["length"] == 16
+    assert np.array_equal(fast["keys"], slow["keys"])
+    assert np.array_equal(fast["values"], slow["values"])
+    barcodes = np.array(list(lookup), dtype=object)
+    assert barcode_translate.translate(barcodes, fast).tolist() == list(lookup.values())
+
+
+def test_translate_counts(reference, tmp_path):
+    path, lookup = reference
+    counts = tmp_path / "counts.csv"
+    barcodes = list(lookup)[:500]
+    counts.write_text(
+        "barcode,ADT1\n" + "".join(f"{x},{i}\n" for i, x in enumerate(barcodes)),
+        encoding="UTF-8",
+    )
+    table = barcode_translate.compile_table(path)
+    assert barcode_translate.translate_counts(str(counts), table, chunksize=128) == 500
+    lines = counts.read_text(encoding="UTF-8").splitlines()
+    assert lines[0] == "barcode,ADT1"
+    assert lines[1:] == [f"{lookup[x]},{i}" for i, x in enumerate(barcodes)]
+
+
+def test_load_table_cache(reference, tmp_path, monkeypatch):
+    path, _ = reference
+    cache_dir = str(tmp_path / "cache")
+    table = barcode_translate.load_table(path, cache_dir=cache_dir)
+    cached = barcode_translate._table_path(path, cache_dir)
+
+    # Cached table is reused while reference file is unchanged
+    def fail(*args, **kwargs):
+        raise AssertionError("Translation table recompiled")
+
+    monkeypatch.setattr(barcode_translate, "compile_table", fail)
+    reused = barcode_translate.load_table(path, cache_dir=cache_dir)
+    assert np.array_equal(reused["keys"], table["keys"])
+    assert reused["length"] == table["length"]
+
+    # Modification time change invalidates cached table
+    monkeypatch.undo()
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert barcode_translate._table_path(path, cache_dir) != cached
+    barcode_translate.load_table(path, cache_dir=cache_dir)
+    assert os.path.isfile(barcode_translate._table_path(path, cache_dir))
@@ -0,0 +1,147 @@
+"""
+Tests for resources/scripts/demux.py and merged sample sheets in generate_bcl2fastq_csv.py
+"""
+
+
+import json
+
+import pandas as pd
+import pytest
+
+from resources.scripts import demux
+from resources.scripts import generate_bcl2fastq_csv as bcl2fastq
+
+
+# Bases masks from config/config.yaml
+MASKS = {
+    "GEX-FC1": "Y28n*,I10n*,I10n*,Y90n*",
+    "ADT-FC1": "Y28n*,I6n*,n*,Y15n*",
+    "HTO-FC1": "Y28n*,I8n*,n*,Y15n*",
+    "ATAC-FC1": "Y50n*,I8n*,Y16n*,Y50n*",
+}
+INDEX_LENGTHS = {"GEX-FC1": (10, 10), "ADT-FC1": (6, 0), "HTO-FC1": (8, 0), "ATAC-FC1": (8, 0)}
+LIBS = {lib: {"run": "RUN_FC1", "format": "BCL"} for lib in MASKS}
+
+
+def test_parse_mask():
+    assert demux.parse_mask("Y28n*,I10n*,n*,Y*") == [("Y", 28), ("I", 10), ("I", 0), ("Y", None)]
+    assert demux.parse_mask("Y28n*,I8Y2") is None
+
+
+def test_plan_demux_unifies_masks():
+    plan = demux.plan_demux(libs=LIBS, masks=MASKS, index_lengths=INDEX_LENGTHS)
+    assert plan == {
+        "RUN_FC1-1": {
+            "run": "RUN_FC1",
+            "libs": ["ADT-FC1", "GEX-FC1", "HTO-FC1"],
+            "mask": "Y28n*,I6n*,n*,Y90n*",
+            "index_lengths": [6, 0],
+            "trim": {"ADT-FC1": {"R2": 15}, "HTO-FC1": {"R2": 15}},
+        },
+        "RUN_FC1-2": {
+            "run": "RUN_FC1",
+            "libs": ["ATAC-FC1"],
+            "mask": "Y50n*,I8n*,Y16n*,Y50n*",
+            "index_lengths": [8],
+            "trim": {},
+        },
+    }
+
+
+def test_plan_demux_without_masks_groups_by_index_lengths():
+    plan = demux.plan_demux(
+        libs=LIBS, masks={}, index_lengths={**INDEX_LENGTHS, "ADT-FC1": (8, 0)}
+    )
+    assert [entry["libs"] for entry in plan.values()] == [
+        ["ADT-FC1", "ATAC-FC1", "HTO-FC1"],
+        ["GEX-FC1"],
+    ]
+    assert all(entry["mask"] is None and not entry["trim"] for entry in plan.values())
+
+
+def test_plan_demux_keeps_unindexed_libraries_separate():
+    masks = {"ADT-FC1": "Y28n*,n*,Y15n*", "HTO-FC1": "Y28n*,n*,Y15n*"}
+    plan = demux.plan_demux(
+        libs={lib: LIBS[lib] for lib in masks}, masks=masks, index_lengths={}
+    )
+    assert [entry["libs"] for entry in plan.values()] == [["ADT-FC1"], ["HTO-FC1"]]
+
+
+def _sheet(samples: dict[str, tuple[str, ...]]) -> pd.DataFrame:
+    df = pd.DataFrame(
+        {
+            "Lane": [""] * len(samples),
+            "Sample_ID": list(samples),
+            "index": [x[0] for x in samples.values()],
+        }
+    )
+    if any(len(x) > 1 for x in samples.values()):
+        df["index2"] = [x[1] for x in samples.values()]
+    return df
+
+
+def test_generate_demux_sheets_truncates_indexes(tmp_path):
+    df = pd.DataFrame(
+        {"lib_id": ["GEX-FC1", "ADT-FC1"], "format": ["BCL", "BCL"], "run": ["RUN_FC1"] * 2}
+    )
+    sheets = {
+        "GEX-FC1": _sheet({"S1": ("ACGTACGTAA", "TTTTGGGGCC")}),
+        "ADT-FC1": _sheet({"S1": ("GGGCCC",)}),
+    }
+    plan, _ = bcl2fastq.generate_demux_sheets(
+        df=df, sheets=sheets, masks=MASKS, outdir=str(tmp_path)
+    )
+    assert plan["RUN_FC1-1"]["mask"] == "Y28n*,I6n*,n*,Y90n*"
+    merged = pd.read_csv(tmp_path / "demux" / "RUN_FC1-1.csv", skiprows=1, dtype=str)
+    assert merged.columns.tolist() == ["Lane", "Sample_ID", "Sample_Name", "Sample_Project", "index"]
+    assert merged["index"].tolist() == ["GGGCCC", "ACGTAC"]
+    assert json.loads((tmp_path / "demux.json").read_text(encoding="UTF-8")) == plan
+
+
+def test_generate_demux_sheets_splits_colliding_libraries(tmp_path):
+    df = pd.DataFrame(
+        {"lib_id": ["GEX-FC1", "ADT-FC1"], "format": ["BCL", "BCL"], "run": ["RUN_FC1"] * 2}
+    )
+    sheets = {
+        # Indexes only differ after the first 6 bases
+        "GEX-FC1": _sheet({"S1": ("GGGCCCACGT", "TTTTGGGGCC")}),
+        "ADT-FC1": _sheet({"S1": ("GGGCCC",)}),
+    }
+    plan, _ = bcl2fastq.generate_demux_sheets(
+        df=df, sheets=sheets, masks=MASKS, outdir=str(tmp_path)
+    )
+    assert {entry["libs"][0]: entry["mask"] for entry in plan.values()} == {
+        "ADT-FC1": "Y28n*,I6n*,n*,Y15n*",
+        "GEX-FC1": "Y28n*,I10n*,I10n*,Y90n*",
+    }
+    assert all(len(entry["libs"]) == 1 and not entry["trim"] for entry in plan.values())
+
+
+def test_fan_out_trims_reads(tmp_path, monkeypatch):
+    demuxdir = tmp_path / "demux"
+    (demuxdir / "ADT-FC1").mkdir(parents=True)
+    for read in ("R1", "R2"):
+        (demuxdir / "ADT-FC1" / f"S1_S1_L001_{read}_001.fastq.gz").write_bytes(b"")
+    outdir = tmp_path / "fastqs"
+    trimmed = []
+
+    def trim_fastq(path, outdir, flags, threads):
+        trimmed.append((path.rsplit("_", 2)[1], flags))
+        output = f"{outdir}/{path.rsplit('/', 1)[1]}"
+        open(output, "wb").close()
+        return output
+
+    monkeypatch.setattr(demux, "trim_fastq", trim_fastq)
+    fastqs = demux.fan_out(
+        demuxdir=str(demuxdir), lib="ADT-FC1", outdir=str(outdir), trim={"R2": 15}
+    )
+    assert trimmed == [("R2", "-L 15")]
+    assert sorted(x["read"] for x in fastqs) == ["R1", "R2"]
+    assert (outdir / "S1_S1_L001_R1_001.fastq.gz").samefile(
+        demuxdir / "ADT-FC1" / "S1_S1_L001_R1_001.fastq.gz"
+    )
+
+
+@pytest.mark.parametrize("mask", ["Y28n*,I8n*,Y15n*", "Y28n*,I8n*,I8n*,Y15n*"])
+def test_unify_masks_rejects_different_read_structures(mask):
+    assert demux.unify_masks({"A": MASKS["ATAC-FC1"], "B": mask}, index_lengths={}) is None
@@ -0,0 +1,111 @@
+"""
+Tests for resources/scripts/fingerprint.py
+"""
+
+
+import pandas as pd
+
+from resources.scripts import fingerprint
+
+
+def make_runs(**overrides) -> pd.DataFrame:
+    df = pd.DataFrame(
+        {
+            "run": ["RUN_FC1"] * 3,
+            "format": ["BCL"] * 3,
+            "lib_type": ["GEX", "ADT", "GEX"],
+            "lib_id": ["GEX-FC1", "ADT-FC1", "GEX-FC1"],
+            "sample_id": ["S1", "S1", "S2"],
+            "sample_index": ["SI-TT-A1", "SI-NA-A1", "SI-TT-A2"],
+        }
+    )
+    for column, values in overrides.items():
+        df[column] = values
+    return df
+
+
+def test_fingerprints_stable_and_order_independent():
+    df = make_runs()
+    config = {"bases_mask": {"GEX": "Y28n*,I10n*,I10n*,Y90n*"}}
+    current = fingerprint.fingerprint_metadata(df=df, config=config)
+    assert sorted(current["libs"]) == ["ADT-FC1", "GEX-FC1"]
+    assert sorted(current["samples"]) == ["S1", "S2"]
+    shuffled = fingerprint.fingerprint_metadata(df=df.iloc[::-1], config=config)
+    assert shuffled == current
+
+
+def test_lib_type_config_only_changes_matching_libraries():
+    df = make_runs()
+    before = fingerprint.fingerprint_metadata(df=df, config={})
+    after = fingerprint.fingerprint_metadata(df=df, config={"read_trim": {"ADT": {"R2": {"L": 15}}}})
+    diff = fingerprint.compare_fingerprints(before, after)
+    assert diff["libs"] == {"new": [], "changed": ["ADT-FC1"], "removed": [], "unchanged": ["GEX-FC1"]}
+    assert diff["samples"] == {"new": [], "changed": ["S1"], "removed": [], "unchanged": ["S2"]}
+
+
+def test_compare_fingerprints_new_and_removed():
+    before = fingerprint.fingerprint_metadata(df=make_runs(), config={})
+    after = fingerprint.fingerprint_metadata(
+        df=make_runs(sample_id=["S1", "S1", "S3"], lib_id=["GEX-FC1", "ADT-FC1", "GEX-FC2"]),
+        config={},
+    )
+    diff = fingerprint.compare_fingerprints(before, after)
+    assert diff["samples"] == {"new": ["S3"], "changed": ["S1"], "removed": ["S2"], "unchanged": []}
+    # Library rows of removed sample no longer part of library fingerprint
+    assert diff["libs"] == {
+        "new": ["GEX-FC2"],
+        "changed": ["GEX-FC1"],
+        "removed": [],
+        "unchanged": ["ADT-FC1"],
+    }
+    # Previous run without fingerprints
+    assert fingerprint.compare_fingerprints({}, after)["libs"]["new"] == ["ADT-FC1", "GEX-FC1", "GEX-FC2"]
+
+
+def test_global_fingerprint_ignores_execution_keys(tmp_path):
+    version = tmp_path / "VERSION"
+    version.write_text("1.0\n", encoding="UTF-8")
+    config = {"output_dir": "out", "read_trim": {"ADT": {}}}
+    digest = fingerprint.global_fingerprint(config, files=[str(version)])
+    assert digest == fingerprint.global_fingerprint(
+        {**config, "starsolo_batch_size": 4, "read_trim": None}, files=[str(version)]
+    )
+    assert digest != fingerprint.global_fingerprint(
+        {**config, "output_dir": "other"}, files=[str(version)]
+    )
+    version.write_text("1.1\n", encoding="UTF-8")
+    assert digest != fingerprint.global_fingerprint(config, files=[str(version)])
+    # Missing files are treated as empty
+    assert fingerprint.global_fingerprint(config, files=[str(tmp_path / "missing")]) == (
+        fingerprint.global_fingerprint(config, files=[str(tmp_path / "empty")])
+    )
+
+
+def test_invalidate_stamps(tmp_path):
+    stamps = tmp_path / "stamps"
+    for path in (
+        "bcl2fastq/GEX-FC1.stamp",
+        "bcl2fastq/GEX-FC1.manifest.json",
+        "bcl2fastq/ADT-FC1.stamp",
+        "bcl2fastq_lanes/GEX-FC1/L001.stamp",
+        "starsolo/S1.stamp",
+        "starsolo/S10.stamp",
+        "starsolo/S1.txt",
+    ):
+        (stamps / path).parent.mkdir(parents=True, exist_ok=True)
+        (stamps / path).touch()
+    (stamps / "README").touch()
+    removed = fingerprint.invalidate_stamps({"GEX-FC1", "S1"}, stamp_dir=str(stamps))
+    assert sorted(removed) == sorted(
+        str(stamps / path)
+        for path in (
+            "bcl2fastq/GEX-FC1.stamp",
+            "bcl2fastq/GEX-FC1.manifest.json",
+            "bcl2fastq_lanes/GEX-FC1",
+            "starsolo/S1.stamp",
+        )
+    )
+    remaining = sorted(str(x.relative_to(stamps)) for x in stamps.rglob("*") if x.is_file())
+    assert remaining == ["README", "bcl2fastq/ADT-FC1.stamp", "starsolo/S1.txt", "starsolo/S10.stamp"]
+    assert fingerprint.invalidate_stamps(set(), stamp_dir=str(stamps)) == []
+    assert fingerprint.invalidate_stamps({"S1"}, stamp_dir=str(tmp_path / "missing")) == []
@@ -0,0 +1,79 @@
+"""
+Tests for resources/scripts/gather_lanes.py
+"""
+
+
+import json
+import os
+
+import pytest
+
+from resources.scripts import gather_lanes
+
+
+def write_lane(lanedir, lane: int, names: list[str]) -> None:
+    (lanedir / "GEX-FC1").mkdir(parents=True)
+    for name in names:
+        (lanedir / "GEX-FC1" / name).write_bytes(b"ACGT" * lane)
+    (lanedir / "Stats").mkdir()
+    (lanedir / "Stats" / "Stats.json").write_text(
+        json.dumps(
+            {
+                "Flowcell": "FC1",
+                "RunId": "RUN_FC1",
+                "ConversionResults": [{"LaneNumber": lane, "TotalClustersRaw": 100 * lane}],
+                "ReadInfosForLanes": [{"LaneNumber": lane}],
+                "UnknownBarcodes": [{"Lane": lane, "Barcodes": {}}],
+            }
+        ),
+        encoding="UTF-8",
+    )
+
+
+def test_gather_fastqs(tmp_path):
+    lanedirs = [tmp_path / "lanes" / f"L00{lane}" for lane in (1, 2)]
+    for lane, lanedir in enumerate(lanedirs, start=1):
+        write_lane(
+            lanedir,
+            lane,
+            [f"S1_S1_L00{lane}_R1_001.fastq.gz", f"Undetermined_S0_L00{lane}_R1_001.fastq.gz"],
+        )
+    outdir = tmp_path / "fastqs"
+    fastqs = gather_lanes.gather_fastqs([str(x) for x in lanedirs], outdir=str(outdir))
+    assert sorted((x["lane"], x["size"]) for x in fastqs) == [("001", 4), ("002", 8)]
+    assert (outdir / "S1_S1_L002_R1_001.fastq.gz").samefile(
+        lanedirs[1] / "GEX-FC1" / "S1_S1_L002_R1_001.fastq.gz"
+    )
+    # Re-gathering keeps existing links and replaces stale files
+    (outdir / "S1_S1_L001_R1_001.fastq.gz").unlink()
+    (outdir / "S1_S1_L001_R1_001.fastq.gz").write_bytes(b"stale")
+    gather_lanes.gather_fastqs([str(x) for x in lanedirs], outdir=str(outdir))
+    assert (outdir / "S1_S1_L001_R1_001.fastq.gz").samefile(
+        lanedirs[0] / "GEX-FC1" / "S1_S1_L001_R1_001.fastq.gz"
+    )
+    assert sorted(os.listdir(outdir)) == [
+        "S1_S1_L001_R1_001.fastq.gz",
+        "S1_S1_L002_R1_001.fastq.gz",
+    ]
+
+
+def test_gather_fastqs_duplicate_names(tmp_path):
+    # Lane outputs generated with --no-lane-splitting have identical file names
+    lanedirs = [tmp_path / "lanes" / f"L00{lane}" for lane in (1, 2)]
+    for lane, lanedir in enumerate(lanedirs, start=1):
+        write_lane(lanedir, lane, ["S1_S1_R1_001.fastq.gz"])
+    with pytest.raises(AssertionError, match="Duplicate FASTQ file name"):
+        gather_lanes.gather_fastqs([str(x) for x in lanedirs], outdir=str(tmp_path / "fastqs"))
+
+
+def test_merge_stats(tmp_path):
+    lanedirs = [tmp_path / "lanes" / f"L00{lane}" for lane in (2, 1)]
+    for lanedir, lane in zip(lanedirs, (2, 1)):
+        write_lane(lanedir, lane, [])
+    stats = gather_lanes.merge_stats([str(x / "Stats" / "Stats.json") for x in lanedirs])
+    assert stats["Flowcell"] == "FC1" and stats["RunId"] == "RUN_FC1"
+    assert [x["LaneNumber"] for x in stats["ConversionResults"]] == [1, 2]
+    assert [x["TotalClustersRaw"] for x in stats["ConversionResults"]] == [100, 200]
+    assert [x["LaneNumber"] for x in stats["ReadInfosForLanes"]] == [1, 2]
+    assert [x["Lane"] for x in stats["UnknownBarcodes"]] == [1, 2]
+    assert gather_lanes.merge_stats([]) is None
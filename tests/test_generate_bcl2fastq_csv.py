@@ -0,0 +1,171 @@
+"""
+Tests for resources/scripts/generate_bcl2fastq_csv.py and index kit registry in
+resources/scripts/classes.py
+"""
+
+
+import json
+
+import pandas as pd
+import pytest
+
+from resources.scripts import generate_bcl2fastq_csv as bcl2fastq
+from resources.scripts.classes import IndexKit, IndexKitRegistry
+
+
+def sheet(rows: list[tuple]) -> pd.DataFrame:
+    # Rows of (lane, sample ID, i7 index[, i5 index])
+    columns = ["Lane", "Sample_ID", "index", "index2"][: len(rows[0])]
+    return pd.DataFrame(rows, columns=columns)
+
+
+@pytest.mark.parametrize(
+    "index, expected",
+    [
+        ("ACGTACGTTT", 0),  # 2 mismatches
+        ("ACGTACGGGG", 1),  # 3 mismatches
+        ("ACGTTGCAAA", 2),  # 6 mismatches (capped at maximum)
+    ],
+)
+def test_barcode_mismatches(index, expected):
+    df = sheet([("", "S1", "ACGTACGTAC"), ("", "S2", index)])
+    assert bcl2fastq.barcode_mismatches(df, max_mismatches=2) == expected
+
+
+def test_barcode_mismatches_collision():
+    df = sheet([("", "S1", "ACGTACGTAC"), ("", "S2", "ACGTACGTAC")])
+    with pytest.raises(AssertionError, match="S1 and S2"):
+        bcl2fastq.barcode_mismatches(df)
+
+
+def test_barcode_mismatches_same_sample():
+    # Index sequences of the same sample (e.g. single index kit sets) are not compared
+    df = sheet([("", "S1", "ACGTACGTAC"), ("", "S1", "ACGTACGTAA"), ("", "S2", "TTTTTTTTTT")])
+    assert bcl2fastq.barcode_mismatches(df, max_mismatches=2) == 2
+
+
+def test_barcode_mismatches_dual_index_pairs():
+    # i7 indexes collide but i5 indexes differ in 3 positions
+    df = sheet([("", "S1", "ACGTACGT", "AAAAAAAA"), ("", "S2", "ACGTACGT", "AAAAATTT")])
+    assert bcl2fastq.barcode_mismatches(df, max_mismatches=2) == 1
+
+
+def test_barcode_mismatches_per_lane():
+    # Samples with identical indexes in different lanes do not collide
+    df = sheet([("1", "S1", "ACGTACGT"), ("2", "S2", "ACGTACGT"), ("2", "S3", "TTTTTTTT")])
+    assert bcl2fastq.barcode_mismatches(df, max_mismatches=1) == 1
+    # Samples without a lane are compared against every lane
+    df = sheet([("1", "S1", "ACGTACGT"), ("", "S2", "ACGTACGT")])
+    with pytest.raises(AssertionError, match="in lane 1"):
+        bcl2fastq.barcode_mismatches(df)
+
+
+@pytest.fixture(name="kits")
+def fixture_kits(tmp_path):
+    dual = tmp_path / "Dual_Index_Kit_TT_Set_A.csv"
+    dual.write_text(
+        "index_name,index(i7),index2_workflow_a(i5),index2_workflow_b(i5)\n"
+        "SI-TT-A1,GTAACATGCG,AGTGTTACCT,AGGTAACACT\n"
+        "SI-TT-A2,GTGGATCAAA,GCCAACCCTG,CAGGGTTGGC\n",
+        encoding="UTF-8",
+    )
+    single = tmp_path / "Single_Index_Kit_N_Set_A.csv"
+    single.write_text(
+        "index_name,index1,index2,index3,index4\n"
+        "SI-NA-A1,AAACGGCG,CCTACCAT,GGCGTTTC,TTGTAAGA\n"
+        # Same name as dual index kit with different sequences
+        "SI-TT-A1,ACGTACGT,CGTACGTA,GTACGTAC,TACGTACG\n",
+        encoding="UTF-8",
+    )
+    return {"dual": [str(dual)], "single": [str(single)]}
+
+
+def test_read_index_kits(kits, tmp_path):
+    registry = bcl2fastq.read_index_kits(**kits, cache_dir=None)
+    assert registry.conflicts == {"SI-TT-A1"}
+    assert registry.resolve({"SI-TT-A2"}).index_type == "dual"
+    assert registry.resolve({"SI-NA-A1"}).index_type == "single"
+    assert registry.resolve({"SI-TT-A2", "SI-NA-A1"}) is None
+    assert registry.resolve({"SI-XX-A1"}) is None
+    with pytest.raises(AssertionError, match="SI-TT-A1"):
+        registry.resolve({"SI-TT-A1"})
+    # i5 index orientation
+    assert registry.resolve({"SI-TT-A2"}).extract("SI-TT-A2") == ("GTGGATCAAA", "GCCAACCCTG")
+    reverse = bcl2fastq.read_index_kits(**kits, reverse_complement=True, cache_dir=None)
+    assert reverse.resolve({"SI-TT-A2"}).extract("SI-TT-A2") == ("GTGGATCAAA", "CAGGGTTGGC")
+
+
+def test_index_kit_registry_round_trip(kits, tmp_path):
+    registry = bcl2fastq.read_index_kits(**kits, cache_dir=None)
+    restored = IndexKitRegistry.from_dict(json.loads(json.dumps(registry.to_dict())))
+    assert restored.conflicts == registry.conflicts
+    assert [kit.file for kit in restored.kits] == [kit.file for kit in registry.kits]
+    assert restored.resolve({"SI-NA-A1"}).extract("SI-NA-A1") == registry.resolve(
+        {"SI-NA-A1"}
+    ).extract("SI-NA-A1")
+    with pytest.raises(AssertionError):
+        restored.resolve({"SI-TT-A1"})
+
+    # Compiled registry is cached and reused
+    cache_dir = tmp_path / "cache"
+    bcl2fastq.read_index_kits(**kits, cache_dir=str(cache_dir))
+    assert len(list((cache_dir / "index_kits").glob("*.json"))) == 1
+    cached = bcl2fastq.read_index_kits(**kits, cache_dir=str(cache_dir))
+    assert cached.conflicts == registry.conflicts
+
+
+def test_index_kit_registry_same_sequences_not_conflicting():
+    lookup = {"index_name": ("index",), "SI-1": ("ACGTACGT", "TTTTAAAA")}
+    registry = IndexKitRegistry(
+        [IndexKit("a.csv", lookup, "dual"), IndexKit("b.csv", dict(lookup), "dual")]
+    )
+    assert not registry.conflicts
+    assert registry.resolve({"SI-1"}).file == "a.csv"
+
+
+def test_generate_sample_sheets(kits, tmp_path):
+    df = pd.DataFrame(
+        {
+            "run": ["RUN_FC1"] * 3,
+            "format": ["BCL"] * 3,
+            "lib_type": ["GEX", "GEX", "ADT"],
+            "lib_id": ["GEX-FC1", "GEX-FC1", "ADT-FC1"],
+            "sample_id": ["S1", "S2", "S1"],
+            # Literal index sequences (GEX) and index kit names (ADT)
+            "sample_index": ["GTGGATCAAA", "GTAACATGCG", "SI-NA-A1"],
+            "sample_index2": ["GCCAACCCTG", "AGTGTTACCT", None],
+            "lane": ["*", "*", "1 2"],
+        }
+    )
+    registry = bcl2fastq.read_index_kits(**kits, cache_dir=None)
+    sheets, changes = bcl2fastq.generate_sample_sheets(
+        df=df, index_kits=registry, outdir=str(tmp_path / "out"), max_mismatches=2
+    )
+    assert sorted(sheets) == ["ADT-FC1", "GEX-FC1"]
+    assert sheets["ADT-FC1"]["Lane"].tolist() == ["1"] * 4 + ["2"] * 4
+    assert len(changes["written"]) == 4 and not changes["unchanged"]
+    assert (tmp_path / "out" / "GEX-FC1.mismatches").read_text(encoding="UTF-8") == "2\n"
+    assert (tmp_path / "out" / "ADT-FC1.mismatches").read_text(encoding="UTF-8") == "2\n"
+    # Unchanged sheets are not rewritten
+    _, changes = bcl2fastq.generate_sample_sheets(
+        df=df, index_kits=registry, outdir=str(tmp_path / "out"), max_mismatches=2
+    )
+    assert not changes["written"] and len(changes["unchanged"]) == 4
+
+
+def test_generate_demux_sheets_without_masks(tmp_path):
+    df = pd.DataFrame(
+        {"lib_id": ["GEX-FC1", "CRISPR-FC1"], "format": ["BCL"] * 2, "run": ["RUN_FC1"] * 2}
+    )
+    sheets = {
+        "GEX-FC1": sheet([("", "S1", "ACGTACGT", "AAAAAAAA")]),
+        "CRISPR-FC1": sheet([("", "S1", "ACGTACGA", "AAAAAAAT")]),
+    }
+    plan, _ = bcl2fastq.generate_demux_sheets(
+        df=df, sheets=sheets, masks={}, outdir=str(tmp_path), max_mismatches=1
+    )
+    assert [entry["libs"] for entry in plan.values()] == [["CRISPR-FC1", "GEX-FC1"]]
+    assert (tmp_path / "demux" / "RUN_FC1-1.mismatches").read_text(encoding="UTF-8") == "0\n"
+    merged = pd.read_csv(tmp_path / "demux" / "RUN_FC1-1.csv", skiprows=1, dtype=str)
+    assert merged.Sample_ID.tolist() == ["CRISPR-FC1__S1", "GEX-FC1__S1"]
+    assert merged.Sample_Project.tolist() == ["CRISPR-FC1", "GEX-FC1"]
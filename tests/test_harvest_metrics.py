@@ -0,0 +1,155 @@
+"""
+Tests for resources/scripts/harvest_metrics.py
+"""
+
+
+import pytest
+
+from resources.scripts import harvest_metrics
+
+
+STAR_LOG = """\
+                                 Started job on |	Jan 01 00:00:00
+                          Number of input reads |	1,000,000
+                      Average input read length |	118
+                                    UNIQUE READS:
+                   Uniquely mapped reads number |	900000
+                        Uniquely mapped reads % |	90.00%
+"""
+SOLO_SUMMARY = """\
+Number of Reads,1000000
+Reads With Valid Barcodes,0.95
+Estimated Number of Cells,5000
+"""
+CHROMAP_LOG = """\
+Preset parameters for ATAC-seq/scATAC-seq are used.
+Number of reads: 2000000.
+Number of mapped reads: 1800000.
+Mapped all reads in 100.5s.
+"""
+CHROMAP_SUMMARY = """\
+barcode,total,duplicate,unmapped,lowmapq
+AAAC,100,10,5,1
+AAAG,200,20,5,2
+"""
+FRAGMENT_SUMMARY = "total_fragments\tmedian_fragment_length\tlabel\n1500\t180\tATAC\n"
+BARCOUNTER_LOG = """\
+Summary:
+\tTotal reads: 1000
+\tReads with valid barcodes: 950 (95%)
+\tValid cells: 12
+"""
+CELLRANGER_METRICS = (
+    'Estimated Number of Cells,Mean Reads per Cell,Valid Barcodes,Sequencing Saturation\n'
+    '"5,000","20,000",97.5%,N/A\n'
+)
+CELLRANGER_MULTI_METRICS = """\
+Category,Library Type,Grouped By,Group Name,Metric Name,Metric Value
+Cells,Gene Expression,,,Cells,"5,000"
+Library,Antibody Capture,,,Number of reads,"1,000,000"
+Library,Antibody Capture,,,Fraction antibody reads,85.00%
+"""
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("1,000", 1000.0), ("90.00%", 0.9), (" 12 ", 12.0), ("N/A", None), ("", None)],
+)
+def test_number(value, expected):
+    assert harvest_metrics._number(value) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize(
+    "parser, content, expected",
+    [
+        (
+            harvest_metrics.parse_star_log,
+            STAR_LOG,
+            {
+                "Number of input reads": 1000000.0,
+                "Average input read length": 118.0,
+                "Uniquely mapped reads number": 900000.0,
+                "Uniquely mapped reads %": 0.9,
+            },
+        ),
+        (
+            harvest_metrics.parse_chromap_log,
+            CHROMAP_LOG,
+            {"Number of reads": 2000000.0, "Number of mapped reads": 1800000.0},
+        ),
+        (
+            harvest_metrics.parse_chromap_summary,
+            CHROMAP_SUMMARY,
+            {"total": 300.0, "duplicate": 30.0, "unmapped": 10.0, "lowmapq": 3.0},
+        ),
+        (
+            harvest_metrics.parse_table_row,
+            FRAGMENT_SUMMARY,
+            {"total_fragments": 1500.0, "median_fragment_length": 180.0},
+        ),
+        (
+            harvest_metrics.parse_barcounter_log,
+            BARCOUNTER_LOG,
+            {"Total reads": 1000.0, "Valid cells": 12.0},
+        ),
+        (
+            harvest_metrics.parse_cellranger_metrics,
+            CELLRANGER_METRICS,
+            {
+                "Estimated Number of Cells": 5000.0,
+                "Mean Reads per Cell": 20000.0,
+                "Valid Barcodes": 0.975,
+            },
+        ),
+        (
+            harvest_metrics.parse_cellranger_metrics,
+            CELLRANGER_MULTI_METRICS,
+            {
+                "Gene Expression/Cells": 5000.0,
+                "Antibody Capture/Number of reads": 1000000.0,
+                "Antibody Capture/Fraction antibody reads": 0.85,
+            },
+        ),
+        (harvest_metrics.parse_cellranger_metrics, "", {}),
+    ],
+)
+def test_parsers(parser, content, expected, tmp_path):
+    path = tmp_path / "metrics.txt"
+    path.write_text(content, encoding="UTF-8")
+    assert parser(str(path)) == pytest.approx(expected)
+
+
+def test_parse_solo_summary(tmp_path):
+    path = tmp_path / "Gene" / "Summary.csv"
+    path.parent.mkdir()
+    path.write_text(SOLO_SUMMARY, encoding="UTF-8")
+    assert harvest_metrics.parse_solo_summary(str(path)) == {
+        "Gene/Number of Reads": 1000000.0,
+        "Gene/Reads With Valid Barcodes": 0.95,
+        "Gene/Estimated Number of Cells": 5000.0,
+    }
+
+
+def test_harvest(tmp_path):
+    files = {
+        "starsolo/S1/Log.final.out": STAR_LOG,
+        "starsolo/S1/Solo.out/Gene/Summary.csv": SOLO_SUMMARY,
+        "chromap_macs2/S2/chromap.out": CHROMAP_LOG,
+        # Unparseable files are skipped
+        "chromap_macs2/S2/fragment_summary.tsv": "",
+    }
+    for name, content in files.items():
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text(content, encoding="UTF-8")
+    (tmp_path / "barcounter" / "S3").mkdir(parents=True)
+    samples = harvest_metrics.find_samples(str(tmp_path))
+    assert samples == ["S1", "S2", "S3"]
+    df = harvest_metrics.harvest(str(tmp_path), samples=samples, threads=2)
+    assert df.index.tolist() == samples
+    assert df.columns.tolist() == sorted(df.columns)
+    assert (df.dtypes == "float64").all()
+    assert df.loc["S1", "star/Uniquely mapped reads %"] == pytest.approx(0.9)
+    assert df.loc["S1", "starsolo/Gene/Estimated Number of Cells"] == 5000.0
+    assert df.loc["S2", "chromap/Number of reads"] == 2000000.0
+    assert df.loc["S3"].isna().all()
+    assert not any(x.startswith("fragment_stats/") for x in df.columns)
@@ -0,0 +1,53 @@
+"""
+Tests for resources/scripts/link_fastq.py
+"""
+
+
+import os
+
+from resources.scripts import link_fastq
+
+
+def test_link_fastq(tmp_path):
+    target, other = tmp_path / "a.fastq.gz", tmp_path / "b.fastq.gz"
+    target.touch()
+    other.touch()
+    link = str(tmp_path / "link.fastq.gz")
+    assert link_fastq.link_fastq(target=str(target), link=link)
+    assert not link_fastq.link_fastq(target=str(target), link=link)
+    # Links to other files (and stale temporary links) are replaced
+    os.symlink(str(target), str(tmp_path / ".link.fastq.gz.tmp"))
+    assert link_fastq.link_fastq(target=str(other), link=link)
+    assert os.readlink(link) == str(other)
+    assert sorted(os.listdir(tmp_path)) == ["a.fastq.gz", "b.fastq.gz", "link.fastq.gz"]
+
+
+def test_link_fastqs_idempotent(tmp_path):
+    indir = tmp_path / "in"
+    (indir / "S1").mkdir(parents=True)
+    for name in (
+        "S1/S1_S1_L001_R1_001.fastq.gz",
+        "S1/S1_S1_L001_R2_001.fastq.gz",
+        "S1/S1_S1_L001_I1_001.fastq.gz",
+        "S1/S1_S1_L001_R1_002.fastq.gz",
+        "Undetermined_S0_L001_R1_001.fastq.gz",
+    ):
+        (indir / name).write_bytes(b"ACGT")
+    outdir = tmp_path / "out"
+    fastqs = link_fastq.link_fastqs(indir=str(indir), outdir=str(outdir))
+    links = sorted(os.listdir(outdir))
+    assert links == [
+        "S1_S1_L001_R1_001.fastq.gz",
+        "S1_S1_L001_R2_001.fastq.gz",
+        "Undetermined_S0_L001_R1_001.fastq.gz",
+    ]
+    # Undetermined reads are linked but not recorded in manifest
+    assert sorted((x["read"], x["size"]) for x in fastqs) == [("R1", 4), ("R2", 4)]
+    assert os.readlink(outdir / "S1_S1_L001_R1_001.fastq.gz") == str(
+        indir / "S1" / "S1_S1_L001_R1_001.fastq.gz"
+    )
+
+    mtimes = {x: os.lstat(outdir / x).st_mtime_ns for x in links}
+    again = link_fastq.link_fastqs(indir=str(indir), outdir=str(outdir))
+    assert sorted(again, key=lambda x: x["path"]) == sorted(fastqs, key=lambda x: x["path"])
+    assert {x: os.lstat(outdir / x).st_mtime_ns for x in links} == mtimes
@@ -0,0 +1,86 @@
+"""
+Tests for resources/scripts/perf_report.py
+"""
+
+
+import pytest
+
+from resources.scripts import perf_report
+
+
+def write_benchmark(benchmark_dir, snapshot: str, rule: str, job: str, rows: list[dict]) -> None:
+    path = benchmark_dir / snapshot / rule / f"{job}.tsv"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fields = list(rows[0])
+    path.write_text(
+        "\t".join(fields)
+        + "\n"
+        + "".join("\t".join(str(row[x]) for x in fields) + "\n" for row in rows),
+        encoding="UTF-8",
+    )
+
+
+@pytest.fixture(name="benchmarks")
+def fixture_benchmarks(tmp_path):
+    benchmark_dir = tmp_path / "benchmarks"
+    # Previous snapshot
+    write_benchmark(benchmark_dir, "20240101-000000", "starsolo", "S1", [{"s": 100, "max_rss": 1000}])
+    write_benchmark(benchmark_dir, "20240101-000000", "starsolo", "S2", [{"s": 200, "max_rss": 2000}])
+    # Latest snapshot (repeated measurements are averaged; missing values are NA)
+    write_benchmark(
+        benchmark_dir,
+        "20240201-000000",
+        "starsolo",
+        "S1",
+        [{"s": 150, "max_rss": 1000, "io_in": 5}, {"s": 130, "max_rss": 1000, "io_in": "-"}],
+    )
+    write_benchmark(benchmark_dir, "20240201-000000", "starsolo", "S2", [{"s": 210, "max_rss": 3000}])
+    write_benchmark(benchmark_dir, "20240201-000000", "fastqc_chunk", "L1/abc", [{"s": 10, "max_rss": 50}])
+    return perf_report.read_benchmarks(str(benchmark_dir))
+
+
+def test_read_benchmarks(benchmarks):
+    assert len(benchmarks) == 5
+    record = benchmarks.set_index(["snapshot", "rule", "job"]).loc[
+        ("20240201-000000", "starsolo", "S1")
+    ]
+    assert record["s"] == 140
+    assert record["io_in"] == 5
+    assert benchmarks.isna()["cpu_time"].all()
+    assert "L1/abc" in set(benchmarks["job"])
+
+
+def test_summarise_rules(benchmarks):
+    rules = perf_report.summarise_rules(benchmarks).set_index(["snapshot", "rule"])
+    latest = rules.loc[("20240201-000000", "starsolo")]
+    assert latest["jobs"] == 2
+    assert latest["total_s"] == 350
+    assert latest["max_s"] == 210
+    assert latest["max_rss"] == 3000
+    assert rules.loc[("20240101-000000", "starsolo"), "mean_s"] == 150
+
+
+def test_summarise_jobs(benchmarks):
+    jobs = perf_report.summarise_jobs(benchmarks).set_index(["rule", "job"])
+    assert jobs.loc[("starsolo", "S1"), "runs"] == 2
+    assert jobs.loc[("starsolo", "S1"), "snapshot"] == "20240201-000000"
+    assert jobs.loc[("starsolo", "S1"), "s"] == 140
+    assert jobs.loc[("starsolo", "S1"), "mean_s"] == 120
+    assert jobs.loc[("starsolo", "S2"), "peak_rss"] == 3000
+    assert jobs.loc[("fastqc_chunk", "L1/abc"), "runs"] == 1
+
+
+def test_find_regressions(benchmarks):
+    regressions = perf_report.find_regressions(benchmarks, threshold=0.2)
+    # S1 wall time +40%, S2 max RSS +50%; S2 wall time +5% and new job are not flagged
+    assert sorted(zip(regressions["job"], regressions["field"])) == [
+        ("S1", "s"),
+        ("S2", "max_rss"),
+    ]
+    assert regressions.set_index("job").loc["S1", "change"] == 0.4
+    assert (regressions["previous_snapshot"] == "20240101-000000").all()
+    assert perf_report.find_regressions(benchmarks, threshold=0.5).empty
+
+
+def test_find_regressions_empty():
+    assert perf_report.find_regressions(perf_report.read_benchmarks("missing")).empty
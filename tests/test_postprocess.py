@@ -0,0 +1,71 @@
+"""
+Tests for resources/scripts/postprocess.py
+"""
+
+
+import gzip
+import os
+
+from resources.scripts import postprocess
+
+
+def make_outputs(outdir) -> None:
+    for name in (
+        "Solo.out/Gene/raw/matrix.mtx",
+        "Solo.out/Gene/raw/barcodes.tsv",
+        "Solo.out/Gene/filtered/features.tsv",
+        "Solo.out/Gene/filtered/barcodes.tsv.gz",
+        "Solo.out/Gene/Summary.csv",
+        # Matrix file names outside count matrix subfolders
+        "other/matrix.mtx",
+        "Aligned.sortedByCoord.out.bam",
+        "indexed.bam",
+    ):
+        (outdir / name).parent.mkdir(parents=True, exist_ok=True)
+        (outdir / name).write_text(name, encoding="UTF-8")
+    (outdir / "indexed.bam.bai").write_text("index", encoding="UTF-8")
+    os.utime(outdir / "indexed.bam", ns=(0, 0))
+
+
+def test_find_outputs(tmp_path):
+    make_outputs(tmp_path)
+    outputs = postprocess.find_outputs(str(tmp_path), matrix_dirs=["Solo.out"])
+    assert sorted(os.path.relpath(x, tmp_path) for x in outputs["compress"]) == [
+        "Solo.out/Gene/filtered/features.tsv",
+        "Solo.out/Gene/raw/barcodes.tsv",
+        "Solo.out/Gene/raw/matrix.mtx",
+    ]
+    # BAM files with up-to-date index are skipped
+    assert [os.path.relpath(x, tmp_path) for x in outputs["index"]] == [
+        "Aligned.sortedByCoord.out.bam"
+    ]
+    os.utime(tmp_path / "indexed.bam")
+    outputs = postprocess.find_outputs(str(tmp_path), matrix_dirs=["Solo.out"])
+    assert sorted(os.path.basename(x) for x in outputs["index"]) == [
+        "Aligned.sortedByCoord.out.bam",
+        "indexed.bam",
+    ]
+    assert not postprocess.find_outputs(str(tmp_path), matrix_dirs=[], index=False)["index"]
+
+
+def test_postprocess(tmp_path, monkeypatch):
+    make_outputs(tmp_path)
+    monkeypatch.setattr(postprocess.shutil, "which", lambda cmd: None)
+    indexed = []
+
+    def index_bam(path, threads):
+        indexed.append(path)
+        open(f"{path}.bai", "w", encoding="UTF-8").close()
+        return f"{path}.bai"
+
+    monkeypatch.setattr(postprocess, "index_bam", index_bam)
+    done = postprocess.postprocess(str(tmp_path), matrix_dirs=["Solo.out"], threads=4)
+    assert len(done) == 4
+    assert [os.path.basename(x) for x in indexed] == ["Aligned.sortedByCoord.out.bam"]
+    with gzip.open(tmp_path / "Solo.out/Gene/raw/matrix.mtx.gz", mode="rt", encoding="UTF-8") as file:
+        assert file.read() == "Solo.out/Gene/raw/matrix.mtx"
+    assert not (tmp_path / "Solo.out/Gene/raw/matrix.mtx").exists()
+    assert not [x for x in os.listdir(tmp_path / "Solo.out/Gene/raw") if x.endswith(".tmp")]
+    # Re-running skips files that have already been processed
+    assert postprocess.postprocess(str(tmp_path), matrix_dirs=["Solo.out"], threads=4) == []
+    assert len(indexed) == 1
@@ -0,0 +1,74 @@
+"""
+Tests for resources/scripts/profiler.py
+"""
+
+
+import types
+
+import pytest
+
+from resources.scripts import profiler
+
+
+def make_module() -> types.ModuleType:
+    module = types.ModuleType("helpers")
+    exec(  # pylint: disable=exec-used
+        "def _inner(x):\n    return x + 1\n\ndef outer(x):\n    return _inner(x) * 2\n",
+        vars(module),
+    )
+    return module
+
+
+@pytest.mark.parametrize(
+    "env, config, expected",
+    [("", {}, False), ("0", {}, False), ("1", {}, True), ("", {"profile_dag": True}, True)],
+)
+def test_from_config(env, config, expected, monkeypatch):
+    monkeypatch.setenv(profiler.ENV_VAR, env)
+    monkeypatch.setattr(profiler.atexit, "register", lambda func: None)
+    assert profiler.DagProfiler.from_config(config).enabled is expected
+
+
+def test_disabled_profiler_is_noop(tmp_path):
+    prof = profiler.DagProfiler(enabled=False, report_dir=str(tmp_path / "report"))
+    module = make_module()
+    namespace = {"outer": module.outer}
+    outer = module.outer
+    prof.instrument(module, namespace=namespace)
+    assert module.outer is outer and namespace["outer"] is outer
+    assert prof.wrap(outer) is outer
+    with prof.section("include"):
+        prof.timer("other")()
+    assert module.outer(1) == 4
+    assert not prof.stats
+    assert prof.report() is None
+    assert not (tmp_path / "report").exists()
+
+
+def test_enabled_profiler_counts_calls(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler.atexit, "register", lambda func: None)
+    prof = profiler.DagProfiler(enabled=True, report_dir=str(tmp_path / "report"))
+    module = make_module()
+    namespace = {"outer": module.outer}
+    prof.instrument(module, namespace=namespace)
+    assert namespace["outer"] is module.outer
+    # Functions are only wrapped once
+    wrapped = module.outer
+    prof.instrument(module)
+    assert module.outer is wrapped
+    for x in range(3):
+        assert namespace["outer"](x) == 2 * (x + 1)
+    with prof.section("include"):
+        pass
+    assert {name: calls for name, (calls, _) in prof.stats.items()} == {
+        "helpers.outer": 3,
+        "helpers._inner": 3,
+        "include": 1,
+    }
+    report = prof.report()
+    assert prof.report() == report
+    with open(file=report, mode="r", encoding="UTF-8") as file:
+        rows = [line.split("\t") for line in file.read().splitlines()]
+    assert rows[0][:3] == ["rank", "name", "calls"]
+    assert sorted(row[1] for row in rows[1:-1]) == ["helpers._inner", "helpers.outer", "include"]
+    assert rows[-1][1] == "TOTAL"
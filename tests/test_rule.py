@@ -0,0 +1,178 @@
+"""
+Tests for resources/scripts/rule.py
+"""
+
+
+import os
+import types
+
+import pytest
+
+from resources.scripts import rule
+
+
+SIZES = (250, 500, 1000, 2000)
+
+
+class CountingDict(dict):
+    """
+    Dictionary counting item accesses (lookups and iterated entries) in a shared counter.
+    """
+
+    def __init__(self, data: dict, counter: list[int]) -> None:
+        super().__init__(data)
+        self.counter = counter
+
+    def __getitem__(self, key):
+        self.counter[0] += 1
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.counter[0] += 1
+        return super().get(key, default)
+
+    def __iter__(self):
+        for key in super().__iter__():
+            self.counter[0] += 1
+            yield key
+
+    def keys(self):
+        return list(iter(self))
+
+    def values(self):
+        return [super(CountingDict, self).__getitem__(key) for key in self]
+
+    def items(self):
+        return [(key, super(CountingDict, self).__getitem__(key)) for key in self]
+
+
+def make_info(n_samples: int, counter: list[int] | None = None) -> dict:
+    # Each sample has GEX and ATAC libraries from its own run folder
+    wrap = (lambda x: CountingDict(x, counter)) if counter is not None else dict
+    return wrap(
+        {
+            f"S{i}": wrap(
+                {
+                    f"{lib_type}-FC{i}": {"lib_type": lib_type, "run": f"RUN_FC{i}", "format": "BCL"}
+                    for lib_type in ("GEX", "ATAC")
+                }
+            )
+            for i in range(n_samples)
+        }
+    )
+
+
+def build_dag(info: dict) -> None:
+    # Call rule helpers once per job as Snakemake does during DAG construction
+    parsed = rule.parse_info(info)
+    rule.get_count_reads_inputs(info=info, read_trim=False)
+    for lib in parsed["libs"]:
+        wildcards = types.SimpleNamespace(lib=lib)
+        rule.get_run_path(wildcards, info=info, run_dir="runs")
+        rule.get_lib_type(wildcards, info=info)
+        rule.get_fastqc_inputs(wildcards, info=info, read_trim=False)
+    for sample in parsed["samples"]:
+        wildcards = types.SimpleNamespace(sample=sample)
+        rule.get_count_inputs(wildcards, lib_types={"GEX"}, info=info, read_trim=False)
+        rule.get_count_inputs(wildcards, lib_types={"*"}, info=info, read_trim=False)
+
+
+def test_info_lookups_scale_linearly():
+    lookups = []
+    for n_samples in SIZES:
+        counter = [0]
+        build_dag(make_info(n_samples, counter))
+        lookups.append(counter[0] / n_samples)
+    # Lookups into sample/library info per sample are independent of number of samples
+    assert max(lookups) == min(lookups)
+
+
+@pytest.mark.parametrize("n_samples", SIZES)
+def test_index_built_once(n_samples, monkeypatch):
+    calls = []
+    init = rule._LibraryIndex.__init__
+    monkeypatch.setattr(
+        rule._LibraryIndex, "__init__", lambda self, info: calls.append(1) or init(self, info)
+    )
+    build_dag(make_info(n_samples))
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("n_samples", SIZES[:2])
+def test_job_resource_manifest_lookups_scale_linearly(n_samples, tmp_path, monkeypatch):
+    info = make_info(n_samples)
+    pipeline_dir = tmp_path / ".pipeline"
+    (pipeline_dir / "benchmarks" / "starsolo").mkdir(parents=True)
+    for sample in info:
+        (pipeline_dir / "benchmarks" / "starsolo" / f"{sample}.tsv").write_text(
+            "s\tmax_rss\tio_out\n600\t30000\t5000\n", encoding="UTF-8"
+        )
+    calls = []
+    get_manifest = rule._get_fastq_manifest
+    monkeypatch.setattr(
+        rule, "_get_fastq_manifest", lambda *args: calls.append(1) or get_manifest(*args)
+    )
+    for sample in info:
+        for resource in ("mem_mb", "runtime", "disk_mb"):
+            rule.get_job_resource(
+                types.SimpleNamespace(sample=sample),
+                attempt=1,
+                resource=resource,
+                rule="starsolo",
+                lib_types={"GEX"},
+                info=info,
+                output_dir=str(tmp_path),
+                pipeline_dir=str(pipeline_dir),
+            )
+    # One lookup per benchmarked sample (once per rule) plus one per job resource evaluation
+    assert len(calls) == 4 * n_samples
+
+
+def test_fastq_stamp_selected_by_read_trim(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    libs = {"GEX-FC1": {"format": "FASTQ"}}
+    for name in ("trimfastq", "linkfastq"):
+        (tmp_path / "stamps" / name).mkdir(parents=True)
+        (tmp_path / "stamps" / name / "GEX-FC1.stamp").touch()
+    # Stamp of the configured rule is used even if the stamp of the other rule is newer
+    os.utime(tmp_path / "stamps" / "trimfastq" / "GEX-FC1.stamp", ns=(0, 0))
+    assert rule._get_fastq_stamp("GEX-FC1", libs, read_trim=True) == str(
+        tmp_path / "stamps" / "trimfastq" / "GEX-FC1.stamp"
+    )
+    assert rule._get_fastq_stamp("GEX-FC1", libs, read_trim=False) == str(
+        tmp_path / "stamps" / "linkfastq" / "GEX-FC1.stamp"
+    )
+    (tmp_path / "stamps" / "linkfastq" / "GEX-FC1.stamp").unlink()
+    assert rule._get_fastq_stamp("GEX-FC1", libs, read_trim=False) is None
+
+
+def test_fastq_manifest_without_stamp_memoized(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(rule, "_MANIFESTS", {})
+    calls = []
+    get_manifest = rule.get_manifest
+    monkeypatch.setattr(
+        rule, "get_manifest", lambda *args, **kwargs: calls.append(1) or get_manifest(*args, **kwargs)
+    )
+    libs = {"GEX-FC1": {"format": "BCL"}}
+    for _ in range(3):
+        rule._get_fastq_manifest("GEX-FC1", libs, str(tmp_path), read_trim=False)
+    assert len(calls) == 1
+    # Manifest is rescanned once stamp file is created
+    (tmp_path / "stamps" / "bcl2fastq").mkdir(parents=True)
+    (tmp_path / "stamps" / "bcl2fastq" / "GEX-FC1.stamp").touch()
+    rule._get_fastq_manifest("GEX-FC1", libs, str(tmp_path), read_trim=False)
+    assert len(calls) == 2
+
+
+def test_fastq_manifest_size():
+    manifest = rule.FastqManifest(
+        [
+            {"path": f"{sample}_{read}.fastq.gz", "sample": sample, "read": read, "size": size}
+            for sample, read, size in (("S1", "R1", 100), ("S1", "R2", 200), ("S2", "R1", 50))
+        ]
+    )
+    assert manifest.size("S1") == 300
+    assert manifest.size("S2") == 50
+    assert manifest.size("S3") == 0
+    assert manifest.size() == 350
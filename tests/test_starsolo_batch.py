@@ -0,0 +1,73 @@
+"""
+Tests for resources/scripts/starsolo_batch.py
+"""
+
+
+import json
+
+import pytest
+
+from resources.scripts import starsolo_batch
+
+
+SAMPLES = [f"S{i}" for i in range(1, 8)]
+
+
+def test_plan_batches():
+    plan = starsolo_batch.plan_batches(samples=SAMPLES, size=3)
+    assert plan == {
+        "batch-1": ["S1", "S2", "S3"],
+        "batch-2": ["S4", "S5", "S6"],
+        "batch-3": ["S7"],
+    }
+    with pytest.raises(AssertionError):
+        starsolo_batch.plan_batches(samples=SAMPLES, size=0)
+
+
+def test_plan_batches_stable():
+    previous = starsolo_batch.plan_batches(samples=SAMPLES, size=3)
+    # Unchanged samples keep their batches (including after a JSON round trip)
+    assert starsolo_batch.plan_batches(
+        samples=SAMPLES[::-1], size=3, previous=json.loads(json.dumps(previous))
+    ) == previous
+    # Added samples go into new batches; removed samples only change their own batches
+    plan = starsolo_batch.plan_batches(
+        samples=[x for x in SAMPLES if x != "S5"] + ["S8", "S9"], size=3, previous=previous
+    )
+    assert plan == {
+        "batch-1": ["S1", "S2", "S3"],
+        "batch-2": ["S4", "S6"],
+        "batch-3": ["S7"],
+        "batch-4": ["S8", "S9"],
+    }
+    # Batches without remaining samples are dropped
+    plan = starsolo_batch.plan_batches(samples=["S1", "S10"], size=3, previous=previous)
+    assert plan == {"batch-1": ["S1"], "batch-2": ["S10"]}
+
+
+def test_run_sample_skips_completed(tmp_path, monkeypatch):
+    r1, r2 = tmp_path / "S1_R1.fastq.gz", tmp_path / "S1_R2.fastq.gz"
+    r1.write_bytes(b"R1")
+    r2.write_bytes(b"R2")
+    runs = []
+    monkeypatch.setattr(starsolo_batch.subprocess, "run", lambda cmd, **kwargs: runs.append(cmd))
+    monkeypatch.setattr(starsolo_batch, "postprocess", lambda *args, **kwargs: None)
+    kwargs = {
+        "sample": "S1",
+        "r1": [str(r1)],
+        "r2": [str(r2)],
+        "reference": "genome",
+        "whitelist": "whitelist.txt",
+        "outdir": str(tmp_path / "starsolo"),
+        "flags": "--soloType CB_UMI_Simple",
+    }
+    starsolo_batch.run_sample(**kwargs)
+    starsolo_batch.run_sample(**kwargs)
+    assert len(runs) == 1
+    assert "--genomeLoad LoadAndKeep" in runs[0]
+    # Changed settings or inputs re-run the sample
+    starsolo_batch.run_sample(**{**kwargs, "flags": "--soloType CB_UMI_Complex"})
+    assert len(runs) == 2
+    r1.write_bytes(b"R1 updated")
+    starsolo_batch.run_sample(**{**kwargs, "flags": "--soloType CB_UMI_Complex"})
+    assert len(runs) == 3
@@ -0,0 +1,68 @@
+"""
+Tests for resources/scripts/stream_bgzip.py
+"""
+
+
+import gzip
+import hashlib
+import os
+
+import pytest
+
+from resources.scripts import stream_bgzip
+
+
+FRAGMENTS = "".join(f"chr1\t{i}\t{i + 100}\tAAAC\t1\n" for i in range(0, 100000, 50))
+
+
+@pytest.fixture(autouse=True, name="bgzip")
+def fixture_bgzip(tmp_path, monkeypatch):
+    # Stand-in for bgzip writing plain gzip output (BGZF is compatible with gzip readers)
+    bindir = tmp_path / "bin"
+    bindir.mkdir()
+    (bindir / "bgzip").write_text("#!/bin/sh\nexec gzip -c\n", encoding="UTF-8")
+    os.chmod(bindir / "bgzip", 0o755)
+    monkeypatch.setenv("PATH", f"{bindir}{os.pathsep}{os.environ['PATH']}")
+
+
+def listing(path) -> list[str]:
+    return sorted(x for x in os.listdir(path) if x != "bin")
+
+
+def test_stream_bgzip(tmp_path):
+    source = tmp_path / "fragments.tsv"
+    source.write_text(FRAGMENTS, encoding="UTF-8")
+    output = tmp_path / "out" / "fragments.tsv.gz"
+    digest = stream_bgzip.stream_bgzip(
+        command=["sh", "-c", f"cat {source} > {stream_bgzip.PLACEHOLDER}"], output=str(output)
+    )
+    with gzip.open(output, mode="rt", encoding="UTF-8") as file:
+        assert file.read() == FRAGMENTS
+    assert digest == hashlib.md5(output.read_bytes()).hexdigest()
+    # No named pipe or partial output is left behind
+    assert listing(output.parent) == ["fragments.tsv.gz"]
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        # Command fails after writing part of its output
+        ["sh", "-c", f"echo partial > {stream_bgzip.PLACEHOLDER}; exit 3"],
+        # Command fails before opening its output
+        ["sh", "-c", "exit 3"],
+    ],
+)
+def test_stream_bgzip_command_failure(command, tmp_path):
+    output = tmp_path / "fragments.tsv.gz"
+    with pytest.raises(RuntimeError, match="command exit code 3"):
+        stream_bgzip.stream_bgzip(command=command, output=str(output))
+    assert listing(tmp_path) == []
+
+
+def test_stream_bgzip_missing_command(tmp_path):
+    with pytest.raises(OSError):
+        stream_bgzip.stream_bgzip(
+            command=[str(tmp_path / "missing"), stream_bgzip.PLACEHOLDER],
+            output=str(tmp_path / "fragments.tsv.gz"),
+        )
+    assert listing(tmp_path) == []
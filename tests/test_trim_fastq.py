@@ -0,0 +1,90 @@
+"""
+Tests for resources/scripts/trim_fastq.py
+"""
+
+
+import os
+
+import pytest
+
+from resources.scripts import trim_fastq
+
+
+@pytest.fixture(name="tools")
+def fixture_tools(tmp_path, monkeypatch):
+    # Stand-ins for seqtk (copies input) and pigz (copies stdin) that log each seqtk call
+    bindir = tmp_path / "bin"
+    bindir.mkdir()
+    calls = tmp_path / "calls.txt"
+    (bindir / "seqtk").write_text(
+        f'#!/bin/sh\necho "$@" >> {calls}\n[ -n "$SEQTK_FAIL" ] && exit 1\neval cat \\"\\${{$#}}\\"\n',
+        encoding="UTF-8",
+    )
+    (bindir / "pigz").write_text("#!/bin/sh\ncat\n", encoding="UTF-8")
+    for tool in ("seqtk", "pigz"):
+        os.chmod(bindir / tool, 0o755)
+    monkeypatch.setenv("PATH", f"{bindir}{os.pathsep}{os.environ['PATH']}")
+    return calls
+
+
+def read_calls(calls) -> list[str]:
+    return calls.read_text(encoding="UTF-8").splitlines() if calls.exists() else []
+
+
+@pytest.fixture(name="indir")
+def fixture_indir(tmp_path):
+    indir = tmp_path / "in" / "run"
+    indir.mkdir(parents=True)
+    for name in (
+        "S1_S1_L001_R1_001.fastq.gz",
+        "S1_S1_L001_R2_001.fastq.gz",
+        "S1_S1_L001_I1_001.fastq.gz",
+        "S1_S1_L001_R1_002.fastq.gz",
+        "notes.txt",
+    ):
+        (indir / name).write_text(name, encoding="UTF-8")
+    return tmp_path / "in"
+
+
+def test_list_fastqs(indir):
+    assert [os.path.basename(x) for x in trim_fastq.list_fastqs(str(indir))] == [
+        "S1_S1_L001_R1_001.fastq.gz",
+        "S1_S1_L001_R2_001.fastq.gz",
+    ]
+
+
+def test_trim_fastqs_resumes(indir, tmp_path, tools):
+    outdir = tmp_path / "out"
+    fastqs = trim_fastq.list_fastqs(str(indir))
+    flags = {"R1": "-b 1", "R2": "-L 15", "R3": ""}
+    outputs = trim_fastq.trim_fastqs(fastqs, outdir=str(outdir), flags=flags, threads=4)
+    assert [os.path.basename(x) for x in outputs] == [os.path.basename(x) for x in fastqs]
+    assert (outdir / "S1_S1_L001_R2_001.fastq.gz").read_text(encoding="UTF-8") == (
+        "S1_S1_L001_R2_001.fastq.gz"
+    )
+    assert sorted(x.split()[:3] for x in read_calls(tools)) == [
+        ["trimfq", "-L", "15"],
+        ["trimfq", "-b", "1"],
+    ]
+    assert (outdir / trim_fastq.MARKER_DIR / "S1_S1_L001_R2_001.fastq.gz.done").read_text(
+        encoding="UTF-8"
+    ) == "-L 15"
+
+    # Completed files are skipped unless flags change or output is missing
+    trim_fastq.trim_fastqs(fastqs, outdir=str(outdir), flags=flags, threads=4)
+    assert len(read_calls(tools)) == 2
+    (outdir / "S1_S1_L001_R1_001.fastq.gz").unlink()
+    trim_fastq.trim_fastqs(fastqs, outdir=str(outdir), flags={**flags, "R2": "-L 10"}, threads=4)
+    assert len(read_calls(tools)) == 4
+
+
+def test_trim_fastq_failure(indir, tmp_path, tools, monkeypatch):
+    outdir = tmp_path / "out"
+    os.makedirs(outdir / trim_fastq.MARKER_DIR)
+    path = str(indir / "run" / "S1_S1_L001_R1_001.fastq.gz")
+    monkeypatch.setenv("SEQTK_FAIL", "1")
+    with pytest.raises(RuntimeError, match="seqtk exit code 1"):
+        trim_fastq.trim_fastq(path, outdir=str(outdir), flags="-b 1")
+    # No partial output or completion marker is left behind
+    assert sorted(os.listdir(outdir)) == [trim_fastq.MARKER_DIR]
+    assert not os.listdir(outdir / trim_fastq.MARKER_DIR)